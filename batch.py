@@ -0,0 +1,51 @@
+# Headless entry point that analyzes whole directories of recordings without opening a window
+
+import argparse
+import sys
+
+# non interactive backend so that nothing tries to open a display
+import matplotlib
+matplotlib.use("Agg")
+
+from controller.batch import (findFiles, analyzeFiles, analyzeImpulseFiles, guessFormat, writeResults,
+                              g_impulseFields, g_resultFields, g_resultFormats)
+from model.stft import g_defaultSettings
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calculate RT60 values for many audio files at once")
+    parser.add_argument("sources", nargs="+", help="audio files, directories or glob patterns")
+    parser.add_argument("-o", "--output", help="file to write results to, defaults to stdout")
+    parser.add_argument("-f", "--format", choices=g_resultFormats,
+                        help="output format, guessed from the output file extension if not given")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of worker processes, defaults to one per CPU")
+    parser.add_argument("-r", "--recursive", action="store_true", help="search directories recursively")
+    parser.add_argument("--stream", action=argparse.BooleanOptionalAction, default=None,
+                        help="read files block by block to bound memory, by default only long files are streamed")
+    parser.add_argument("--nfft", type=int, default=g_defaultSettings.NFFT, help="number of samples in each spectrum frame")
+    parser.add_argument("--hop", type=int, default=g_defaultSettings.hop, help="number of samples between spectrum frames")
+    parser.add_argument("--sample-rate", type=int, default=None,
+                        help="rate files are resampled to before they are analyzed, by default they keep their own")
+    parser.add_argument("--fft-workers", type=int, default=None, help="number of threads each FFT may use")
+    parser.add_argument("--impulses", action="store_true",
+                        help="write a row for every impulse, such as claps recorded one after another, "
+                             "followed by their mean and standard deviation, instead of a row for every file")
+    parser.add_argument("--no-cache", dest="cache", action="store_false",
+                        help="always analyze files instead of reusing cached results, and do not cache new ones")
+    args = parser.parse_args(argv)
+
+    format = args.format or guessFormat(args.output)
+
+    paths = findFiles(args.sources, args.recursive)
+    if not paths:
+        print("No audio files found", file=sys.stderr)
+        return 1
+
+    settings = g_defaultSettings._replace(NFFT=args.nfft, hop=args.hop, workers=args.fft_workers)
+    analyze, fields = (analyzeImpulseFiles, g_impulseFields) if args.impulses else (analyzeFiles, g_resultFields)
+    writeResults(analyze(paths, args.workers, args.stream, settings, args.cache, args.sample_rate),
+                 args.output, format, fields)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+# Headless entry point that times each stage of the pipeline and compares the results to a stored baseline
+
+import argparse
+import sys
+
+# non interactive backend so that nothing tries to open a display
+import matplotlib
+matplotlib.use("Agg")
+
+from controller.benchmark import (checkStartup, compareResults, parseSynthetic, readBenchmark, runBenchmarks,
+                                  writeBenchmark, g_benchmarkRepeat, g_defaultSynthetic, g_memoryTolerance,
+                                  g_startupTarget, g_timeTolerance)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time and measure the peak memory of every stage of loading, "
+                                                 "analyzing and drawing audio files")
+    parser.add_argument("files", nargs="*", help="audio files to benchmark besides the synthetic and example recordings")
+    parser.add_argument("-s", "--synthetic", action="append", type=parseSynthetic, metavar="SECONDS[:RATE[:CHANNELS]]",
+                        help="synthetic decay to benchmark, may be given more than once, "
+                             "defaults to " + " and ".join(":".join(map(str, spec)) for spec in g_defaultSynthetic))
+    parser.add_argument("--no-examples", dest="examples", action="store_false",
+                        help="do not benchmark the recordings in example_audio")
+    parser.add_argument("--stage", action="append", dest="stages", metavar="PATTERN",
+                        help="only measure stages matching this pattern, such as 'figure.*', may be given more than once")
+    parser.add_argument("-n", "--repeat", type=int, default=g_benchmarkRepeat, help="number of times each stage is timed")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="do not measure peak memory")
+    parser.add_argument("-o", "--output", help="file to write results to as JSON, defaults to stdout")
+    parser.add_argument("-b", "--baseline", help="results of an earlier run to compare with, "
+                                                 "exits with an error if any stage got worse")
+    parser.add_argument("--time-tolerance", type=float, default=g_timeTolerance,
+                        help="fraction a stage may be slower than the baseline before it fails")
+    parser.add_argument("--memory-tolerance", type=float, default=g_memoryTolerance,
+                        help="fraction a stage may use more memory than the baseline before it fails")
+    parser.add_argument("--startup-target", type=float, default=g_startupTarget,
+                        help="seconds importing what the window opens with may take before the run fails")
+    args = parser.parse_args(argv)
+
+    synthetic = g_defaultSynthetic if args.synthetic is None else args.synthetic
+    log = lambda line: print(line, file=sys.stderr)
+    results = runBenchmarks(args.files, synthetic, args.examples, args.stages, args.repeat, args.memory, log)
+    writeBenchmark(results, args.output)
+
+    slow = checkStartup(results, args.startup_target)
+    if slow:
+        print("REGRESSION: " + slow[0], file=sys.stderr)
+        return 1
+
+    if args.baseline:
+        regressions = compareResults(results, readBenchmark(args.baseline), args.time_tolerance, args.memory_tolerance)
+        if regressions:
+            print(f"REGRESSION: {len(regressions)} stage(s) got worse than {args.baseline}", file=sys.stderr)
+            for regression in regressions:
+                print("  " + regression, file=sys.stderr)
+            return 1
+        print(f"No regressions against {args.baseline}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
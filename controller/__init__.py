@@ -1 +1,5 @@
 from .file_passer import *
+from .batch import *
+from .live import *
+from .warmup import *
+from .export import *
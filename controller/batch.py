@@ -0,0 +1,291 @@
+# Handles analyzing many audio files at once without a window
+
+import concurrent.futures
+import csv
+import functools
+import glob
+import json
+import os
+import pathlib
+import sys
+
+import numpy as np
+
+import model
+from model.bands import bandCentres, nominalFrequency
+from model.impulses import segmentImpulses, summarizeImpulses
+from .file_passer import getAnalysis
+
+# file types that are picked up when a directory is given
+g_audioExtensions = (".wav", ".mp3", ".flac", ".ogg")
+
+# nominal frequencies of the ISO 3382 bands, each has a column for every value in g_bandValues
+g_bandNames = [f"{nominalFrequency(centre):g}" for centre in bandCentres(model.g_bandFraction)]
+g_bandValues = ["rt60", "edt", "t20", "t30", "r2", "valid"]
+g_bandFields = [f"{value}_{name}" for value in g_bandValues for name in g_bandNames]
+
+# columns of a results row, in the order they are written. channel_rt60s holds the low, mid and
+# high RT60 of every channel on its own, which is written as JSON text in CSV files
+g_resultFields = ["file", "sample_rate", "length", "rt60_low", "rt60_mid", "rt60_high",
+                  "rt60_difference", "resonant_freq", "channels", "channel_rt60s"] + g_bandFields + ["error"]
+
+# columns of an impulse row, written for every impulse found in a recording of many of them. Each file's
+# impulses are followed by a row with the mean and one with the standard deviation of their values, which
+# name their statistic instead of having an event number
+g_impulseFields = ["file", "event", "statistic", "time", "length", "rt60_low", "rt60_mid", "rt60_high",
+                   "resonant_freq"] + g_bandFields + ["error"]
+
+# columns of impulse rows that are summarized by the mean and standard deviation rows
+g_impulseStatistics = ["length", "rt60_low", "rt60_mid", "rt60_high", "resonant_freq"] + \
+                      [field for field in g_bandFields if not field.startswith("valid_")]
+
+# formats results can be written in
+g_resultFormats = ("csv", "json", "jsonl", "parquet")
+
+# Parquet files need the type of every column up front, columns that are not listed hold floats
+g_parquetTypes = {"file": "string", "sample_rate": "int64", "channels": "int64", "channel_rt60s": "string",
+                  "figures": "string", "event": "int64", "statistic": "string", "error": "string"}
+g_parquetTypes.update((f"valid_{name}", "bool") for name in g_bandNames)
+
+# number of rows written to a Parquet file at a time
+g_parquetRows = 1024
+
+def findFiles(sources, recursive=False):
+    """
+    Returns a sorted list of audio file paths.
+
+    Each source may be a file, a directory or a glob pattern. Directories are searched for
+    files with an extension in g_audioExtensions.
+    """
+    found = set()
+    for source in sources:
+        path = pathlib.Path(source)
+        if path.is_dir():
+            pattern = "**/*" if recursive else "*"
+            for child in path.glob(pattern):
+                if child.is_file() and child.suffix.lower() in g_audioExtensions:
+                    found.add(str(child))
+        elif path.is_file():
+            found.add(str(path))
+        else:
+            for match in glob.glob(source, recursive=recursive):
+                if os.path.isfile(match):
+                    found.add(match)
+    return sorted(found)
+
+def analyzeFile(path, stream=None, settings=None, use_cache=True, sample_rate=None):
+    """
+    Runs the analysis pipeline on a single file and returns a results row as a dictionary.
+
+    stream chooses whether the file is read block by block, None streams only long files.
+    settings are the STFTSettings of the spectrum, None uses the model's.
+    sample_rate is the rate files are resampled to, None keeps their own.
+    Results are read from and added to the analysis cache unless use_cache is False.
+    Errors are recorded in the "error" column instead of being raised so that one bad
+    file does not stop a batch.
+    """
+    row = dict.fromkeys(g_resultFields)
+    row["file"] = str(path)
+    try:
+        result = getAnalysis(path, stream=stream, settings=settings, use_cache=use_cache, sample_rate=sample_rate)
+        row.update(resultToRow(path, result))
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    return row
+
+def resultToRow(path, result):
+    """
+    Returns the results row of the AnalysisResult of the file at path as a dictionary
+    """
+    row = dict.fromkeys(g_resultFields)
+    row["file"] = str(path)
+    rt60s = [float(rt60) for rt60 in result.rt60s]
+
+    row["sample_rate"] = int(result.sample_rate)
+    row["length"] = result.seconds
+    row["rt60_low"], row["rt60_mid"], row["rt60_high"] = rt60s
+    row["rt60_difference"] = (sum(rt60s)/3) - 0.5
+    row["resonant_freq"] = float(result.res_freq)
+    row["channels"] = len(result.channel_rt60s)
+    row["channel_rt60s"] = [[None if np.isnan(rt60) else float(rt60) for rt60 in rt60s]
+                            for rt60s in result.channel_rt60s]
+
+    # T20 fits that are not a straight enough line are flagged as not valid measurements
+    decay = result.iso_decay
+    for field, number in getBandColumns(result.iso_rt60s, decay).items():
+        row[field] = None if np.isnan(number) else float(number)
+    for name, valid in zip(g_bandNames, decay.valid):
+        row[f"valid_{name}"] = bool(valid)
+    return row
+
+def getBandColumns(rt60s, decay):
+    """
+    Returns the values of the ISO 3382 band columns other than valid, keyed by column, from the RT60s and
+    DecayAnalysis of the bands. Values are laid out as they are in rt60s, with the bands last.
+    """
+    columns = {
+        "rt60": rt60s,
+        "edt": decay.edt.time,
+        "t20": decay.t20.time,
+        "t30": decay.t30.time,
+        "r2": decay.t20.r2,
+    }
+    return {f"{value}_{name}": values[..., index] for value, values in columns.items()
+            for index, name in enumerate(g_bandNames)}
+
+def analyzeImpulses(path, stream=None, settings=None, use_cache=True, sample_rate=None):
+    """
+    Runs the analysis pipeline on a single recording of many impulses, such as claps walked around a room,
+    and returns a list of its impulse rows.
+
+    The arguments are those of analyzeFile. Errors are recorded in the "error" column of a single row
+    instead of being raised.
+    """
+    try:
+        result = getAnalysis(path, stream=stream, settings=settings, use_cache=use_cache, sample_rate=sample_rate)
+        return impulsesToRows(path, segmentImpulses(result))
+    except Exception as e:
+        row = dict.fromkeys(g_impulseFields)
+        row["file"] = str(path)
+        row["error"] = f"{type(e).__name__}: {e}"
+        return [row]
+
+def impulsesToRows(path, table):
+    """
+    Returns the impulse rows of the ImpulseTable of the file at path as a list of dictionaries,
+    a row for every impulse followed by the mean and standard deviation of the columns in g_impulseStatistics
+    """
+    columns = {"time": table.times, "length": table.lengths, "resonant_freq": table.res_freqs}
+    columns.update(zip(("rt60_low", "rt60_mid", "rt60_high"), table.rt60s.T))
+    columns.update(getBandColumns(table.iso_rt60s, table.iso_decay))
+
+    rows = []
+    for index in range(len(table)):
+        row = dict.fromkeys(g_impulseFields)
+        row["file"] = str(path)
+        row["event"] = index + 1
+        for field, values in columns.items():
+            row[field] = None if np.isnan(values[index]) else float(values[index])
+        for name, valid in zip(g_bandNames, table.iso_decay.valid[index]):
+            row[f"valid_{name}"] = bool(valid)
+        rows.append(row)
+
+    # impulses whose value could not be measured are left out of its statistics
+    statistics = summarizeImpulses(np.column_stack([columns[field] for field in g_impulseStatistics]))
+    for name, values in zip(("mean", "std"), statistics):
+        row = dict.fromkeys(g_impulseFields)
+        row["file"] = str(path)
+        row["statistic"] = name
+        for field, number in zip(g_impulseStatistics, values):
+            row[field] = None if np.isnan(number) else float(number)
+        rows.append(row)
+    return rows
+
+def analyzeFiles(paths, workers=None, stream=None, settings=None, use_cache=True, sample_rate=None):
+    """
+    Analyzes every file in paths across a pool of worker processes.
+
+    Yields one results row per file in the same order as paths.
+    workers is the number of processes, None uses one per CPU and 1 runs in this process.
+    stream, settings, use_cache and sample_rate are passed on to analyzeFile.
+    """
+    analyze = functools.partial(analyzeFile, stream=stream, settings=settings, use_cache=use_cache,
+                                sample_rate=sample_rate)
+    if workers == 1:
+        for path in paths:
+            yield analyze(path)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(analyze, paths)
+
+def analyzeImpulseFiles(paths, workers=None, stream=None, settings=None, use_cache=True, sample_rate=None):
+    """
+    Analyzes every file in paths as a recording of many impulses across a pool of worker processes.
+
+    Yields the impulse rows of every file, files in the same order as paths. The arguments are those of analyzeFiles.
+    """
+    analyze = functools.partial(analyzeImpulses, stream=stream, settings=settings, use_cache=use_cache,
+                                sample_rate=sample_rate)
+    if workers == 1:
+        for path in paths:
+            yield from analyze(path)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        for rows in executor.map(analyze, paths):
+            yield from rows
+
+def guessFormat(output):
+    """
+    Returns the format results are written to the file at output in from its extension, csv if it has none
+    of g_resultFormats or output is None
+    """
+    suffix = pathlib.Path(output).suffix.lower().lstrip(".") if output else ""
+    return suffix if suffix in g_resultFormats else "csv"
+
+def writeResults(rows, output=None, format="csv", fields=g_resultFields):
+    """
+    Writes results rows as CSV, JSON, JSON lines or Parquet to the file at output, or to stdout if
+    output is None. fields are the columns of the rows, in the order they are written.
+
+    Rows are written as they arrive so long batches can be followed while they run, Parquet files
+    are written g_parquetRows at a time. Lists in rows are written as JSON text in CSV and Parquet files.
+    Returns the number of rows written.
+    """
+    if format not in g_resultFormats:
+        raise ValueError(f"Unknown output format: {format}")
+    if format == "parquet":
+        if output is None:
+            raise ValueError("Parquet results must be written to a file")
+        return _writeParquet(rows, output, fields)
+
+    stream = sys.stdout if output is None else open(output, "w", newline="")
+    count = 0
+    try:
+        if format == "csv":
+            writer = csv.DictWriter(stream, fieldnames=fields)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(_flattenRow(row))
+                count += 1
+        elif format == "jsonl":
+            for row in rows:
+                stream.write(json.dumps(row) + "\n")
+                stream.flush()
+                count += 1
+        else:
+            stream.write("[")
+            for row in rows:
+                stream.write(",\n" if count else "\n")
+                stream.write(json.dumps(row))
+                count += 1
+            stream.write("\n]\n")
+    finally:
+        if output is not None:
+            stream.close()
+    return count
+
+def _flattenRow(row):
+    return {key: json.dumps(value) if isinstance(value, list) else value for key, value in row.items()}
+
+def _writeParquet(rows, output, fields):
+    """
+    Writes rows to a Parquet file with pyarrow, which is optional and only needed for Parquet results
+    """
+    import pyarrow
+    import pyarrow.parquet
+
+    schema = pyarrow.schema([(field, g_parquetTypes.get(field, "float64")) for field in fields])
+    count = 0
+    with pyarrow.parquet.ParquetWriter(output, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(_flattenRow(row))
+            count += 1
+            if len(batch) == g_parquetRows:
+                writer.write_table(pyarrow.Table.from_pylist(batch, schema))
+                batch = []
+        if batch or count == 0:
+            writer.write_table(pyarrow.Table.from_pylist(batch, schema))
+    return count
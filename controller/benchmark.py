@@ -0,0 +1,475 @@
+# Handles timing every stage of loading, analyzing and drawing audio files and comparing the results to a baseline
+
+import concurrent.futures
+import fnmatch
+import json
+import os
+import pathlib
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import soundfile
+
+import model
+from model.analysis import analyzeSoundFile, calculateChannelRT60s, getFramePeriod
+from model.bands import getAnalysisBands, getBandMatrix, calculateBandPowers
+from model.decay import calculateDecays
+from model.figures import (FigureSet, newCombinedDecibelFigure, newDecibelFigure, newSpectrogramFigure,
+                           newWaveformFigure, renderFigure)
+from model.impulses import segmentImpulses
+from model.kernels import findOnsets
+from model.live import g_floorDecibels, g_noiseSmoothing, g_onsetDecibels, g_powerFloor
+from model.stft import calculateSTFT
+from model.utils import calculateBandRT60s, calculateFramePeaks, convertToDecibels, getLoudestPeak
+from model.waveform import WaveformPyramid
+from .decoders import decodeFile, openDecoder, toMono, g_blockSize
+from .shared import prepareSharing, receiveResult, shareResult
+from .streaming import streamFile
+
+# version of the results file, changing what a stage measures must change this
+g_benchmarkVersion = 2
+
+# number of times each stage is timed, the median is reported
+g_benchmarkRepeat = 5
+
+# stages are only counted as slower or larger than the baseline past these fractions
+g_timeTolerance = 0.25
+g_memoryTolerance = 0.25
+
+# differences smaller than these are noise, however large they are as a fraction
+g_minTimeChange = 0.005
+g_minMemoryChange = 1 << 20
+
+# synthetic recordings benchmarked by default, as seconds, sample rate and channels
+g_defaultSynthetic = ((10, 48000, 1), (60, 44100, 2))
+
+# compressed formats every synthetic recording is also written in and their extensions,
+# only decoding is benchmarked for them
+g_decodeFormats = {"FLAC": ".flac", "OGG": ".ogg", "MP3": ".mp3"}
+
+# stages whose throughput is reported, as seconds of audio handled every second
+g_throughputStages = ("decode", "stream")
+
+# size in pixels that graphs are drawn at by the window
+g_plotSize = (930, 404)
+
+# recordings that are benchmarked by default
+g_rootDir = pathlib.Path(__file__).parents[1]
+g_examplesDir = g_rootDir / "example_audio"
+
+# worker process results are sent to by the transfer stages, started when first needed
+g_transferPool = None
+
+# seconds importing everything the window opens with may take, a run fails when startup takes longer
+g_startupTarget = 1.0
+
+# run in a new interpreter by measureStartup, prints how long importing what the window opens with and
+# then warming up the rest took. pyglet runs headless so that no display is needed
+g_startupScript = """
+import json, time
+start = time.perf_counter()
+import pyglet
+pyglet.options["headless"] = True
+import model, view, controller
+imported = time.perf_counter()
+controller.warmUp()
+print(json.dumps([imported - start, time.perf_counter() - imported]))
+"""
+
+def parseSynthetic(spec):
+    """
+    Returns the seconds, sample rate and channels of a synthetic recording given as SECONDS[:RATE[:CHANNELS]]
+    """
+    parts = spec.split(":")
+    if not 1 <= len(parts) <= 3:
+        raise ValueError(f"expected SECONDS[:RATE[:CHANNELS]], got {spec!r}")
+    seconds = float(parts[0])
+    sample_rate = int(parts[1]) if len(parts) > 1 else 48000
+    channels = int(parts[2]) if len(parts) > 2 else 1
+    return seconds, sample_rate, channels
+
+def makeDecay(seconds, sample_rate, channels=1, rt60=1.0, seed=0):
+    """
+    Returns a recording of an impulse of noise decaying with the given RT60, laid out as (sample, channel).
+
+    The impulse starts a tenth of the way in and repeats every 2 * rt60 seconds over a quiet
+    noise floor, so recordings of any length contain the decays the analysis looks for.
+    """
+    rng = np.random.default_rng(seed)
+    num_samples = int(seconds * sample_rate)
+    t = np.arange(num_samples) / sample_rate
+    period = 2 * rt60
+    since = (t - seconds / 10) % period
+    # amplitude falls by 60 dB, a factor of 1000, every rt60 seconds
+    envelope = np.where(t >= seconds / 10, np.exp(-np.log(1000) * since / rt60), 0)
+    noise = rng.standard_normal((num_samples, channels)).astype(np.float32)
+    audio = noise * (0.5 * envelope[:, np.newaxis] + 1e-4)
+    return np.clip(audio, -1, 1).astype(np.float32)
+
+def writeSynthetic(directory, seconds, sample_rate, channels, format="WAV"):
+    """
+    Writes a synthetic decay into directory and returns its path. format is WAV or one of
+    g_decodeFormats, lossless formats hold 16 bit samples.
+    """
+    suffix = g_decodeFormats.get(format, ".wav")
+    path = pathlib.Path(directory) / f"synthetic-{seconds:g}s-{sample_rate}Hz-{channels}ch{suffix}"
+    subtype = "PCM_16" if format in ("WAV", "FLAC") else None
+    audio = makeDecay(seconds, sample_rate, channels)
+    # some versions of libsndfile crash encoding a long recording with a single write
+    with soundfile.SoundFile(path, "w", sample_rate, channels, subtype, format=format) as file:
+        for start in range(0, len(audio), g_blockSize):
+            file.write(audio[start:start + g_blockSize])
+    return path
+
+def getStages(path):
+    """
+    Returns the name and function of every stage run for the file at path, in pipeline order,
+    and whether later stages need it to have run.
+
+    Each stage depends only on what the stages before it returned, which are kept in a
+    dictionary so that a stage can be run again on its own.
+    """
+    bands, fraction, settings = model.g_bands, model.g_bandFraction, model.g_stftSettings
+    state = {}
+
+    def decode():
+        state["sample_rate"], state["channels"] = decodeFile(path)
+        state["data"] = toMono(state["channels"])
+
+    def stream():
+        streamFile(path, bands, fraction, None, settings)
+
+    def stft():
+        state["spectrum"], state["freqs"], state["times"] = calculateSTFT(state["sample_rate"], state["data"], settings)
+
+    def bandPowers():
+        matrix = getBandMatrix(state["sample_rate"], settings.NFFT, getAnalysisBands(bands, fraction))
+        state["powers"] = calculateBandPowers(state["spectrum"], matrix)
+        state["decibels"] = convertToDecibels(state["powers"])
+
+    def rt60():
+        calculateBandRT60s(state["decibels"], state["times"])
+
+    def decay():
+        calculateDecays(state["powers"], getFramePeriod(state["times"]))
+
+    # the search live input runs over the level of every frame, without any impulse being long enough to analyze
+    def onsets():
+        levels = convertToDecibels(np.maximum(state["spectrum"].sum(axis=0), g_powerFloor))
+        findOnsets(levels, 0, np.nan, True, -1, len(levels) + 1, float(g_onsetDecibels), g_noiseSmoothing,
+                   g_floorDecibels, np.empty(len(levels), np.int64))
+
+    def resonance():
+        getLoudestPeak(*calculateFramePeaks(state["spectrum"], state["freqs"]))
+
+    def channels():
+        calculateChannelRT60s(state["sample_rate"], state["channels"], bands, fraction, settings)
+
+    def waveform():
+        WaveformPyramid.fromSamples(state["sample_rate"], state["data"])
+
+    def analysis():
+        state["result"] = analyzeSoundFile(state["sample_rate"], state["data"], bands, fraction, settings,
+                                           state["channels"])
+
+    def impulses():
+        segmentImpulses(state["result"])
+
+    # figures are built from scratch and rendered to pixels, as when a file is first shown
+    def waveformFigure():
+        renderFigure(newWaveformFigure(state["result"].waveform))
+
+    def spectrogramFigure():
+        renderFigure(newSpectrogramFigure(state["result"]))
+
+    def decibelFigure():
+        result = state["result"]
+        renderFigure(newDecibelFigure(result.seconds, result.times, result.decibels[0]))
+
+    def combinedFigure():
+        result = state["result"]
+        renderFigure(newCombinedDecibelFigure(result.seconds, result.times, *result.decibels[:3]))
+
+    # a result sent to a worker process and rebuilt there, as compared files are sent back from their workers
+    def transferPickle():
+        getTransferPool().submit(_receiveTransfer, state["result"]).result()
+
+    def transferShared():
+        getTransferPool().submit(_receiveTransfer, shareResult(state["result"])).result()
+
+    # graphs drawn straight into pixels by the window, including creating the plot
+    def plot(index):
+        def render():
+            FigureSet(state["result"]).getPlot(index).render(*g_plotSize)
+        return render
+
+    return [
+        ("decode", decode, True),
+        ("stream", stream, False),
+        ("stft", stft, True),
+        ("bands", bandPowers, True),
+        ("rt60", rt60, False),
+        ("decay", decay, False),
+        ("onsets", onsets, False),
+        ("resonance", resonance, False),
+        ("channels", channels, False),
+        ("waveform", waveform, False),
+        ("analysis", analysis, True),
+        ("impulses", impulses, False),
+        ("transfer.pickle", transferPickle, False),
+        ("transfer.shared", transferShared, False),
+        ("figure.waveform", waveformFigure, False),
+        ("figure.spectrogram", spectrogramFigure, False),
+        ("figure.decibels", decibelFigure, False),
+        ("figure.combined", combinedFigure, False),
+        ("plot.waveform", plot(0), False),
+        ("plot.spectrogram", plot(1), False),
+        ("plot.decibels", plot(2), False),
+        ("plot.combined", plot(-1), False),
+    ]
+
+def getTransferPool():
+    """
+    Returns the worker process the transfer stages send results to
+    """
+    global g_transferPool
+
+    if g_transferPool is None:
+        prepareSharing()
+        g_transferPool = concurrent.futures.ProcessPoolExecutor(max_workers=1)
+    return g_transferPool
+
+def stopTransferPool():
+    global g_transferPool
+
+    if g_transferPool is not None:
+        g_transferPool.shutdown()
+        g_transferPool = None
+
+def _receiveTransfer(sent):
+    """
+    Runs on the transfer worker, rebuilds what a transfer stage sent as it would be shown
+    """
+    return len(receiveResult(sent).rt60s)
+
+def measureStage(function, repeat=g_benchmarkRepeat, memory=True):
+    """
+    Runs function repeat times and returns its median and fastest time in seconds and, if memory
+    is True, the most memory it allocated at once in bytes from one more run traced by tracemalloc.
+
+    Memory is measured on its own run as tracing allocations slows them down.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    peak = None
+    if memory:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            function()
+            peak = tracemalloc.get_traced_memory()[1] - before
+        finally:
+            if started:
+                tracemalloc.stop()
+
+    return statistics.median(times), min(times), peak
+
+def measureStartup(repeat=g_benchmarkRepeat, log=None):
+    """
+    Returns the measurements of starting the application, each run in a new interpreter as modules
+    are only imported once per process. "startup.import" is how long importing everything the window
+    opens with takes and "startup.warmup" how long importing the rest in the background takes after it.
+
+    Returns no measurements if the application cannot be started, such as when pyglet cannot run headless.
+    """
+    runs = []
+    for _ in range(repeat):
+        process = subprocess.run([sys.executable, "-c", g_startupScript], cwd=g_rootDir, capture_output=True, text=True)
+        if process.returncode != 0:
+            if log is not None:
+                log("startup could not be measured: " + process.stderr.strip().splitlines()[-1])
+            return []
+        runs.append(json.loads(process.stdout.splitlines()[-1]))
+
+    measurements = []
+    for stage, times in zip(("startup.import", "startup.warmup"), zip(*runs)):
+        measurements.append({
+            "fixture": "startup",
+            "stage": stage,
+            "seconds": None,
+            "sample_rate": None,
+            "channels": None,
+            "backend": None,
+            "time": statistics.median(times),
+            "min_time": min(times),
+            "peak_memory": None,
+            "throughput": None,
+        })
+        if log is not None:
+            log(formatMeasurement(measurements[-1]))
+    return measurements
+
+def benchmarkFile(path, stages=None, repeat=g_benchmarkRepeat, memory=True, log=None):
+    """
+    Returns a list of the measurements of every stage for the file at path.
+
+    stages are fnmatch patterns of the stages to measure, None measures all of them. Stages that
+    are left out are still run once when a later stage needs them. log is called with a line
+    for every stage as it is measured.
+    """
+    name = pathlib.Path(path).name
+    with openDecoder(path) as decoder:
+        backend, sample_rate, channels = decoder.backend, decoder.sample_rate, decoder.channels
+        seconds = decoder.frames / sample_rate
+    measurements = []
+    for stage, function, needed in getStages(path):
+        if stages is not None and not any(fnmatch.fnmatch(stage, pattern) for pattern in stages):
+            if needed:
+                function()
+            continue
+
+        median, fastest, peak = measureStage(function, repeat, memory)
+        measurements.append({
+            "fixture": name,
+            "stage": stage,
+            "seconds": seconds,
+            "sample_rate": sample_rate,
+            "channels": channels,
+            "backend": backend,
+            "time": median,
+            "min_time": fastest,
+            "peak_memory": peak,
+            "throughput": seconds / median if stage in g_throughputStages else None,
+        })
+        if log is not None:
+            log(formatMeasurement(measurements[-1]))
+    return measurements
+
+def runBenchmarks(files=(), synthetic=g_defaultSynthetic, examples=True, stages=None, repeat=g_benchmarkRepeat,
+                  memory=True, log=None):
+    """
+    Benchmarks starting the application, files, synthetic recordings given as (seconds, sample rate,
+    channels) and, if examples is True, the recordings in example_audio. Returns the results as a
+    dictionary that can be written as JSON and compared with compareResults.
+
+    Decoding is also benchmarked for a copy of every synthetic recording in each of g_decodeFormats
+    that this version of libsndfile can write.
+    """
+    results = []
+    if stages is None or any(fnmatch.fnmatch(stage, pattern) for stage in ("startup.import", "startup.warmup")
+                             for pattern in stages):
+        results.extend(measureStartup(repeat, log))
+
+    with tempfile.TemporaryDirectory(prefix="spidam-benchmark-") as directory:
+        try:
+            fixtures = [writeSynthetic(directory, *spec) for spec in synthetic]
+            if examples:
+                fixtures.extend(sorted(g_examplesDir.glob("*.wav")))
+            fixtures.extend(pathlib.Path(path) for path in files)
+
+            for path in fixtures:
+                results.extend(benchmarkFile(path, stages, repeat, memory, log))
+
+            if stages is None or any(fnmatch.fnmatch("decode", pattern) for pattern in stages):
+                for spec in synthetic:
+                    for format in g_decodeFormats:
+                        try:
+                            path = writeSynthetic(directory, *spec, format)
+                        except Exception as e:
+                            if log is not None:
+                                log(f"cannot write {format} files to benchmark: {e}")
+                            continue
+                        results.extend(benchmarkFile(path, ["decode"], repeat, memory, log))
+        finally:
+            stopTransferPool()
+
+    return {
+        "version": g_benchmarkVersion,
+        "environment": getEnvironment(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+def getEnvironment():
+    """
+    Returns what the machine and libraries a benchmark was run with, so results from different machines can be told apart
+    """
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+def formatMeasurement(measurement):
+    memory = measurement["peak_memory"]
+    memory = "" if memory is None else f"{memory / (1 << 20):9.1f} MB"
+    throughput = measurement.get("throughput")
+    throughput = "" if throughput is None else f"{throughput:9.0f}x realtime"
+    return (f"{measurement['fixture']:<36} {measurement['stage']:<20} {measurement['time'] * 1000:10.2f} ms"
+            f"{memory}{throughput}")
+
+def compareResults(results, baseline, time_tolerance=g_timeTolerance, memory_tolerance=g_memoryTolerance):
+    """
+    Returns a list of messages describing every stage that is slower or uses more memory than in the
+    baseline by more than the tolerances, as fractions of the baseline. Stages that are missing from
+    either set of results are not compared.
+    """
+    if baseline.get("version") != results.get("version"):
+        return [f"baseline is version {baseline.get('version')}, results are version {results.get('version')}"]
+
+    previous = {(measurement["fixture"], measurement["stage"]): measurement for measurement in baseline["results"]}
+    regressions = []
+    for measurement in results["results"]:
+        old = previous.get((measurement["fixture"], measurement["stage"]))
+        if old is None:
+            continue
+        label = f"{measurement['fixture']} {measurement['stage']}"
+
+        new_time, old_time = measurement["time"], old["time"]
+        if new_time > old_time * (1 + time_tolerance) and new_time - old_time > g_minTimeChange:
+            regressions.append(f"{label}: {old_time * 1000:.2f} ms -> {new_time * 1000:.2f} ms "
+                               f"({new_time / old_time - 1:+.0%})")
+
+        new_memory, old_memory = measurement["peak_memory"], old["peak_memory"]
+        if new_memory is not None and old_memory is not None and \
+                new_memory > old_memory * (1 + memory_tolerance) and new_memory - old_memory > g_minMemoryChange:
+            regressions.append(f"{label}: {old_memory / (1 << 20):.1f} MB -> {new_memory / (1 << 20):.1f} MB "
+                               f"({new_memory / old_memory - 1:+.0%})")
+    return regressions
+
+def checkStartup(results, target=g_startupTarget):
+    """
+    Returns a message if importing what the window opens with took longer than target seconds
+    """
+    for measurement in results["results"]:
+        if measurement["stage"] == "startup.import" and measurement["time"] > target:
+            return [f"startup.import: {measurement['time'] * 1000:.2f} ms is over the target of {target * 1000:.0f} ms"]
+    return []
+
+def writeBenchmark(results, output=None):
+    """
+    Writes results as JSON to the file at output, or to stdout if it is None
+    """
+    text = json.dumps(results, indent=2)
+    if output is None:
+        sys.stdout.write(text + "\n")
+    else:
+        pathlib.Path(output).write_text(text + "\n")
+
+def readBenchmark(path):
+    return json.loads(pathlib.Path(path).read_text())
@@ -0,0 +1,155 @@
+# Handles keeping analysis results on disk so that files analyzed before are opened without decoding them
+
+import hashlib
+import os
+import pathlib
+import tempfile
+
+import numpy as np
+import platformdirs
+
+from model.analysis import resultFromArrays, resultToArrays
+
+# results are kept under the user's cache directory, such as ~/.cache/SPIDAM/analysis on Linux
+g_cacheDir = pathlib.Path(platformdirs.user_cache_dir("SPIDAM")) / "analysis"
+
+# least recently used results are removed once the cache is larger than this many bytes
+g_cacheBytes = 1 << 30
+g_cacheEnabled = True
+
+# changing how results are calculated or stored must change this, so that old results are never used
+g_cacheVersion = 5
+
+# number of bytes hashed at a time
+g_hashBlockSize = 1 << 20
+
+def hashFile(path):
+    """
+    Returns a hex digest of the contents of the file at path
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        while block := file.read(g_hashBlockSize):
+            digest.update(block)
+    return digest.hexdigest()
+
+def getContentHash(path):
+    """
+    Returns the hash of the contents of the file at path.
+
+    Hashes are remembered by path, size and modification time, so an unchanged file is only
+    read once. Any change to the file changes its size or modification time and rehashes it.
+    """
+    stat = os.stat(path)
+    identity = f"{os.path.realpath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    index = g_cacheDir / "index" / hashlib.blake2b(identity.encode(), digest_size=16).hexdigest()
+    try:
+        content_hash = index.read_text()
+        os.utime(index)
+        return content_hash
+    except OSError:
+        pass
+
+    content_hash = hashFile(path)
+    try:
+        _writeAtomic(index, lambda file: file.write(content_hash.encode()))
+    except OSError:
+        pass
+    return content_hash
+
+def getParametersHash(bands, fraction, settings, sample_rate=None, stream=False):
+    """
+    Returns a hex digest of everything besides the audio that an analysis depends on.
+    Streamed results keep a spectrum reduced in time and a decimated waveform, so they are kept apart.
+    """
+    parameters = repr((g_cacheVersion, tuple(float(band) for band in bands), fraction, tuple(settings), sample_rate,
+                       bool(stream)))
+    return hashlib.blake2b(parameters.encode(), digest_size=8).hexdigest()
+
+def getCachePath(path, bands, fraction, settings, sample_rate=None, stream=False):
+    """
+    Returns where the result of analyzing the file at path with the given parameters is kept
+    """
+    parameters_hash = getParametersHash(bands, fraction, settings, sample_rate, stream)
+    return g_cacheDir / f"{getContentHash(path)}-{parameters_hash}.npz"
+
+def loadResult(path, bands, fraction, settings, sample_rate=None, stream=False):
+    """
+    Returns the cached AnalysisResult of the file at path, or None if it has not been analyzed
+    with these parameters, streamed or not as stream says, or the cache is disabled
+    """
+    if not g_cacheEnabled:
+        return None
+    try:
+        cache_path = getCachePath(path, bands, fraction, settings, sample_rate, stream)
+        with np.load(cache_path, allow_pickle=False) as arrays:
+            result = resultFromArrays(arrays)
+        # marks the result as recently used
+        os.utime(cache_path)
+        return result
+    except Exception:
+        return None
+
+def storeResult(path, result, bands, fraction, settings, sample_rate=None, stream=False):
+    """
+    Saves the AnalysisResult of the file at path, streamed if stream is True, and evicts the least recently used results
+    if the cache has grown too large. Failing to write the cache is not an error.
+    """
+    if not g_cacheEnabled:
+        return
+    try:
+        arrays = resultToArrays(result)
+        _writeAtomic(getCachePath(path, bands, fraction, settings, sample_rate, stream),
+                     lambda file: np.savez(file, **arrays))
+        evict()
+    except OSError:
+        pass
+
+def evict(max_bytes=None):
+    """
+    Removes the least recently used files from the cache until it is no larger than max_bytes,
+    which defaults to g_cacheBytes
+    """
+    if max_bytes is None:
+        max_bytes = g_cacheBytes
+
+    entries = []
+    for file in g_cacheDir.rglob("*"):
+        try:
+            stat = file.stat()
+        except OSError:
+            continue
+        # files that are still being written are left alone
+        if file.is_file() and file.suffix != ".tmp":
+            entries.append((stat.st_mtime_ns, stat.st_size, file))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, file in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            file.unlink()
+            total -= size
+        except OSError:
+            pass
+
+def clear():
+    """
+    Removes every cached result
+    """
+    evict(0)
+
+def _writeAtomic(path, write):
+    """
+    Calls write with a temporary file that replaces path once it is complete, so that other
+    processes never see a partly written file
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            write(file)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
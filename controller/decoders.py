@@ -0,0 +1,218 @@
+# Handles decoding audio files into float32 samples with the cheapest backend that can read their format
+
+from abc import ABC, abstractmethod
+
+import numpy as np
+import soundfile
+
+from .wavmap import MappedWave
+
+# uncompressed .wav files are memory-mapped and their samples converted directly, as reading them needs no decoding
+g_memoryMapWaves = True
+
+# number of frames decoded at a time
+g_blockSize = 1 << 16
+
+# audioread hands out 16 bit samples whatever the file holds
+g_audioreadScale = 1 / (1 << 15)
+
+class Decoder(ABC):
+    """
+    An open audio file that is decoded into float32 samples laid out as (frame, channel).
+
+    Channels are kept separate, mixing them is left to whatever uses the samples. frames is
+    the number of frames in the file, which is only an estimate for backends that cannot tell
+    before decoding. backend names what decodes the file.
+    """
+    backend = ""
+
+    def __init__(self, sample_rate, channels, frames):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames = frames
+
+    @abstractmethod
+    def blocks(self, blocksize=g_blockSize):
+        """
+        Yields the audio in blocks of up to blocksize frames, decoding one block at a time
+        """
+
+    def read(self):
+        """
+        Returns all of the audio at once
+        """
+        blocks = list(self.blocks())
+        if not blocks:
+            return np.zeros((0, self.channels), np.float32)
+        return np.concatenate(blocks)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+class WaveDecoder(Decoder):
+    """
+    Reads uncompressed .wav files from a memory map, converting their raw PCM samples without a decoding library.
+    Raises ValueError if the file is not a plain PCM or float .wav file.
+    """
+    backend = "pcm"
+
+    def __init__(self, path):
+        self.wave = MappedWave(path)
+        super().__init__(self.wave.sample_rate, self.wave.channels, len(self.wave))
+
+    def blocks(self, blocksize=g_blockSize):
+        return self.wave.blocks(blocksize)
+
+    def read(self):
+        return self.wave.toFloat(self.wave.samples)
+
+class SoundFileDecoder(Decoder):
+    """
+    Decodes anything libsndfile reads, such as FLAC and OGG, and MP3 from libsndfile 1.1 onwards
+    """
+    backend = "soundfile"
+
+    def __init__(self, path):
+        self.file = soundfile.SoundFile(path)
+        super().__init__(self.file.samplerate, self.file.channels, self.file.frames)
+
+    def blocks(self, blocksize=g_blockSize):
+        return self.file.blocks(blocksize=blocksize, dtype="float32", always_2d=True)
+
+    def read(self):
+        return self.file.read(dtype="float32", always_2d=True)
+
+    def close(self):
+        self.file.close()
+
+class AudioreadDecoder(Decoder):
+    """
+    Decodes files libsndfile cannot read, such as MP3 with older versions of libsndfile, through
+    whichever audioread backend is installed
+    """
+    backend = "audioread"
+
+    def __init__(self, path):
+        # audioread looks for ffmpeg and the other programs it can decode with when it is imported
+        import audioread
+
+        self.file = audioread.audio_open(path)
+        sample_rate, channels = self.file.samplerate, self.file.channels
+        super().__init__(sample_rate, channels, int(round(self.file.duration * sample_rate)))
+
+    def blocks(self, blocksize=g_blockSize):
+        # buffers are a few thousand bytes of interleaved samples, they are gathered into blocks
+        # so whatever the blocks are pushed into is not called for every buffer
+        pending, count = [], 0
+        for buffer in self.file:
+            pending.append(np.frombuffer(buffer, "<i2").reshape(-1, self.channels))
+            count += len(pending[-1])
+            if count >= blocksize:
+                yield self._convert(pending)
+                pending, count = [], 0
+        if pending:
+            yield self._convert(pending)
+
+    def close(self):
+        self.file.close()
+
+    def _convert(self, buffers):
+        block = np.concatenate(buffers).astype(np.float32)
+        block *= g_audioreadScale
+        return block
+
+class ResampledDecoder(Decoder):
+    """
+    Resamples the audio of another decoder with soxr as it is decoded
+    """
+    def __init__(self, decoder, sample_rate):
+        self.decoder = decoder
+        self.backend = decoder.backend + "+soxr"
+        super().__init__(sample_rate, decoder.channels, int(round(decoder.frames * sample_rate / decoder.sample_rate)))
+
+    def blocks(self, blocksize=g_blockSize):
+        import soxr
+
+        stream = soxr.ResampleStream(self.decoder.sample_rate, self.sample_rate, self.channels, dtype="float32")
+        for block in self.decoder.blocks(blocksize):
+            resampled = stream.resample_chunk(block)
+            if len(resampled):
+                yield resampled
+        # the resampler holds back the last few frames until it is told nothing follows them
+        resampled = stream.resample_chunk(np.zeros((0, self.channels), np.float32), last=True)
+        if len(resampled):
+            yield resampled
+
+    def read(self):
+        import soxr
+
+        return soxr.resample(self.decoder.read(), self.decoder.sample_rate, self.sample_rate)
+
+    def close(self):
+        self.decoder.close()
+
+def openDecoder(path, sample_rate=None):
+    """
+    Returns a Decoder of the file at path from the cheapest backend that can read it. Uncompressed
+    .wav files are memory-mapped, anything libsndfile reads is decoded by soundfile and audioread
+    decodes what is left.
+
+    sample_rate is the rate the audio is resampled to, None or the file's own rate leaves it as it is.
+    Raises the error of the last backend tried if none of them can read the file.
+    """
+    decoder = None
+    if g_memoryMapWaves:
+        try:
+            decoder = WaveDecoder(path)
+        except (OSError, ValueError):
+            pass
+
+    if decoder is None:
+        try:
+            decoder = SoundFileDecoder(path)
+        except soundfile.LibsndfileError:
+            decoder = AudioreadDecoder(path)
+
+    if sample_rate is not None and sample_rate != decoder.sample_rate:
+        decoder = ResampledDecoder(decoder, sample_rate)
+    return decoder
+
+def probeFile(path):
+    """
+    Returns the sample rate and number of frames of the file at path, reading only its headers. Returns
+    None for files only audioread reads, as their length is only known once a decoder has been started for them.
+    """
+    if g_memoryMapWaves:
+        try:
+            wave = MappedWave(path)
+            return wave.sample_rate, len(wave)
+        except (OSError, ValueError):
+            pass
+
+    try:
+        info = soundfile.info(path)
+    except soundfile.LibsndfileError:
+        return None
+    return info.samplerate, info.frames
+
+def decodeFile(path, sample_rate=None):
+    """
+    Returns the sample rate of the file at path and all of its audio as (frame, channel) float32 samples
+    """
+    with openDecoder(path, sample_rate) as decoder:
+        return decoder.sample_rate, decoder.read()
+
+def toMono(samples):
+    """
+    Returns (frame, channel) samples as contiguous mono samples, averaging the channels the way librosa.load does
+    """
+    if samples.shape[1] == 1:
+        return np.ascontiguousarray(samples[:, 0])
+    return samples.mean(axis=1, dtype=np.float32)
@@ -0,0 +1,182 @@
+# Handles writing the graphs and numbers of many analyzed files to disk at once, with or without a window
+
+import concurrent.futures
+import functools
+import pathlib
+
+import model
+from model.figures import FigureManager, FigureSet
+from .batch import resultToRow, writeResults, g_resultFields
+from .file_passer import getAnalysis
+from .shared import getWorkerContext
+from .warmup import finishWarmUp
+
+# name given to the file of every graph of a file, and the title it is drawn with, in the order of a FigureSet
+g_exportFigures = (
+    ("waveform", "Waveform"),
+    ("spectrogram", "Spectrogram"),
+    ("low", "Low Frequency"),
+    ("mid", "Mid Frequency"),
+    ("high", "High Frequency"),
+    ("combined", "All Frequencies"),
+)
+
+# image formats graphs can be written as, and the one they are written as by default
+g_imageFormats = ("png", "svg")
+g_defaultImageFormats = ("png",)
+
+# dots per inch graphs are written at, the size they are shown at in the window
+g_exportDpi = 75
+
+# columns of a summary row, the results of batch analysis and the paths of the written graphs
+g_exportFields = g_resultFields[:-1] + ["figures", "error"]
+
+# Matplotlib settings every worker starts with, so that graphs look the same whichever worker drew them.
+# SVG text is kept as text instead of paths, which keeps the files small and searchable
+g_exportStyle = {
+    "svg.fonttype": "none",
+    "savefig.facecolor": "white",
+    "agg.path.chunksize": 10000,
+}
+
+# zlib level PNG files are compressed with, encoding at the default level takes longer than drawing
+g_pngCompression = 3
+
+# number of files handed to a worker at a time
+g_exportChunk = 4
+
+# figures are built once in each worker and drawn again with the data of every file it exports
+g_exportManager = None
+
+# exports started from the window run one at a time off the main thread
+g_exporter = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="exporter")
+
+def initExportWorker(style=g_exportStyle):
+    """
+    Runs in every worker process before it exports anything, applies style and makes the figures
+    the worker draws every file with
+    """
+    global g_exportManager
+
+    import matplotlib
+    matplotlib.use("Agg")
+    matplotlib.rcParams.update(style)
+    g_exportManager = FigureManager()
+
+def getExportNames(paths):
+    """
+    Returns the name every file's graphs are written under, the file name without its extension.
+    Files with the same name from different directories are numbered so that none are overwritten.
+    """
+    names, seen = [], {}
+    for path in paths:
+        stem = pathlib.Path(path).stem
+        seen[stem] = seen.get(stem, 0) + 1
+        names.append(stem if seen[stem] == 1 else f"{stem}-{seen[stem]}")
+    return names
+
+def exportFile(path, name, directory, formats=g_defaultImageFormats, dpi=g_exportDpi, stream=None, settings=None,
+               use_cache=True, sample_rate=None):
+    """
+    Writes every graph of the file at path into directory as name-graph.format for each of formats
+    and returns its summary row as a dictionary.
+
+    stream, settings, use_cache and sample_rate are passed on to getAnalysis. Errors are recorded
+    in the "error" column instead of being raised so that one bad file does not stop an export.
+    """
+    global g_exportManager
+
+    if g_exportManager is None:
+        initExportWorker()
+
+    row = dict.fromkeys(g_exportFields)
+    row["file"] = str(path)
+    try:
+        result = getAnalysis(path, stream=stream, settings=settings, use_cache=use_cache, sample_rate=sample_rate)
+        row.update(resultToRow(path, result))
+
+        written = []
+        figures = FigureSet(result, g_exportManager)
+        for index, (graph, title) in zip(range(len(figures)), g_exportFigures):
+            figure = figures[index]
+            figure.axes[0].set_title(f"{name}: {title}")
+            for format in formats:
+                output = pathlib.Path(directory) / f"{name}-{graph}.{format}"
+                options = {"pil_kwargs": {"compress_level": g_pngCompression}} if format == "png" else {}
+                figure.savefig(output, format=format, dpi=dpi, **options)
+                written.append(str(output))
+        row["figures"] = written
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    return row
+
+def exportFiles(paths, directory, formats=g_defaultImageFormats, workers=None, dpi=g_exportDpi, stream=None,
+                settings=None, use_cache=True, sample_rate=None, context=None):
+    """
+    Exports every file in paths into directory across a pool of worker processes.
+
+    Yields one summary row per file in the same order as paths. workers is the number of processes,
+    None uses one per CPU and 1 runs in this process. context is the multiprocessing context the
+    workers are started from, None uses the default one. The rest are passed on to exportFile.
+    """
+    for format in formats:
+        if format not in g_imageFormats:
+            raise ValueError(f"Unknown image format: {format}")
+
+    pathlib.Path(directory).mkdir(parents=True, exist_ok=True)
+    export = functools.partial(exportFile, directory=directory, formats=formats, dpi=dpi, stream=stream,
+                               settings=settings, use_cache=use_cache, sample_rate=sample_rate)
+    names = getExportNames(paths)
+    if workers == 1:
+        for path, name in zip(paths, names):
+            yield export(path, name)
+        return
+
+    if context is None:
+        # the libraries every worker needs are imported before they are forked, so they start with them
+        finishWarmUp()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                                initializer=initExportWorker) as executor:
+        yield from executor.map(export, paths, names, chunksize=g_exportChunk)
+
+def writeExport(paths, directory, formats=g_defaultImageFormats, summary="csv", workers=None, **options):
+    """
+    Exports every file in paths into directory and writes their summary rows into it as summary.<summary>,
+    summary is any format writeResults writes. Returns the rows that have an error.
+    """
+    failed = []
+
+    def rows():
+        for row in exportFiles(paths, directory, formats, workers, **options):
+            if row["error"] is not None:
+                failed.append(row)
+            yield row
+
+    output = pathlib.Path(directory) / f"summary.{summary}"
+    pathlib.Path(directory).mkdir(parents=True, exist_ok=True)
+    writeResults(rows(), output, summary, g_exportFields)
+    return failed
+
+def getComparedPaths():
+    """
+    Returns the paths of the files in the model's comparison
+    """
+    return model.g_session.paths
+
+def startExport(paths, directory, formats=g_defaultImageFormats):
+    """
+    Starts exporting the files at paths into directory off the main thread, the model is told
+    once every file has been written
+    """
+    g_exporter.submit(_runExport, list(paths), directory, formats)
+
+def _runExport(paths, directory, formats):
+    """
+    Runs on the exporter thread, passes the files that failed on to the model
+    """
+    try:
+        # the window's threads may hold locks at any moment, so its workers are not forked from it
+        failed = [row["file"] for row in writeExport(paths, directory, formats, context=getWorkerContext())]
+    except Exception:
+        failed = list(paths)
+    model.receiveExport(directory, len(paths) - len(failed), failed)
@@ -1,24 +1,184 @@
-import librosa
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import model
 import warnings
 
-# used to supress warnings from librosa
+from model.analysis import analyzeSoundFile
+from model.profiler import span
+from .cache import loadResult, storeResult
+from .decoders import decodeFile, toMono
+from .shared import discardResult, getWorkerContext, receiveResult, shareResult
+from .streaming import shouldStream, streamFile
+
+# used to supress warnings from the decoders
 # since exception handling is being used
 warnings.filterwarnings('ignore')
 
+class LoadJob:
+    """
+    A file that is being loaded and analyzed on the loader thread
+
+    A job is cancelled once a newer file is chosen so that work on it can stop early
+    and its results are never shown
+    """
+    def __init__(self, path):
+        self.path = path
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+# files are loaded one at a time off the main thread so the window never blocks
+g_loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="loader")
+g_current_job = None
+
+# files being compared are analyzed in parallel on worker processes, started when first needed
+g_comparisonWorkers = None
+g_comparisonPool = None
+
 def loadFile(path):
-    y = None
-    sr = None
-    success = False
+    """
+    Starts loading the file at path on the loader thread and returns its LoadJob.
+
+    Any file that is still waiting to be loaded or being analyzed is cancelled.
+    """
+    global g_current_job
+
+    if g_current_job is not None:
+        g_current_job.cancel()
+
+    job = LoadJob(path)
+    g_current_job = job
+    g_loader.submit(_runLoadJob, job)
+    return job
+
+def compareFiles(paths):
+    """
+    Starts adding the files at paths to the model's comparison session and returns its LoadJob.
+
+    Files already in the session are not analyzed again, the rest are analyzed at the same
+    time on a pool of worker processes. Any file that is still being loaded is cancelled.
+    """
+    global g_current_job
+
+    if g_current_job is not None:
+        g_current_job.cancel()
+
+    job = LoadJob(list(paths))
+    g_current_job = job
+    g_loader.submit(_runCompareJob, job)
+    return job
+
+def getComparisonPool():
+    """
+    Returns the pool of worker processes that compared files are analyzed on
+    """
+    global g_comparisonPool
+
+    if g_comparisonPool is None:
+        g_comparisonPool = ProcessPoolExecutor(max_workers=g_comparisonWorkers, mp_context=getWorkerContext())
+    return g_comparisonPool
+
+def getAnalysis(path, job=None, stream=None, settings=None, use_cache=True, sample_rate=None):
+    """
+    Returns the AnalysisResult of the file at path, analyzed with the model's bands.
+
+    Files analyzed before with the same parameters are loaded from the cache without being decoded,
+    anything else is analyzed and added to the cache unless use_cache is False.
+    stream chooses whether the file is read block by block, None streams only long files.
+    settings are the STFTSettings of the spectrum, None uses the model's.
+    sample_rate is the rate the audio is resampled to before it is analyzed, None keeps the file's own.
+    Returns None if job is cancelled before the analysis finishes.
+    """
+    bands, fraction = model.g_bands, model.g_bandFraction
+    if settings is None:
+        settings = model.g_stftSettings
+
+    # streamed results are reduced for display, so they are cached apart from whole ones
+    if stream is None:
+        stream = shouldStream(path)
+
+    if use_cache:
+        with span("cache load"):
+            result = loadResult(path, bands, fraction, settings, sample_rate, stream)
+        if result is not None:
+            return result
+
+    # long files are analyzed block by block instead of being decoded into memory all at once
+    if stream:
+        with span("stream"):
+            result = streamFile(path, bands, fraction, job, settings, sample_rate)
+    else:
+        # channels are kept apart for their own RT60s, everything else is calculated from their average
+        with span("decode"):
+            sr, channels = decodeFile(path, sample_rate)
+        if job is not None and job.cancelled:
+            return None
+        with span("analysis"):
+            result = analyzeSoundFile(sr, toMono(channels), bands, fraction, settings, channels)
+
+    if use_cache and result is not None:
+        with span("cache store"):
+            storeResult(path, result, bands, fraction, settings, sample_rate, stream)
+    return result
+
+def _runLoadJob(job):
+    """
+    Runs on the loader thread, passes the analyzed file on to the model unless the job was cancelled
+    """
+    if job.cancelled:
+        return
+
+    with span("load file", path=job.path):
+        try:
+            result = getAnalysis(job.path, job)
+        except Exception:
+            model.openFileError(job)
+            return
+
+        if result is not None:
+            model.receiveAnalysis(result, job)
+
+def _runCompareJob(job):
+    """
+    Runs on the loader thread, hands the files of a comparison out to the worker processes and
+    passes each result on to the model in the order the files were chosen.
+
+    Results arrive through shared memory, the results of a cancelled job are discarded as they
+    arrive so that none of their memory is left behind
+    """
+    paths = [path for path in job.path if path not in model.g_session]
     try:
-        # librosa.load is indifferent to the presence or lack of metadata and can open .mp3 and .wav files
-        # it also converts the audio to mono by default
-        y, sr = librosa.load(path, sr=None)
-        success = True
+        pool = getComparisonPool()
+        futures = [pool.submit(_analyzeCompared, path, model.g_stftSettings) for path in paths]
     except Exception:
-        model.openFileError()
+        model.openFileError(job)
+        return
+
+    failed = []
+    for path, future in zip(paths, futures):
+        if job.cancelled:
+            for pending in futures:
+                if not pending.cancel():
+                    pending.add_done_callback(_discardCompared)
+            return
+        try:
+            result = receiveResult(future.result())
+        except Exception:
+            failed.append(path)
+            continue
+        model.addComparedFile(path, result)
 
-    if success:
-        model.receiveSoundFile(sr, y)
+    model.receiveComparison(failed, job)
 
+def _analyzeCompared(path, settings):
+    """
+    Runs on a worker process, returns the AnalysisResult of a compared file as shareResult sends it
+    """
+    return shareResult(getAnalysis(path, settings=settings))
 
+def _discardCompared(future):
+    """
+    Frees the result of a compared file that is no longer wanted once it has been analyzed
+    """
+    if not future.cancelled() and future.exception() is None:
+        discardResult(future.result())
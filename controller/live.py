@@ -0,0 +1,158 @@
+# Handles recording from an input device, or a file standing in for one, and analyzing it live
+
+import threading
+import time
+
+import soundfile
+
+import model
+
+# number of frames passed from the device at a time
+g_liveBlockSize = 1024
+
+# seconds between looking for new frames to analyze
+g_liveInterval = 0.02
+
+class FileInputDevice:
+    """
+    Plays an audio file into the live analysis as if it were being recorded, so live mode
+    can be tried and tested without a microphone.
+
+    Blocks are passed on at the rate they would be recorded at, or as fast as they can be
+    read if realtime is False. Channels are averaged into mono.
+    """
+    def __init__(self, path, blocksize=g_liveBlockSize, realtime=True):
+        self.path = path
+        self.blocksize = blocksize
+        self.realtime = realtime
+        self.sample_rate = soundfile.info(path).samplerate
+        self.name = str(path)
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self, callback):
+        """
+        Starts calling callback with every block of mono samples on a new thread
+        """
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._play, args=(callback,), name="file input", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def join(self):
+        """
+        Waits until the whole file has been played
+        """
+        self._thread.join()
+
+    def _play(self, callback):
+        start = time.monotonic()
+        played = 0
+        with soundfile.SoundFile(self.path) as file:
+            for block in file.blocks(blocksize=self.blocksize, dtype="float32", always_2d=True):
+                if self._stopped.is_set():
+                    return
+                callback(block.mean(axis=1))
+                played += len(block)
+
+                # waits until the block would have finished being recorded
+                if self.realtime:
+                    self._stopped.wait(start + played / self.sample_rate - time.monotonic())
+
+class SoundDeviceInput:
+    """
+    Records from an input device with the sounddevice package, which is optional and only
+    needed for live input from a real device.
+
+    device is anything sounddevice accepts, None uses the default input device, and
+    sample_rate defaults to the rate of the device.
+    """
+    def __init__(self, device=None, sample_rate=None, blocksize=g_liveBlockSize):
+        import sounddevice
+
+        self._sounddevice = sounddevice
+        info = sounddevice.query_devices(device, "input")
+        self.device = device
+        self.blocksize = blocksize
+        self.sample_rate = int(sample_rate or info["default_samplerate"])
+        self.name = info["name"]
+        self._stream = None
+
+    def start(self, callback):
+        """
+        Starts calling callback with every block of mono samples on the device's audio thread
+        """
+        self._stream = self._sounddevice.InputStream(device=self.device, channels=1, samplerate=self.sample_rate,
+                                                     blocksize=self.blocksize, dtype="float32",
+                                                     callback=lambda data, frames, time, status: callback(data[:, 0]))
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+
+class LiveMonitor:
+    """
+    Passes the blocks recorded by an input device to the model's live analysis and analyzes
+    them on its own thread, so that the device's callback only ever copies samples
+    """
+    def __init__(self, device, interval=g_liveInterval):
+        self.device = device
+        self.interval = interval
+        self.analyzer = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.analyzer = model.startLive(self.device.sample_rate, self.device.name)
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="live analysis", daemon=True)
+        self._thread.start()
+        self.device.start(self.analyzer.write)
+
+    def stop(self):
+        self.device.stop()
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        # frames recorded just before stopping are still analyzed
+        self._process()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._process()
+
+    def _process(self):
+        for event in self.analyzer.process():
+            model.receiveImpulse(event)
+
+g_monitor = None
+
+def startLiveInput(device=None):
+    """
+    Starts analyzing audio from device, or from the default input device if it is None, and
+    returns its LiveMonitor. Any live input that is already running is stopped first.
+    """
+    global g_monitor
+
+    stopLiveInput()
+    if device is None:
+        device = SoundDeviceInput()
+    g_monitor = LiveMonitor(device)
+    g_monitor.start()
+    return g_monitor
+
+def stopLiveInput():
+    """
+    Stops analyzing live input, if it is running
+    """
+    global g_monitor
+
+    if g_monitor is not None:
+        g_monitor.stop()
+        g_monitor = None
@@ -0,0 +1,140 @@
+# Handles moving arrays between processes through shared memory, so that only where they are is pickled
+
+import multiprocessing
+import os
+import weakref
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from model.analysis import resultFromArrays, resultToArrays
+
+# on Windows a block is freed as soon as the process that made it closes it, before another process
+# can attach to it, so arrays are pickled there instead
+g_useSharedMemory = os.name != "nt"
+
+# arrays start at multiples of this many bytes within a block, as NumPy's vectorized loops prefer
+g_sharedAlignment = 64
+
+# worker pools started from the window are forked from a server process instead of the window's, whose
+# other threads may hold locks that a forked copy of it would never see released. Windows only spawns
+g_workerStartMethod = "forkserver" if os.name != "nt" else "spawn"
+
+# modules the server imports once, so the workers forked from it start with them
+g_workerPreload = ["controller"]
+
+class SharedArrays:
+    """
+    A dictionary of arrays written once into a block of shared memory by one process, to be read
+    by another.
+
+    Only the name of the block and the dtype, shape and offset of every array are pickled, so sending
+    one costs the same however large its arrays are. The process that attaches to the block takes it
+    over, the block is unlinked as soon as it is attached and its memory is freed once every array
+    viewing it has been freed. A block that will never be attached has to be discarded instead.
+    """
+    def __init__(self, name, layout):
+        self.name = name
+        self.layout = layout
+
+    @classmethod
+    def fromArrays(cls, arrays):
+        """
+        Returns SharedArrays holding a copy of every array in the dictionary arrays.
+        Raises TypeError if an array holds Python objects, which cannot be shared.
+        """
+        arrays = {key: np.asarray(array) for key, array in arrays.items()}
+        layout, size = {}, 0
+        for key, array in arrays.items():
+            if array.dtype.hasobject:
+                raise TypeError(f"{key} holds Python objects and cannot be shared")
+            size = -(-size // g_sharedAlignment) * g_sharedAlignment
+            layout[key] = (array.dtype.str, array.shape, size)
+            size += array.nbytes
+
+        block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        try:
+            for key, array in arrays.items():
+                dtype, shape, offset = layout[key]
+                np.ndarray(shape, dtype, block.buf, offset)[...] = array
+        except BaseException:
+            block.close()
+            block.unlink()
+            raise
+        block.close()
+        return cls(block.name, layout)
+
+    def attach(self):
+        """
+        Returns a dictionary of arrays viewing the block and unlinks it, so that it is freed once they are.
+        Raises FileNotFoundError if the block was already attached or discarded.
+        """
+        block = shared_memory.SharedMemory(self.name)
+        block.unlink()
+
+        # every array is a view of buffer, which NumPy keeps as their base. buffer holds its own
+        # memoryview of the block that lets go of it once the last of them is freed, only then can
+        # the block be closed. Blocks still viewed when the interpreter exits are left to the system
+        buffer = np.frombuffer(block.buf, np.uint8)
+        weakref.finalize(buffer.base, block.close).atexit = False
+        arrays = {}
+        for key, (dtype, shape, offset) in self.layout.items():
+            dtype = np.dtype(dtype)
+            count = int(np.prod(shape, dtype=np.int64))
+            arrays[key] = buffer[offset:offset + count * dtype.itemsize].view(dtype).reshape(shape)
+        return arrays
+
+    def discard(self):
+        """
+        Frees the block without reading it, does nothing if it was already attached or discarded
+        """
+        try:
+            block = shared_memory.SharedMemory(self.name)
+        except FileNotFoundError:
+            return
+        block.close()
+        block.unlink()
+
+def prepareSharing():
+    """
+    Starts the process that unlinks blocks left behind when this process exits. Called before
+    worker processes are forked so that they share it, instead of each starting their own that
+    would unlink blocks they made as soon as they exit.
+    """
+    if g_useSharedMemory:
+        resource_tracker.ensure_running()
+
+def getWorkerContext():
+    """
+    Returns the multiprocessing context that worker pools started from the window are made with.
+    The process that unlinks blocks is started first, so that the server and every worker share it.
+    """
+    prepareSharing()
+    context = multiprocessing.get_context(g_workerStartMethod)
+    if g_workerStartMethod == "forkserver":
+        context.set_forkserver_preload(g_workerPreload)
+    return context
+
+def shareResult(result):
+    """
+    Returns what a worker process sends back for an AnalysisResult, SharedArrays of its arrays where
+    shared memory is used and otherwise the result itself
+    """
+    if not g_useSharedMemory:
+        return result
+    return SharedArrays.fromArrays(resultToArrays(result))
+
+def receiveResult(sent):
+    """
+    Returns the AnalysisResult of what shareResult returned in another process, without copying its arrays
+    """
+    if isinstance(sent, SharedArrays):
+        return resultFromArrays(sent.attach())
+    return sent
+
+def discardResult(sent):
+    """
+    Frees what shareResult returned in another process when its result is no longer wanted
+    """
+    if isinstance(sent, SharedArrays):
+        sent.discard()
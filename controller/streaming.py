@@ -0,0 +1,34 @@
+# Handles loading audio files block by block so that long recordings never have to fit in memory
+
+from model.stft import g_defaultSettings
+from model.streaming import analyzeBlocks
+from .decoders import openDecoder, probeFile, g_blockSize
+
+# files longer than this, in seconds, are streamed instead of loaded whole
+g_streamingSeconds = 600
+
+def shouldStream(path):
+    """
+    Returns True if the file at path is longer than g_streamingSeconds. Only the headers are read, so files
+    only audioread reads are loaded whole rather than decoded to find their length.
+
+    Shorter uncompressed .wav files are still read from a memory map when they are loaded whole, streaming
+    is left for files whose whole spectrum and waveform would not fit in memory as it reduces both.
+    """
+    info = probeFile(path)
+    if info is None:
+        return False
+    sample_rate, frames = info
+    return frames > g_streamingSeconds * sample_rate
+
+def streamFile(path, bands, fraction=1, job=None, settings=g_defaultSettings, sample_rate=None):
+    """
+    Returns an AnalysisResult for the file at path, decoding g_blockSize frames at a time.
+
+    Uncompressed .wav files are read straight from a memory map, anything else is decoded by
+    the cheapest backend that reads it. sample_rate is the rate the audio is resampled to, None
+    keeps the file's own. Returns None if job is cancelled before the whole file is read.
+    """
+    with openDecoder(path, sample_rate) as decoder:
+        return analyzeBlocks(decoder.sample_rate, decoder.blocks(g_blockSize), bands, fraction, job, settings,
+                             decoder.frames)
@@ -0,0 +1,59 @@
+# Handles importing the libraries files are loaded, analyzed and drawn with on a background thread,
+# so the window opens without waiting for them and the first file chosen does not either
+
+import importlib
+import threading
+
+import model
+from model.profiler import span
+from model.stft import getWindow
+
+# modules only imported once a file is analyzed or drawn, slowest first
+g_warmModules = (
+    "scipy.signal",
+    "matplotlib.figure",
+    "matplotlib.backends.backend_agg",
+    "model.kernels",
+)
+
+# the thread warming up, None until startWarmUp is first called
+g_warmThread = None
+g_warmLock = threading.Lock()
+
+def warmUp():
+    """
+    Imports every module in g_warmModules, compiles the analysis kernels, or loads them from disk,
+    and calculates the window of the model's spectrum settings
+    """
+    for name in g_warmModules:
+        with span("import " + name, "startup"):
+            importlib.import_module(name)
+
+    from model.kernels import compileKernels
+
+    with span("compile kernels", "startup"):
+        compileKernels()
+
+    settings = model.g_stftSettings
+    getWindow(settings.window, settings.NFFT, settings.dtype)
+
+def startWarmUp():
+    """
+    Starts warming up on a background thread unless it has started already, and returns the thread
+    """
+    global g_warmThread
+
+    with g_warmLock:
+        if g_warmThread is None:
+            g_warmThread = threading.Thread(target=warmUp, name="warm up", daemon=True)
+            g_warmThread.start()
+        return g_warmThread
+
+def finishWarmUp():
+    """
+    Starts warming up if it has not started yet and waits for it to finish.
+
+    Worker processes are forked from this one, and a process forked while another thread is in
+    the middle of an import hangs on the import lock it copied, so they are only started after this.
+    """
+    startWarmUp().join()
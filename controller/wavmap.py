@@ -0,0 +1,116 @@
+# Handles memory-mapping uncompressed .wav files so their samples can be read without decoding
+
+import mmap
+import struct
+
+import numpy as np
+
+# wave format codes, extensible files store the real code in their sub format
+g_formatPCM = 1
+g_formatFloat = 3
+g_formatExtensible = 0xFFFE
+
+# sample types that can be viewed directly, keyed by format code and bits per sample
+g_sampleTypes = {
+    (g_formatPCM, 8): np.dtype("u1"),
+    (g_formatPCM, 16): np.dtype("<i2"),
+    (g_formatPCM, 32): np.dtype("<i4"),
+    (g_formatFloat, 32): np.dtype("<f4"),
+    (g_formatFloat, 64): np.dtype("<f8"),
+}
+
+class MappedWave:
+    """
+    The data chunk of a .wav file memory-mapped as a read only (frame, channel) NumPy view.
+
+    Opening only reads the headers, samples are paged in from the file as they are used and
+    are only converted to float when blocks of them are read. The map stays open for as long
+    as samples, or any view of it, is referenced.
+    Raises ValueError if the file is not a plain PCM or float .wav file.
+    """
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            header = file.read(12)
+            if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+                raise ValueError("Not a RIFF WAVE file")
+
+            fmt = None
+            data_offset = None
+            data_size = 0
+            while True:
+                chunk = file.read(8)
+                if len(chunk) < 8:
+                    break
+                chunk_id, chunk_size = struct.unpack("<4sI", chunk)
+                if chunk_id == b"fmt ":
+                    fmt = file.read(chunk_size)
+                    file.seek(chunk_size % 2, 1)
+                elif chunk_id == b"data":
+                    data_offset = file.tell()
+                    data_size = chunk_size
+                    break
+                else:
+                    # chunks are padded to an even number of bytes
+                    file.seek(chunk_size + chunk_size % 2, 1)
+
+            file_size = file.seek(0, 2)
+
+        if fmt is None or data_offset is None:
+            raise ValueError("Missing fmt or data chunk")
+
+        format_code, self.channels, self.sample_rate, _, block_align, bits = struct.unpack("<HHIIHH", fmt[:16])
+        if format_code == g_formatExtensible and len(fmt) >= 26:
+            format_code = struct.unpack("<H", fmt[24:26])[0]
+
+        self.dtype = g_sampleTypes.get((format_code, bits))
+        if self.dtype is None or block_align != self.channels * self.dtype.itemsize:
+            raise ValueError(f"Cannot memory-map {bits} bit samples with format {format_code:#x}")
+
+        # files that were not closed properly may claim more data than they have
+        data_size = min(data_size, file_size - data_offset)
+        num_frames = data_size // block_align
+        if num_frames == 0:
+            raise ValueError("No samples in data chunk")
+
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._data_offset = data_offset
+        self._block_align = block_align
+        self.samples = np.frombuffer(self._map, self.dtype, num_frames * self.channels, data_offset)
+        self.samples = self.samples.reshape(num_frames, self.channels)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def toFloat(self, frames):
+        """
+        Converts a (frame, channel) slice of samples to float32 in the range -1 to 1,
+        the same way soundfile converts them
+        """
+        block = frames.astype(np.float32)
+        if self.dtype.kind == "u":
+            block -= 128
+            block *= 1 / 128
+        elif self.dtype.kind == "i":
+            block *= 1 / (1 << (8 * self.dtype.itemsize - 1))
+        return block
+
+    def blocks(self, blocksize):
+        """
+        Yields the audio as (frame, channel) float32 blocks of blocksize frames, converting one block at a time
+        """
+        for start in range(0, len(self.samples), blocksize):
+            yield self.toFloat(self.samples[start:start + blocksize])
+            self._release(start + blocksize)
+
+    def _release(self, end):
+        """
+        Lets the operating system drop the pages of every frame before end, so reading a file
+        from start to finish does not keep all of it resident
+        """
+        if not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        end_byte = min(self._data_offset + end * self._block_align, len(self._map))
+        length = end_byte - end_byte % mmap.PAGESIZE
+        if length > 0:
+            self._map.madvise(mmap.MADV_DONTNEED, 0, length)
@@ -0,0 +1,49 @@
+# Headless entry point that writes the graphs and numbers of whole directories of recordings to disk
+
+import argparse
+import sys
+
+# non interactive backend so that nothing tries to open a display
+import matplotlib
+matplotlib.use("Agg")
+
+from controller.batch import findFiles, g_resultFormats
+from controller.export import writeExport, g_defaultImageFormats, g_exportDpi, g_imageFormats
+from model.stft import g_defaultSettings
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write the graphs and RT60 values of many audio files to a directory")
+    parser.add_argument("sources", nargs="+", help="audio files, directories or glob patterns")
+    parser.add_argument("-o", "--output", required=True, help="directory the graphs and summary are written into")
+    parser.add_argument("-i", "--image-format", action="append", dest="formats", choices=g_imageFormats,
+                        help="format graphs are written as, may be given more than once, "
+                             "defaults to " + " and ".join(g_defaultImageFormats))
+    parser.add_argument("-s", "--summary", choices=g_resultFormats, default="csv",
+                        help="format of the summary with a row for every file, written as summary.<format>")
+    parser.add_argument("--dpi", type=int, default=g_exportDpi, help="resolution graphs are written at")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of worker processes, defaults to one per CPU")
+    parser.add_argument("-r", "--recursive", action="store_true", help="search directories recursively")
+    parser.add_argument("--stream", action=argparse.BooleanOptionalAction, default=None,
+                        help="read files block by block to bound memory, by default only long files are streamed")
+    parser.add_argument("--sample-rate", type=int, default=None,
+                        help="rate files are resampled to before they are analyzed, by default they keep their own")
+    parser.add_argument("--no-cache", dest="cache", action="store_false",
+                        help="always analyze files instead of reusing cached results, and do not cache new ones")
+    args = parser.parse_args(argv)
+
+    paths = findFiles(args.sources, args.recursive)
+    if not paths:
+        print("No audio files found", file=sys.stderr)
+        return 1
+
+    formats = args.formats or g_defaultImageFormats
+    failed = writeExport(paths, args.output, formats, args.summary, args.workers, dpi=args.dpi, stream=args.stream,
+                         settings=g_defaultSettings, use_cache=args.cache, sample_rate=args.sample_rate)
+    for row in failed:
+        print(f"{row['file']}: {row['error']}", file=sys.stderr)
+    print(f"Exported {len(paths) - len(failed)} of {len(paths)} files to {args.output}", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
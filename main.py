@@ -1,9 +1,18 @@
-from model import get_window_instance
-from view import AppWindow
-
-import pyglet
+import argparse
 
+# worker processes run this file again before they start, so the window is only imported when it opens
 if __name__ == "__main__":
-    window = AppWindow()
+    from model import get_window_instance
+    from view import AppWindow
+
+    import pyglet
+
+    parser = argparse.ArgumentParser(description="Analyze the reverberation of audio files")
+    parser.add_argument("--live-file", help="file played as the live input instead of the default input device, press L to start")
+    parser.add_argument("--profile", action="store_true", help="show how long each stage takes in an overlay, press P to toggle it")
+    parser.add_argument("--trace", help="file every timed stage is written to as a Chrome trace when the window closes")
+    args = parser.parse_args()
+
+    window = AppWindow(args.live_file, args.profile, args.trace)
     get_window_instance(window)
     pyglet.app.run()
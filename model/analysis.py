@@ -0,0 +1,232 @@
+# Handles turning audio into the numbers shown by the application, without creating any figures
+
+import numpy as np
+
+from .profiler import span
+from .decay import DecayAnalysis, DecayFit, calculateDecays
+from .bands import bandCentres, getAnalysisBands, getBandMatrix, calculateBandPowers
+from .stft import calculateSTFT, g_defaultSettings
+from .waveform import WaveformPyramid
+from .utils import (BandRT60s, calculateBandRT60s, calculateFramePeaks, calculateLength, convertToDecibels,
+                    getLoudestPeak)
+
+class AnalysisResult:
+    """
+    Everything that is calculated from a single audio file, without the audio itself.
+
+    sample_rate is in Hz and seconds is the length of the audio.
+    spectrum is float32 laid out as (frequency, time) and matches the float32 freqs and times.
+    bands are the target frequencies, decibels is float32 laid out as (band, time) with a decibel
+    curve for every band and rt60_info is the BandRT60s of the bands.
+    res_freq is the frequency with the most power. peak_freqs and peak_powers hold the frequency with
+    the most power in every frame and that power, from which the resonant frequency of any part of the
+    audio can be found.
+
+    waveform is the WaveformPyramid the waveform figure is drawn from, which does not keep the
+    samples, so the audio can be freed as soon as it has been analyzed.
+
+    iso_bands are the mid-band frequencies of the ISO 3382 octave or third-octave bands, with
+    a row of iso_decibels and an RT60 value in iso_rt60s for each of them.
+    decay and iso_decay are the DecayAnalysis of the Schroeder curves of bands and iso_bands,
+    with the EDT, T20 and T30 of every band and how well they fit.
+
+    channel_rt60s and channel_iso_rt60s are laid out as (channel, band) and hold the RT60 of every
+    band and ISO 3382 band for each channel of the audio on its own, everything else is calculated
+    from the average of the channels.
+
+    Results of streamed files have a waveform with only decimated levels and a spectrum that is
+    reduced in time, so it has its own spectrum_times.
+
+    Results are pickled as the arrays of resultToArrays, so they are sent to other processes as a
+    few contiguous buffers instead of a tree of objects.
+    """
+    __slots__ = ("sample_rate", "seconds", "spectrum", "freqs", "times", "spectrum_times", "bands", "decibels",
+                 "rt60_info", "res_freq", "peak_freqs", "peak_powers", "waveform", "iso_bands", "iso_decibels",
+                 "iso_rt60s", "decay", "iso_decay", "channel_rt60s", "channel_iso_rt60s")
+
+    def __init__(self, sample_rate, seconds, spectrum, freqs, times, bands, decibels, rt60_info, res_freq,
+                 waveform, spectrum_times=None, iso_bands=(), iso_decibels=None, iso_rt60s=None,
+                 decay=None, iso_decay=None, channel_rt60s=None, channel_iso_rt60s=None, peak_freqs=None,
+                 peak_powers=None):
+        self.sample_rate = sample_rate
+        self.seconds = seconds
+        self.spectrum = np.asarray(spectrum, np.float32)
+        self.freqs = np.asarray(freqs, np.float32)
+        self.times = np.asarray(times, np.float32)
+        self.spectrum_times = self.times if spectrum_times is None else np.asarray(spectrum_times, np.float32)
+        self.bands = bands
+        self.decibels = np.asarray(decibels, np.float32)
+        self.rt60_info = rt60_info
+        self.res_freq = res_freq
+        self.peak_freqs = None if peak_freqs is None else np.asarray(peak_freqs, np.float32)
+        self.peak_powers = None if peak_powers is None else np.asarray(peak_powers, np.float32)
+        self.waveform = waveform
+        self.iso_bands = iso_bands
+        self.iso_decibels = None if iso_decibels is None else np.asarray(iso_decibels, np.float32)
+        self.iso_rt60s = iso_rt60s
+        self.decay = decay
+        self.iso_decay = iso_decay
+        self.channel_rt60s = channel_rt60s
+        self.channel_iso_rt60s = channel_iso_rt60s
+
+    def __reduce__(self):
+        return resultFromArrays, (resultToArrays(self),)
+
+    @property
+    def rt60s(self):
+        """
+        RT60 value of every band in seconds
+        """
+        return self.rt60_info.rt60
+
+# attributes of a DecayAnalysis that hold a DecayFit
+g_decayFits = ("edt", "t20", "t30")
+
+def resultToArrays(result):
+    """
+    Returns a dictionary of NumPy arrays that hold everything in an AnalysisResult, so that it
+    can be saved with np.savez and loaded without pickling. Only the finest level of the waveform
+    is kept, the others are calculated again from it.
+    """
+    bucket_size, mins, maxs = result.waveform.levels[0]
+    arrays = {
+        "sample_rate": np.asarray(result.sample_rate),
+        "seconds": np.asarray(result.seconds),
+        "spectrum": result.spectrum,
+        "freqs": result.freqs,
+        "times": result.times,
+        "spectrum_times": result.spectrum_times,
+        "bands": np.asarray(result.bands),
+        "decibels": result.decibels,
+        "rt60": result.rt60_info.rt60,
+        "rt60_peak": result.rt60_info.peak,
+        "rt60_peak_decibels": result.rt60_info.peak_decibels,
+        "rt60_end": result.rt60_info.end,
+        "res_freq": np.asarray(result.res_freq),
+        "peak_freqs": result.peak_freqs,
+        "peak_powers": result.peak_powers,
+        "num_samples": np.asarray(result.waveform.num_samples),
+        "bucket_size": np.asarray(bucket_size),
+        "mins": mins,
+        "maxs": maxs,
+        "iso_bands": np.asarray(result.iso_bands),
+        "iso_decibels": result.iso_decibels,
+        "iso_rt60s": result.iso_rt60s,
+        "channel_rt60s": result.channel_rt60s,
+        "channel_iso_rt60s": result.channel_iso_rt60s,
+    }
+    for prefix, decay in (("decay", result.decay), ("iso_decay", result.iso_decay)):
+        arrays[f"{prefix}_curves"] = decay.curves
+        arrays[f"{prefix}_peaks"] = decay.peaks
+        for name in g_decayFits:
+            fit = getattr(decay, name)
+            arrays[f"{prefix}_{name}"] = np.stack((fit.time, fit.r2, fit.points))
+    return arrays
+
+def resultFromArrays(arrays):
+    """
+    Returns the AnalysisResult of a dictionary made by resultToArrays
+    """
+    decays = {}
+    for prefix in ("decay", "iso_decay"):
+        fits = [DecayFit(time, r2, points.astype(int)) for time, r2, points in
+                (arrays[f"{prefix}_{name}"] for name in g_decayFits)]
+        decays[prefix] = DecayAnalysis(arrays[f"{prefix}_curves"], arrays[f"{prefix}_peaks"], *fits)
+
+    sample_rate = int(arrays["sample_rate"])
+    waveform = WaveformPyramid(sample_rate, int(arrays["num_samples"]), arrays["mins"], arrays["maxs"],
+                               int(arrays["bucket_size"]))
+    rt60_info = BandRT60s(arrays["rt60"], arrays["rt60_peak"], arrays["rt60_peak_decibels"], arrays["rt60_end"])
+
+    return AnalysisResult(sample_rate=sample_rate, seconds=float(arrays["seconds"]),
+                          spectrum=arrays["spectrum"], freqs=arrays["freqs"], times=arrays["times"],
+                          bands=list(arrays["bands"]), decibels=arrays["decibels"], rt60_info=rt60_info,
+                          res_freq=arrays["res_freq"][()], peak_freqs=arrays["peak_freqs"],
+                          peak_powers=arrays["peak_powers"], waveform=waveform, spectrum_times=arrays["spectrum_times"],
+                          iso_bands=tuple(arrays["iso_bands"]), iso_decibels=arrays["iso_decibels"],
+                          iso_rt60s=arrays["iso_rt60s"], decay=decays["decay"], iso_decay=decays["iso_decay"],
+                          channel_rt60s=arrays["channel_rt60s"], channel_iso_rt60s=arrays["channel_iso_rt60s"])
+
+def getFramePeriod(times):
+    """
+    Returns the time between the frames of a spectrum
+    """
+    return times[1] - times[0] if len(times) > 1 else 0.0
+
+def splitBandResults(bands, decibels, rt60_info, decay, fraction, channel_rt60s=None):
+    """
+    Splits the (band, time) decibels, BandRT60s and DecayAnalysis of the bands
+    from getAnalysisBands into keyword arguments for AnalysisResult.
+
+    channel_rt60s are the (channel, band) RT60s of every channel on its own, None if the audio
+    has a single channel, whose RT60s are those of rt60_info.
+    """
+    count = len(bands)
+    if channel_rt60s is None:
+        channel_rt60s = np.asarray(rt60_info.rt60)[np.newaxis]
+    return {
+        "bands": list(bands),
+        "decibels": decibels[:count],
+        "rt60_info": rt60_info[:count],
+        "decay": decay[:count],
+        "iso_bands": bandCentres(fraction),
+        "iso_decibels": decibels[count:],
+        "iso_rt60s": rt60_info.rt60[count:],
+        "iso_decay": decay[count:],
+        "channel_rt60s": channel_rt60s[:, :count],
+        "channel_iso_rt60s": channel_rt60s[:, count:],
+    }
+
+def calculateChannelRT60s(sample_rate, channels, bands, fraction=1, settings=g_defaultSettings):
+    """
+    Returns the RT60 of every band from getAnalysisBands for each channel of audio laid out as
+    (sample, channel), as an array laid out as (channel, band)
+    """
+    matrix = getBandMatrix(sample_rate, settings.NFFT, getAnalysisBands(bands, fraction))
+    rt60s = []
+    for channel in channels.T:
+        spectrum, _, times = calculateSTFT(sample_rate, np.ascontiguousarray(channel), settings)
+        decibels = convertToDecibels(calculateBandPowers(spectrum, matrix))
+        rt60s.append(calculateBandRT60s(decibels, times).rt60)
+    return np.array(rt60s)
+
+def analyzeSoundFile(sample_rate, data, bands, fraction=1, settings=g_defaultSettings, channels=None):
+    """
+    Returns an AnalysisResult for the audio.
+
+    Takes in the sample_rate, a numpy array of data that represents the audio file, the
+    target frequencies of the bands that RT60 should be calculated for, the fraction of
+    an octave the ISO 3382 bands are wide and the STFTSettings of the spectrum.
+
+    channels are the separate channels data was mixed from, laid out as (sample, channel).
+    When there is more than one, the RT60s of each channel are also calculated on their own.
+    """
+    with span("stft", samples=len(data)):
+        spectrum, freqs, times = calculateSTFT(sample_rate, data, settings)
+
+    # every band is calculated in one pass with a matrix that is cached per sample rate
+    with span("bands"):
+        matrix = getBandMatrix(sample_rate, settings.NFFT, getAnalysisBands(bands, fraction))
+        powers = calculateBandPowers(spectrum, matrix)
+        decibels = convertToDecibels(powers)
+    with span("rt60"):
+        rt60_info = calculateBandRT60s(decibels, times)
+    with span("decay"):
+        decay = calculateDecays(powers, getFramePeriod(times))
+
+    seconds = calculateLength(sample_rate, data)
+    with span("resonance"):
+        peak_freqs, peak_powers = calculateFramePeaks(spectrum, freqs)
+        res_freq = getLoudestPeak(peak_freqs, peak_powers)
+    # the pyramid does not keep the samples, so nothing holds on to the audio once it is analyzed
+    with span("waveform"):
+        waveform = WaveformPyramid.fromSamples(sample_rate, data, keep=False)
+
+    channel_rt60s = None
+    if channels is not None and channels.shape[1] > 1:
+        with span("channels", channels=channels.shape[1]):
+            channel_rt60s = calculateChannelRT60s(sample_rate, channels, bands, fraction, settings)
+
+    return AnalysisResult(sample_rate=sample_rate, seconds=seconds, spectrum=spectrum, freqs=freqs,
+                          times=times, res_freq=res_freq, peak_freqs=peak_freqs, peak_powers=peak_powers,
+                          waveform=waveform, **splitBandResults(bands, decibels, rt60_info, decay, fraction, channel_rt60s))
@@ -0,0 +1,73 @@
+# Handles grouping the frequencies of a spectrum into bands, such as the octave bands of ISO 3382
+
+import functools
+
+import numpy as np
+
+# range of the bands RT60 is reported for by ISO 3382
+g_lowestBand = 125
+g_highestBand = 8000
+
+# R10 preferred numbers, nominal mid-band frequencies are these times a power of ten
+g_preferredNumbers = (1, 1.25, 1.6, 2, 2.5, 3.15, 4, 5, 6.3, 8, 10)
+
+def bandCentres(fraction=1, low=g_lowestBand, high=g_highestBand):
+    """
+    Returns the exact mid-band frequencies of 1/fraction octave bands from low to high Hz.
+
+    Mid-band frequencies are 1 kHz times powers of two, so fraction=1 gives octave bands
+    and fraction=3 gives third-octave bands.
+    """
+    lowest = int(np.round(fraction * np.log2(low / 1000)))
+    highest = int(np.round(fraction * np.log2(high / 1000)))
+    return tuple(1000 * 2 ** (np.arange(lowest, highest + 1) / fraction))
+
+def nominalFrequency(freq):
+    """
+    Returns the nominal frequency a band is labelled with, such as 1250 for 1259.9 Hz
+    """
+    decade = 10 ** np.floor(np.log10(freq))
+    mantissa = min(g_preferredNumbers, key=lambda number: abs(np.log(number * decade / freq)))
+    return round(float(mantissa * decade), 1)
+
+@functools.lru_cache(maxsize=32)
+def getBandMatrix(sample_rate, NFFT, bands):
+    """
+    Returns a read only (band, frequency) matrix that sums the frequencies of a spectrum into bands.
+
+    bands is a tuple of (centre, fraction) pairs. A fraction of None selects only the frequency
+    closest to centre, otherwise every frequency within the 1/fraction octave band around centre
+    is selected. Bands narrower than the spacing of frequencies fall back to the closest one.
+    Matrices are cached per sample_rate, NFFT and bands as they only depend on those.
+    """
+    freqs = np.fft.rfftfreq(NFFT, 1 / sample_rate)
+    matrix = np.zeros((len(bands), len(freqs)))
+
+    for row, (centre, fraction) in enumerate(bands):
+        closest = np.abs(freqs - centre).argmin()
+        start, stop = closest, closest + 1
+        if fraction is not None:
+            half_width = 2 ** (1 / (2 * fraction))
+            lower, upper = np.searchsorted(freqs, (centre / half_width, centre * half_width))
+            if upper > lower:
+                start, stop = lower, upper
+        matrix[row, start:stop] = 1
+
+    matrix.flags.writeable = False
+    return matrix
+
+def calculateBandPowers(spectrum, matrix):
+    """
+    Returns the power of every band at every time, laid out as (band, time).
+
+    spectrum is laid out as (frequency, time) and matrix comes from getBandMatrix, so every
+    band is calculated in a single pass over the spectrum.
+    """
+    return matrix @ spectrum
+
+def getAnalysisBands(bands, fraction):
+    """
+    Returns the (centre, fraction) pairs of the bands an analysis calculates, that is the
+    single frequencies in bands followed by the 1/fraction octave bands of ISO 3382
+    """
+    return tuple((freq, None) for freq in bands) + tuple((centre, fraction) for centre in bandCentres(fraction))
@@ -0,0 +1,142 @@
+# Handles measuring reverberation time from Schroeder decay curves, as described by ISO 3382
+
+import numpy as np
+
+# decibel ranges below the peak that each decay time is fitted over
+g_edtRange = (0, -10)
+g_t20Range = (-5, -25)
+g_t30Range = (-5, -35)
+
+# fraction of the end of a recording used to estimate its background noise
+g_noiseFraction = 0.1
+
+# fits with fewer points or a lower coefficient of determination are not valid measurements
+g_minPoints = 5
+g_minR2 = 0.98
+
+class DecayFit:
+    """
+    Least squares line fitted to a decay curve over one decibel range.
+
+    Every attribute is an array with one value per curve. time is the decay time in seconds
+    extrapolated to 60 dB, nan where the curve does not decay over the whole range.
+    r2 is the coefficient of determination of the fit and points the number of frames it used.
+    """
+    def __init__(self, time, r2, points):
+        self.time = time
+        self.r2 = r2
+        self.points = points
+
+    def __getitem__(self, index):
+        return DecayFit(self.time[index], self.r2[index], self.points[index])
+
+    @property
+    def valid(self):
+        """
+        True for fits with enough points that are close enough to a straight line
+        """
+        return (self.points >= g_minPoints) & (self.r2 >= g_minR2) & np.isfinite(self.time)
+
+class DecayAnalysis:
+    """
+    Schroeder decay curves and the EDT, T20 and T30 fitted to them.
+
+    curves are in dB relative to the energy at each curve's peak, with nan before the peak.
+    curvature is how far T30 is from T20 in percent, which ISO 3382 expects to be between 0 and 10.
+    Indexing selects curves, so the decays of a subset of bands can be passed around on their own.
+    """
+    def __init__(self, curves, peaks, edt, t20, t30):
+        self.curves = curves
+        self.peaks = peaks
+        self.edt = edt
+        self.t20 = t20
+        self.t30 = t30
+
+    def __getitem__(self, index):
+        return DecayAnalysis(self.curves[index], self.peaks[index], self.edt[index], self.t20[index], self.t30[index])
+
+    @property
+    def curvature(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return 100 * (self.t30.time / self.t20.time - 1)
+
+    @property
+    def valid(self):
+        """
+        True for curves whose T20 can be trusted as a measurement
+        """
+        return self.t20.valid
+
+def calculateSchroederCurves(powers, lengths=None):
+    """
+    Returns the Schroeder decay curves of (..., time) arrays of linear power and the index of
+    each curve's peak.
+
+    Background noise, estimated from the last g_noiseFraction of each curve, is subtracted before
+    the power is integrated backwards from the end with a single reversed cumsum.
+    lengths is the number of frames in each curve when curves of different lengths are padded
+    to the same shape, frames past a curve's length are ignored.
+    """
+    powers = np.asarray(powers, dtype=float)
+    frames = np.arange(powers.shape[-1])
+    if lengths is None:
+        lengths = np.full(powers.shape[:-1], powers.shape[-1])
+    lengths = np.asarray(lengths)[..., np.newaxis]
+    inside = frames < lengths
+
+    tail = inside & (frames >= lengths - np.maximum((lengths * g_noiseFraction).astype(int), 1))
+    noise = np.where(tail, powers, 0).sum(axis=-1, keepdims=True) / tail.sum(axis=-1, keepdims=True)
+    clean = np.where(inside, np.clip(powers - noise, 0, None), 0)
+
+    peaks = np.where(inside, powers, -np.inf).argmax(axis=-1)
+    energy = np.cumsum(clean[..., ::-1], axis=-1)[..., ::-1]
+    reference = np.take_along_axis(energy, peaks[..., np.newaxis], axis=-1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        curves = 10 * np.log10(energy / reference)
+    curves[frames < peaks[..., np.newaxis]] = np.nan
+    return curves, peaks
+
+def fitDecay(curves, frame_period, upper, lower):
+    """
+    Fits a line by least squares to the part of every curve between upper and lower dB and
+    returns a DecayFit.
+
+    Only curves that fall below lower have a decay time, as the whole range has to be present.
+    """
+    t = np.arange(curves.shape[-1]) * frame_period
+    with np.errstate(invalid="ignore"):
+        mask = (curves <= upper) & (curves >= lower)
+        reached = (curves < lower).any(axis=-1)
+
+    points = mask.sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # centring on the means keeps the sums accurate for long recordings
+        mean_t = np.where(mask, t, 0).sum(axis=-1) / points
+        mean_L = np.where(mask, curves, 0).sum(axis=-1) / points
+        dt = np.where(mask, t - mean_t[..., np.newaxis], 0)
+        dL = np.where(mask, curves - mean_L[..., np.newaxis], 0)
+
+        var_t = (dt * dt).sum(axis=-1)
+        var_L = (dL * dL).sum(axis=-1)
+        cov = (dt * dL).sum(axis=-1)
+
+        slope = cov / var_t
+        r2 = cov * cov / (var_t * var_L)
+        time = np.where(reached & (points >= 2) & (slope < 0), -60 / slope, np.nan)
+
+    return DecayFit(time, np.nan_to_num(r2), points)
+
+def calculateDecays(powers, frame_period, lengths=None):
+    """
+    Returns a DecayAnalysis of (..., time) arrays of linear band power with frames frame_period
+    seconds apart.
+
+    Any number of leading dimensions is allowed, so every band of every impulse of a recording can be
+    analyzed at once by padding them to the same number of frames and passing their lengths.
+    """
+    curves, peaks = calculateSchroederCurves(powers, lengths)
+    return DecayAnalysis(curves, peaks,
+                         fitDecay(curves, frame_period, *g_edtRange),
+                         fitDecay(curves, frame_period, *g_t20Range),
+                         fitDecay(curves, frame_period, *g_t30Range))
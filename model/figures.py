@@ -1,89 +1,476 @@
 # Handles generating figures for audio files
 
+import threading
+
 import numpy as np
 
-import matplotlib.pyplot as plt
-from matplotlib.figure import Figure
+import matplotlib
 
-from .utils import calculateLength, convertToDecibels
+from .analysis import getFramePeriod
+from .bands import nominalFrequency
+from .profiler import span
+from .plots import newDecibelPlot, newWaveformPlot
+from .spectrogram import SpectrogramImage
+from .utils import convertToDecibels, getAmplitudeLimits, getDecibelLimits, g_decibelStep
 
 # global variables determining figure size and dimensions for all figures passed to view
 g_figSize = (16, 7)
 g_dpi = 75
 
-def newWaveformFigure(sample_rate, data):
+# names of the bands in the combined graph
+g_combinedLabels = ("Low Frequency", "Mid Frequency", "High Frequency")
+
+def newFigure():
     """
-    Returns a new figure of amplitude plotted over time.
+    Returns an empty figure of the size every figure passed to view has
     """
-    fig = Figure(g_figSize, dpi=g_dpi)
+    # matplotlib's figures and Agg canvas take a third of a second to import, so the window can open
+    # before they are imported
+    from matplotlib.figure import Figure
 
-    # determines the values of the x axis
-    length = calculateLength(sample_rate, data)
-    xValues = np.linspace(0, length, len(data))
+    return Figure(g_figSize, dpi=g_dpi)
 
-    # creates the x axis on the figure
-    ax = fig.add_subplot(111)
-    ax.set_xlim(0, length)
-    ax.set_xlabel("Time (s)")
-    ax.set_ylabel("Amplitude")
-    ax.set_title("Waveform")
+def getCanvas(fig):
+    """
+    Returns the Agg canvas of a figure, giving it one if it does not have one yet
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
 
-    # plot entire graph
-    ax.plot(xValues, data)
+    return fig.canvas if isinstance(fig.canvas, FigureCanvasAgg) else FigureCanvasAgg(fig)
 
-    return fig
+def renderFigure(fig):
+    """
+    Draws a figure and returns its RGBA pixels and their width and height
+    """
+    canvas = getCanvas(fig)
+    with span("agg draw"):
+        canvas.draw()
+        return bytes(canvas.buffer_rgba()), canvas.get_width_height()
 
-def newSpectrogramFigure(sample_rate, data):
+class ManagedFigure:
     """
-    Returns three arguments:
-    1. a new figure of the spectrogram of the audio file and
-    2. frequencies of the audio file
-    3. spectrum of the audio file
+    A figure that is kept and drawn again with new data instead of being built again.
+
+    artists are the parts of the figure that change with the data. Everything else, the axes,
+    ticks, labels and colorbar, is drawn once into a cached background. While the limits of the
+    axes and colors stay the same, rendering only restores that background and draws artists
+    on top of it.
     """
-    fig = Figure(g_figSize, dpi=g_dpi)
+    def __init__(self, figure, artists):
+        self.figure = figure
+        self.artists = artists
+        self.canvas = getCanvas(figure)
+        self.background = None
+        self.layout = None
 
-    # create spectrogram axis
-    ax = fig.add_subplot(111)
-    spectrum, freqs, t, im = ax.specgram(data, Fs=sample_rate, NFFT=1024, cmap=plt.get_cmap("autumn_r"))
+    def render(self):
+        """
+        Returns the RGBA pixels of the figure and their width and height
+        """
+        layout = self._getLayout()
+        with span("agg draw", background=layout != self.layout):
+            return self._draw(layout)
 
-    # gradient of colors matched to the intensity (dB) they represent
-    cbar = fig.colorbar(im)
-    cbar.set_label("Intensity (dB)")
+    def _draw(self, layout):
+        visible = [artist.get_visible() for artist in self.artists]
 
-    # set relevant labels
-    ax.set_xlabel("Time (s)")
-    ax.set_ylabel("Frequency (Hz)")
-    ax.set_title("Audio spectrogram")
+        if layout != self.layout:
+            # the background is everything but the artists
+            for artist in self.artists:
+                artist.set_visible(False)
+            self.canvas.draw()
+            self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+            self.layout = layout
+            for artist, shown in zip(self.artists, visible):
+                artist.set_visible(shown)
+        else:
+            self.canvas.restore_region(self.background)
 
-    return fig, freqs, spectrum, t
+        renderer = self.canvas.get_renderer()
+        for artist, shown in zip(self.artists, visible):
+            if shown:
+                artist.draw(renderer)
 
-def newDecibelFigure(seconds, t, decibels):
+        return bytes(self.canvas.buffer_rgba()), self.canvas.get_width_height()
+
+    def _getLayout(self):
+        """
+        Returns everything the background depends on that changes with the data
+        """
+        layout = []
+        for ax in self.figure.axes:
+            layout.append((ax.get_xlim(), ax.get_ylim(), ax.get_title()))
+        for artist in self.artists:
+            if hasattr(artist, "get_clim"):
+                layout.append(artist.get_clim())
+        return layout
+
+class FigureManager:
     """
-    Returns a new figure of decibels over time with proper labels
+    Keeps a ManagedFigure for every graph shown for a file, and updates it with the data of
+    whichever file is being drawn.
+
+    Figures are created the first time they are needed and are only given new data after that,
+    so the layout, colorbar and axes are not set up again for every file. Figures are shared, so
+    updating and rendering one is done while holding lock.
     """
-    dec_fig = Figure(g_figSize, dpi=g_dpi)
-    ax = dec_fig.add_subplot(111)
-    ax.set_xlim(0, seconds)
-    ax.set_xlabel("Time (s)")
-    ax.set_ylabel("Power (dB)")
+    def __init__(self):
+        self.figures = {}
+        self.lock = threading.RLock()
+
+    def waveform(self, waveform, start=0.0, end=None):
+        """
+        Returns the ManagedFigure of amplitude over time.
+
+        waveform is a WaveformPyramid, only as many points as the figure has pixels are drawn
+        between start and end seconds, as the area between the minimum and maximum amplitude.
+        """
+        managed = self.figures.get("waveform")
+        if managed is None:
+            fig = newFigure()
+            ax = fig.add_subplot(111)
+            ax.set_xlabel("Time (s)")
+            ax.set_ylabel("Amplitude")
+            ax.set_title("Waveform")
+
+            line, = ax.plot([], [])
+            # the outline is as wide as a plotted line so that quiet parts look the same
+            fill = ax.fill_between([], [], [], linewidth=matplotlib.rcParams["lines.linewidth"], edgecolor="C0", facecolor="C0")
+            managed = self.figures["waveform"] = ManagedFigure(fig, [line, fill])
+
+        if end is None:
+            end = waveform.seconds
+        line, fill = managed.artists
+        ax = line.axes
+
+        # two buckets per pixel draws the same picture as plotting every sample
+        times, mins, maxs = waveform.envelope(2 * g_figSize[0] * g_dpi, start, end)
+        raw = mins is maxs
+        line.set_visible(raw)
+        fill.set_visible(not raw)
+        if raw:
+            line.set_data(times, mins)
+        else:
+            fill.set_verts([np.concatenate((np.column_stack((times, mins)), np.column_stack((times[::-1], maxs[::-1]))))])
+
+        peak = max(np.abs(mins).max(initial=0), np.abs(maxs).max(initial=0))
+        ax.set_xlim(start, end)
+        ax.set_ylim(*getAmplitudeLimits(peak))
+
+        return managed
+
+    def spectrogram(self, result):
+        """
+        Returns the ManagedFigure of the spectrogram of an AnalysisResult.
+
+        The spectrum has already been calculated by the analysis, so this only draws it.
+        """
+        managed = self.figures.get("spectrogram")
+        if managed is None:
+            fig = newFigure()
+            ax = fig.add_subplot(111)
+            image = ax.imshow(np.zeros((2, 2)), cmap=matplotlib.colormaps["autumn_r"], origin="upper")
+            ax.axis("auto")
 
-    ax.plot(t, decibels)
+            # gradient of colors matched to the intensity (dB) they represent
+            cbar = fig.colorbar(image)
+            cbar.set_label("Intensity (dB)")
 
-    return dec_fig
+            # set relevant labels
+            ax.set_xlabel("Time (s)")
+            ax.set_ylabel("Frequency (Hz)")
+            ax.set_title("Audio spectrogram")
+            managed = self.figures["spectrogram"] = ManagedFigure(fig, [image])
+
+        image, = managed.artists
+
+        # spectrum is drawn in dB with the lowest frequency at the bottom
+        decibels = np.flipud(convertToDecibels(result.spectrum))
+
+        # each column is centered on its time, so pad half a column on either side
+        times = result.spectrum_times
+        pad = (times[1] - times[0]) / 2 if len(times) > 1 else times[0]
+        extent = (times[0] - pad, times[-1] + pad, result.freqs[0], result.freqs[-1])
+
+        image.set_data(decibels)
+        image.set_extent(extent)
+        image.set_clim(*getDecibelLimits(decibels))
+
+        return managed
+
+    def decibels(self, slot, seconds, t, decibels):
+        """
+        Returns the ManagedFigure of decibels over time for graph number slot
+        """
+        managed = self.figures.get(("decibels", slot))
+        if managed is None:
+            fig = newFigure()
+            ax = fig.add_subplot(111)
+            ax.set_xlabel("Time (s)")
+            ax.set_ylabel("Power (dB)")
+            line, = ax.plot([], [])
+            managed = self.figures[("decibels", slot)] = ManagedFigure(fig, [line])
+
+        line, = managed.artists
+        line.set_data(t, decibels)
+        line.axes.set_xlim(0, seconds)
+        line.axes.set_ylim(*getDecibelLimits(decibels))
+
+        return managed
+
+    def combined(self, seconds, t, low_decibel, mid_decibel, high_decibel):
+        """
+        Returns the ManagedFigure of the low decibel, mid decibel, and high decibel graphs combined
+        """
+        managed = self.figures.get("combined")
+        if managed is None:
+            fig = newFigure()
+            ax = fig.add_subplot(111)
+            ax.set_xlabel("Time (s)")
+            ax.set_ylabel("Power (dB)")
+            lines = [ax.plot([], [], label=label)[0] for label in g_combinedLabels]
+            ax.legend(loc="upper left")
+            managed = self.figures["combined"] = ManagedFigure(fig, lines)
+
+        decibels = (low_decibel, mid_decibel, high_decibel)
+        for line, values in zip(managed.artists, decibels):
+            line.set_data(t, values)
+        ax = managed.artists[0].axes
+        ax.set_xlim(0, seconds)
+        ax.set_ylim(*getDecibelLimits(np.concatenate(decibels)))
+
+        return managed
+
+def newWaveformFigure(waveform, start=0.0, end=None):
+    """
+    Returns a new figure of amplitude plotted over time, see FigureManager.waveform
+    """
+    return FigureManager().waveform(waveform, start, end).figure
+
+def newSpectrogramFigure(result):
+    """
+    Returns a new figure of the spectrogram of an AnalysisResult
+    """
+    return FigureManager().spectrogram(result).figure
+
+def newDecibelFigure(seconds, t, decibels):
+    """
+    Returns a new figure of decibels over time with proper labels
+    """
+    return FigureManager().decibels(0, seconds, t, decibels).figure
 
 def newCombinedDecibelFigure(seconds, t, low_decibel, mid_decibel, high_decibel):
     """
     Creates a combined graphic of the low decibel, mid decibel, and high decibel graphs
     """
-    combined_figure = Figure(g_figSize, dpi=g_dpi)
-    ax = combined_figure.add_subplot(111)
-    ax.set_xlim(0, seconds)
-    ax.set_xlabel("Time (s)")
-    ax.set_ylabel("Power (dB)")
+    return FigureManager().combined(seconds, t, low_decibel, mid_decibel, high_decibel).figure
+
+
+class FigureSet:
+    """
+    The graphs of an AnalysisResult in the order they are shown by the view.
+
+    The view draws every graph straight into pixels, at any zoom, with the plot that getPlot returns.
+    Matplotlib figures of the graphs are only built when they are taken by indexing, to be written to
+    files. They belong to manager, which gives every FigureSet of the same manager the same figures,
+    so a figure only shows this result until another result is drawn. A set made without a manager
+    makes its own the first time a figure is taken.
+    """
+    def __init__(self, result, manager=None):
+        self.result = result
+        self.manager = manager
+        self.plots = {}
+
+    def getPlot(self, index):
+        """
+        Returns a plot that draws graph number index straight into pixels between any two times,
+        a SpectrogramImage for the spectrogram and a CurvePlot for every other graph. Plots are
+        created the first time they are needed.
+        """
+        if index < 0:
+            index += len(self)
+        plot = self.plots.get(index)
+        if plot is None:
+            result = self.result
+            if index == 0:
+                plot = newWaveformPlot(result.waveform)
+            elif index == 1:
+                plot = SpectrogramImage(result)
+            elif index == len(self) - 1:
+                plot = newDecibelPlot(result.seconds, result.times, result.decibels[:3], g_combinedLabels)
+            else:
+                plot = newDecibelPlot(result.seconds, result.times, result.decibels[index - 2:index - 1])
+            self.plots[index] = plot
+        return plot
+
+    def __len__(self):
+        # waveform, spectrogram, one figure per band and the combined figure
+        return len(self.result.decibels) + 3
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("figure index out of range")
+
+        if self.manager is None:
+            self.manager = FigureManager()
+        with span("update figure", index=index):
+            return self._getManaged(index).figure
+
+    def _getManaged(self, index):
+        result = self.result
+        manager = self.manager
+        with manager.lock:
+            if index == 0:
+                return manager.waveform(result.waveform)
+            if index == 1:
+                return manager.spectrogram(result)
+            if index == len(self) - 1:
+                return manager.combined(result.seconds, result.times, *result.decibels)
+            return manager.decibels(index - 2, result.seconds, result.times, result.decibels[index - 2])
+
+
+def newRT60ComparisonFigure(names, results):
+    """
+    Returns a new figure with a group of bars for every ISO 3382 band and a bar in each group
+    for the RT60 of every file
+    """
+    fig = newFigure()
+    ax = fig.add_subplot(111)
+    ax.set_xlabel("Band (Hz)")
+    ax.set_ylabel("RT60 (s)")
+
+    positions = np.arange(len(results[0].iso_bands))
+    width = 0.8 / len(results)
+    for i, (name, result) in enumerate(zip(names, results)):
+        offset = (i - (len(results) - 1) / 2) * width
+        ax.bar(positions + offset, np.nan_to_num(result.iso_rt60s), width, label=name)
+
+    ax.set_xticks(positions, [f"{nominalFrequency(centre):g}" for centre in results[0].iso_bands])
+    ax.legend(loc="upper right")
+
+    return fig
+
+def newDecayComparisonFigure(names, results, band):
+    """
+    Returns a new figure of the Schroeder decay curve of one ISO 3382 band of every file,
+    each starting from its own peak so that decays recorded at different times line up
+    """
+    fig = newFigure()
+    ax = fig.add_subplot(111)
+    ax.set_xlabel("Time after peak (s)")
+    ax.set_ylabel("Decay (dB)")
+
+    for name, result in zip(names, results):
+        decay = result.iso_decay
+        t = (np.arange(decay.curves.shape[-1]) - decay.peaks[band]) * getFramePeriod(result.times)
+        ax.plot(t, decay.curves[band], label=name)
+
+    ax.set_xlim(left=0)
+    ax.set_ylim(-70, 5)
+    ax.legend(loc="upper right")
+
+    return fig
+
+class ComparisonFigureSet:
+    """
+    Lazily builds the figures that compare several AnalysisResults, like FigureSet does for one.
+
+    The first figure compares the RT60 of every ISO 3382 band, followed by a figure of the
+    decay curves of each band. titles holds the title of every figure.
+    """
+    def __init__(self, names, results):
+        self.names = list(names)
+        self.results = list(results)
+        bands = self.results[0].iso_bands if self.results else ()
+        self.titles = ["RT60 per Band"] + [f"Decay {nominalFrequency(centre):g} Hz" for centre in bands]
+
+    def __len__(self):
+        return len(self.titles) if self.results else 0
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("figure index out of range")
+
+        if index == 0:
+            return newRT60ComparisonFigure(self.names, self.results)
+        return newDecayComparisonFigure(self.names, self.results, index - 1)
+
+    def render(self, index):
+        """
+        Builds and draws figure number index and returns its RGBA pixels and their width and height
+        """
+        with span("build figure", index=index):
+            figure = self[index]
+        return renderFigure(figure)
+
+class LiveFigure:
+    """
+    Figure of the live spectrogram and band decibels of a LiveAnalyzer that is updated in place.
+
+    The figure, axes, image and lines are created once and update only replaces their data,
+    so it can be redrawn many times a second without building a new figure every time. Limits are
+    rounded to g_decibelStep so that the axes are usually reused from the cached background.
+    """
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self.figure = newFigure()
+        spectrum_ax, decibel_ax = self.figure.subplots(2, 1, sharex=True)
+
+        frames = analyzer.spectrum.capacity
+        seconds = (frames - 1) * analyzer.frame_period
+        freqs = analyzer.freqs
+
+        # frames that have not been recorded yet are nan and left blank
+        self.image = spectrum_ax.imshow(np.full((len(freqs), frames), np.nan), cmap=matplotlib.colormaps["autumn_r"],
+                                        extent=(-seconds, 0, freqs[0], freqs[-1]), origin="lower", aspect="auto")
+        spectrum_ax.set_ylabel("Frequency (Hz)")
+
+        self.times = np.linspace(-seconds, 0, frames)
+        self.lines = [decibel_ax.plot(self.times, np.full(frames, np.nan), label=label)[0]
+                      for label in g_combinedLabels[:len(analyzer.bands)]]
+        decibel_ax.set_xlim(-seconds, 0)
+        decibel_ax.set_xlabel("Time (s)")
+        decibel_ax.set_ylabel("Power (dB)")
+        decibel_ax.legend(loc="upper left")
+
+        self.decibel_ax = decibel_ax
+        self.title = spectrum_ax.set_title("Waiting for an impulse")
+        self.managed = ManagedFigure(self.figure, [self.image] + self.lines)
+
+    def render(self):
+        """
+        Updates the figure and returns its RGBA pixels and their width and height
+        """
+        self.update()
+        return self.managed.render()
+
+    def update(self):
+        """
+        Replaces the data of the figure with the latest snapshot of the analyzer and returns the figure
+        """
+        spectrum, decibels, _, events = self.analyzer.snapshot()
+        frames = self.analyzer.spectrum.capacity
+        missing = frames - len(spectrum)
+
+        image = np.full((frames, spectrum.shape[1]), np.nan)
+        with np.errstate(divide="ignore"):
+            image[missing:] = convertToDecibels(spectrum)
+        self.image.set_data(image.T)
+        high = getDecibelLimits(image)[1]
+        self.image.set_clim(high - 8 * g_decibelStep, high)
+
+        for band, line in enumerate(self.lines):
+            values = np.full(frames, np.nan)
+            values[missing:] = decibels[:, band]
+            line.set_ydata(values)
+        self.decibel_ax.set_ylim(*getDecibelLimits(decibels[:, :len(self.lines)]))
 
-    ax.plot(t, low_decibel, label="Low Frequency")
-    ax.plot(t, mid_decibel, label="Mid Frequency")
-    ax.plot(t, high_decibel, label="High Frequency")
-    ax.legend(loc="upper left")
+        if events:
+            rt60s = ", ".join(f"{rt60:.2f}" for rt60 in events[-1].rt60s)
+            self.title.set_text(f"Impulse at {events[-1].time:.1f}s, RT60: {rt60s}s")
 
-    return combined_figure
+        return self.figure
@@ -0,0 +1,112 @@
+# Handles splitting one recording of many impulses, such as claps walked around a room, into a segment
+# per impulse and measuring every segment at once
+
+import warnings
+
+import numpy as np
+
+from .analysis import getFramePeriod
+from .decay import calculateDecays
+from .live import (estimateNoise, g_floorDecibels, g_impulseSeconds, g_noiseSeedSeconds, g_noiseSmoothing,
+                   g_onsetDecibels, g_powerFloor)
+from .utils import calculateBandRT60s, convertToDecibels, getSegmentPeaks
+
+# impulses that start closer together than this many seconds are taken as one
+g_minImpulseSeconds = 0.5
+
+class ImpulseTable:
+    """
+    The impulses found in one recording and what was measured from each of them.
+
+    Every attribute has one row per impulse. starts and ends are the frames each segment starts and
+    stops at, times when it starts and lengths how long it is, in seconds. rt60s are laid out as
+    (impulse, band) with the RT60 of every band of the analysis and res_freqs are the frequency with
+    the most power in each segment. iso_rt60s and iso_decay are the RT60s and DecayAnalysis of the
+    ISO 3382 bands, laid out as (impulse, band).
+    """
+    def __init__(self, starts, ends, times, lengths, rt60s, res_freqs, iso_rt60s, iso_decay):
+        self.starts = starts
+        self.ends = ends
+        self.times = times
+        self.lengths = lengths
+        self.rt60s = rt60s
+        self.res_freqs = res_freqs
+        self.iso_rt60s = iso_rt60s
+        self.iso_decay = iso_decay
+
+    def __len__(self):
+        return len(self.starts)
+
+def summarizeImpulses(values):
+    """
+    Returns the mean and standard deviation over impulses of values laid out as (impulse, ...).
+    Impulses whose value is nan are left out, both are nan where no impulse has a value.
+    """
+    values = np.asarray(values, dtype=float)
+    # a band no impulse could be measured in warns about taking the mean of nothing
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmean(values, axis=0), np.nanstd(values, axis=0)
+
+def findImpulseSegments(levels, frame_period):
+    """
+    Returns the first frame of every impulse in levels, the decibels of every frame of a recording,
+    and the frame after its last.
+
+    Impulses start where the level rises g_onsetDecibels above the background noise, as they do in live
+    input, and their segments end where the next impulse starts or g_impulseSeconds later. The noise
+    starts from the first g_noiseSeedSeconds of the recording that are not silent.
+    """
+    from .kernels import findOnsets
+
+    levels = np.ascontiguousarray(levels, dtype=float)
+    noise = estimateNoise(levels, max(int(g_noiseSeedSeconds / frame_period), 1))
+    onsets = np.empty(len(levels), np.int64)
+    count, _, _, last = findOnsets(levels, 0, noise, True, -1, max(int(g_minImpulseSeconds / frame_period), 1),
+                                   float(g_onsetDecibels), g_noiseSmoothing, g_floorDecibels, onsets)
+    # the last impulse is still being recorded when the levels run out
+    starts = onsets[:count] if last < 0 else np.append(onsets[:count], last)
+
+    ends = np.append(starts[1:], len(levels))
+    return starts, np.minimum(ends, starts + max(int(g_impulseSeconds / frame_period), 1))
+
+def segmentImpulses(result):
+    """
+    Returns the ImpulseTable of every impulse in the AnalysisResult of a recording.
+
+    Impulses are found in the total power of the ISO 3382 bands. The decibels of every segment are
+    gathered into one (impulse, band, frame) array, padded to the longest segment, so RT60s and decays
+    are calculated for all of them at once and the work grows with the length of the recording.
+    """
+    # times are kept as float32, but frames are a whole number of samples apart, which gives their exact times
+    sample_rate = result.sample_rate
+    frame_period = round(getFramePeriod(result.times) * sample_rate) / sample_rate
+    first_time = round(float(result.times[0]) * sample_rate) / sample_rate
+    if frame_period <= 0:
+        starts = ends = np.zeros(0, int)
+    else:
+        powers = (10 ** (result.iso_decibels.astype(float) / 10)).sum(axis=0)
+        levels = convertToDecibels(np.maximum(powers, g_powerFloor))
+        starts, ends = findImpulseSegments(levels, frame_period)
+
+    count = len(result.bands)
+    decibels = np.concatenate((result.decibels, result.iso_decibels))
+    lengths = ends - starts
+    width = max(lengths.max(initial=0), 1)
+    frames = np.arange(width)
+
+    # frames past the end of a segment are silent, so they are never a peak or closest to a decay point
+    inside = frames < lengths[:, np.newaxis]
+    indices = np.minimum(starts[:, np.newaxis] + frames, decibels.shape[1] - 1)
+    segments = np.where(inside[:, np.newaxis], decibels[:, indices].transpose(1, 0, 2), -np.inf)
+
+    rt60s = calculateBandRT60s(segments.reshape(-1, width), frames * frame_period).rt60
+    rt60s = rt60s.reshape(len(starts), len(decibels))
+    iso_powers = 10 ** (segments[:, count:].astype(float) / 10)
+    iso_lengths = np.repeat(lengths[:, np.newaxis], iso_powers.shape[1], axis=1)
+    iso_decay = calculateDecays(iso_powers, frame_period, iso_lengths)
+
+    res_freqs = getSegmentPeaks(result.peak_freqs, result.peak_powers, starts, ends)
+
+    return ImpulseTable(starts, ends, first_time + starts * frame_period, lengths * frame_period, rt60s[:, :count],
+                        res_freqs, rt60s[:, count:], iso_decay)
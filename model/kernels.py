@@ -0,0 +1,125 @@
+# Handles the loops over decibel curves that NumPy can only run with temporary arrays,
+# compiled by Numba into single passes that release the GIL so bands can be searched on several threads
+
+import os
+import threading
+
+import numba
+import numpy as np
+
+# bands are only split across threads once they have this many frames, shorter ones take less time than starting a thread
+g_parallelFrames = 1 << 16
+
+# most threads bands are split across
+g_kernelThreads = os.cpu_count() or 1
+
+@numba.njit(nogil=True, cache=True)
+def findDecayPoints(start, stop, decibels, first_drop, second_drop, peaks, peak_values, first_points, second_points):
+    """
+    Finds the maximum of every row of decibels from start to stop, and the frames after it whose values
+    are closest to first_drop and second_drop below it, in a single pass over each row.
+
+    Writes the frame and value of each maximum into peaks and peak_values, and the two frames into
+    first_points and second_points. Ties go to the earliest frame, as with argmax and argmin.
+    """
+    if decibels.shape[1] == 0:
+        raise ValueError("decibels have no frames")
+    for band in range(start, stop):
+        row = decibels[band]
+        peak = first = second = 0
+        peak_value = row[0]
+        first_distance = abs(peak_value - (peak_value - first_drop))
+        second_distance = abs(peak_value - (peak_value - second_drop))
+        for frame in range(1, len(row)):
+            value = row[frame]
+            # everything before a new maximum is no longer after it, so the search starts again from it
+            if value > peak_value:
+                peak = first = second = frame
+                peak_value = value
+                first_distance = abs(value - (value - first_drop))
+                second_distance = abs(value - (value - second_drop))
+                continue
+            distance = abs(value - (peak_value - first_drop))
+            if distance < first_distance:
+                first, first_distance = frame, distance
+            distance = abs(value - (peak_value - second_drop))
+            if distance < second_distance:
+                second, second_distance = frame, distance
+        peaks[band] = peak
+        peak_values[band] = peak_value
+        first_points[band] = first
+        second_points[band] = second
+
+@numba.njit(nogil=True, cache=True)
+def findOnsets(levels, first, noise, armed, onset, impulse_frames, onset_decibels, smoothing, floor, onsets):
+    """
+    Follows the background noise through levels, the decibels of frames numbered from first, and looks for
+    frames onset_decibels louder than it that start an impulse.
+
+    noise is nan until it is estimated, when the first frame that is not silent is taken as it, armed is
+    whether an impulse can start and onset is the frame the impulse being recorded started at, -1 when
+    there is none. Frames at floor, the level of silence, are passed over. Writes the onset of every
+    impulse that has been recorded for impulse_frames into onsets and returns how many there are,
+    followed by the new noise, armed and onset.
+    """
+    count = 0
+    for i in range(len(levels)):
+        frame = first + i
+        level = levels[i]
+        if onset >= 0:
+            if frame - onset + 1 >= impulse_frames:
+                onsets[count] = onset
+                count += 1
+                onset = -1
+            continue
+
+        # digital silence says nothing about the noise of the room and nothing starts in it
+        if level <= floor:
+            continue
+        if np.isnan(noise):
+            noise = level
+        elif armed and level > noise + onset_decibels:
+            onset = frame
+            armed = False
+            continue
+
+        # the tail of an impulse has to die down before another one can start
+        if level < noise + onset_decibels / 2:
+            armed = True
+        # while no impulse can start the noise follows every frame, so a level that stays up raises it
+        if level < noise + onset_decibels or not armed:
+            noise += smoothing * (level - noise)
+    return count, noise, armed, onset
+
+def runRows(kernel, rows, frames, *args):
+    """
+    Calls kernel(start, stop, *args) for ranges of rows that together cover all of them, splitting the
+    rows across threads if each has at least g_parallelFrames frames.
+
+    Threads are started for every call rather than kept in a pool, as a pool's threads would not
+    exist in worker processes forked from this one.
+    """
+    threads = min(rows, g_kernelThreads) if frames >= g_parallelFrames else 1
+    if threads <= 1:
+        kernel(0, rows, *args)
+        return
+
+    bounds = np.linspace(0, rows, threads + 1).astype(int)
+    workers = [threading.Thread(target=kernel, args=(start, stop) + args, name="kernel")
+               for start, stop in zip(bounds[1:-1], bounds[2:])]
+    for worker in workers:
+        worker.start()
+    # the first range is searched on this thread while the others run
+    kernel(bounds[0], bounds[1], *args)
+    for worker in workers:
+        worker.join()
+
+def compileKernels():
+    """
+    Compiles every kernel for the arrays the analysis passes them, or loads them from Numba's cache on disk
+    """
+    for dtype in (np.float32, np.float64):
+        values = np.zeros((1, 2), dtype)
+        indices = np.zeros(1, np.int64)
+        findDecayPoints(0, 1, values, dtype(5), dtype(25), indices, np.zeros(1, dtype), indices, indices)
+        findOnsets(values[0], 0, np.nan, True, -1, 1, 20.0, 0.05, -200.0, indices)
@@ -0,0 +1,254 @@
+# Handles analyzing audio while it is being recorded, keeping only the last few seconds of it
+
+import threading
+
+import numpy as np
+
+from .bands import getAnalysisBands, getBandMatrix
+from .decay import calculateDecays
+from .stft import calculateFramePowers, getFrames, g_defaultSettings
+from .utils import calculateBandRT60s, convertToDecibels
+
+# seconds of audio, spectrum and band power that are kept
+g_liveSeconds = 10
+
+# frames this many decibels louder than the background noise start an impulse
+g_onsetDecibels = 20
+
+# seconds of decay after the start of an impulse that RT60 is calculated from
+g_impulseSeconds = 3
+
+# how quickly the estimate of the background noise follows quiet frames, from 0 to 1
+g_noiseSmoothing = 0.05
+
+# power of silent frames, so that their level in decibels is finite
+g_powerFloor = 1e-20
+
+# level of silent frames in decibels, which is never taken as the background noise
+g_floorDecibels = float(convertToDecibels(g_powerFloor))
+
+# seconds of frames that are not silent the background noise is first estimated from, and the
+# percentile of their levels it is estimated as, low so that a fade in or a clap does not raise it
+g_noiseSeedSeconds = 0.5
+g_noisePercentile = 20
+
+def estimateNoise(levels, count):
+    """
+    Returns the background noise of the first count levels that are not silent, g_noisePercentile of
+    their decibels, or nan if every level is silent
+    """
+    audible = levels[levels > g_floorDecibels][:count]
+    return float(np.percentile(audible, g_noisePercentile)) if len(audible) else np.nan
+
+class RingBuffer:
+    """
+    Fixed-size buffer that keeps the last capacity rows written to it.
+
+    Rows are numbered from the first one ever written and written is the number of rows written
+    so far, so readers can tell which rows are new and whether they have been overwritten.
+    Nothing is allocated after the buffer is created.
+    """
+    def __init__(self, capacity, shape=(), dtype=np.float32):
+        self.data = np.zeros((capacity,) + tuple(shape), dtype)
+        self.written = 0
+
+    @property
+    def capacity(self):
+        return len(self.data)
+
+    def write(self, rows):
+        """
+        Adds rows to the end of the buffer, overwriting the oldest rows once it is full
+        """
+        count = len(rows)
+        rows = rows[-self.capacity:]
+        start = (self.written + count - len(rows)) % self.capacity
+        first = min(len(rows), self.capacity - start)
+        self.data[start:start + first] = rows[:first]
+        self.data[:len(rows) - first] = rows[first:]
+        self.written += count
+
+    def skip(self, count):
+        """
+        Adds count rows of zeros to the end of the buffer
+        """
+        if count >= self.capacity:
+            self.data[:] = 0
+        else:
+            self.data[(self.written + np.arange(count)) % self.capacity] = 0
+        self.written += count
+
+    def read(self, start, stop=None):
+        """
+        Returns the number of the first row that could be read and a copy of the rows from start to stop.
+
+        Rows that have already been overwritten are left out, so the first row may be later than start.
+        """
+        if stop is None:
+            stop = self.written
+        start = max(start, stop - self.capacity, 0)
+        return start, self.data[np.arange(start, stop) % self.capacity]
+
+    def latest(self, count):
+        """
+        Returns a copy of the last count rows in the order they were written, or fewer if fewer were written
+        """
+        return self.read(self.written - count)[1]
+
+class ImpulseEvent:
+    """
+    An impulse, such as a clap, found in live audio and the RT60 of the decay that followed it.
+
+    time is when the impulse started in seconds since recording began. rt60s are the RT60 values of
+    the bands of the analysis and iso_rt60s those of the ISO 3382 bands, whose DecayAnalysis is decay.
+    """
+    def __init__(self, time, rt60s, iso_rt60s, decay):
+        self.time = time
+        self.rt60s = rt60s
+        self.iso_rt60s = iso_rt60s
+        self.decay = decay
+
+class LiveAnalyzer:
+    """
+    Analyzes audio written to it by a recording thread.
+
+    Samples are written to a ring buffer by write, which does nothing else so that it can be called
+    from an audio callback. process calculates the spectrum of every frame that has become complete
+    since it was last called and keeps it in ring buffers with the power of every band, then looks
+    for impulses in the new frames. Each impulse is analyzed once g_impulseSeconds of its decay have
+    been recorded. snapshot returns what is needed to draw the last g_liveSeconds.
+    """
+    def __init__(self, sample_rate, bands, fraction=1, settings=g_defaultSettings, seconds=g_liveSeconds):
+        self.sample_rate = sample_rate
+        self.bands = list(bands)
+        self.fraction = fraction
+        self.settings = settings
+
+        self.freqs = np.fft.rfftfreq(settings.NFFT, 1 / sample_rate)
+        self.band_matrix = getBandMatrix(sample_rate, settings.NFFT, getAnalysisBands(self.bands, fraction))
+        self.frame_period = settings.hop / sample_rate
+
+        num_frames = int(seconds / self.frame_period)
+        self.samples = RingBuffer(int(seconds * sample_rate) + settings.NFFT, dtype=settings.dtype)
+        self.spectrum = RingBuffer(num_frames, (len(self.freqs),), settings.dtype)
+        self.band_powers = RingBuffer(num_frames, (len(self.band_matrix),))
+
+        # background noise in decibels, nan until it is estimated, and the frame the impulse being
+        # recorded started at, -1 while there is none
+        self.noise = np.nan
+        self.armed = True
+        self.onset = -1
+        self.impulse_frames = int(g_impulseSeconds / self.frame_period)
+        # levels kept from the frame numbered seed_first on until there are enough to estimate the noise from
+        self.seed_frames = max(int(g_noiseSeedSeconds / self.frame_period), 1)
+        self.seed_levels = np.zeros(0)
+        self.seed_first = 0
+        self.events = []
+
+        # process and snapshot may be called from different threads
+        self.lock = threading.Lock()
+
+    def write(self, samples):
+        """
+        Adds mono samples to the end of the recording, called by the recording thread
+        """
+        self.samples.write(np.asarray(samples, self.settings.dtype))
+
+    def process(self):
+        """
+        Analyzes every frame that can be made from the samples written so far and returns a list
+        of the ImpulseEvents that were completed by them
+        """
+        with self.lock:
+            written = self.samples.written
+            NFFT, hop = self.settings.NFFT, self.settings.hop
+
+            # frames whose samples were overwritten before they were analyzed are skipped
+            first = self.spectrum.written
+            oldest = max(written - self.samples.capacity, 0)
+            if first * hop < oldest:
+                self._skipFrames(-(-oldest // hop) - first)
+                first = self.spectrum.written
+
+            count = (written - NFFT - first * hop) // hop + 1
+            if count <= 0:
+                return []
+
+            _, audio = self.samples.read(first * hop, (first + count - 1) * hop + NFFT)
+            powers = calculateFramePowers(self.sample_rate, getFrames(audio, self.settings), self.settings)
+            band_powers = powers @ self.band_matrix.T
+
+            self.spectrum.write(powers)
+            self.band_powers.write(band_powers)
+            return self._findImpulses(first, powers.sum(axis=1))
+
+    def snapshot(self):
+        """
+        Returns the spectrum laid out as (frame, frequency), the band decibels laid out as (frame, band),
+        the time of every frame relative to the latest and the ImpulseEvents found so far
+        """
+        with self.lock:
+            spectrum = self.spectrum.latest(self.spectrum.capacity)
+            powers = self.band_powers.latest(self.band_powers.capacity)
+            events = list(self.events)
+
+        times = (np.arange(len(spectrum)) - len(spectrum) + 1) * self.frame_period
+        return spectrum, convertToDecibels(np.maximum(powers, g_powerFloor)), times, events
+
+    def _skipFrames(self, count):
+        """
+        Fills frames that could not be analyzed with silence
+        """
+        self.spectrum.skip(count)
+        self.band_powers.skip(count)
+        self.onset = -1
+        # the levels kept for the noise are no longer followed by the next frame
+        self.seed_levels = self.seed_levels[:0]
+
+    def _findImpulses(self, first, powers):
+        """
+        Looks for impulses in the total power of frames numbered from first and returns the
+        ImpulseEvents that have been recorded for long enough to be analyzed
+        """
+        from .kernels import findOnsets
+
+        levels = convertToDecibels(np.maximum(powers, g_powerFloor))
+        if np.isnan(self.noise):
+            # impulses are only looked for once the noise is known, from the first of the frames kept for it
+            if len(self.seed_levels) == 0:
+                self.seed_first = first
+            levels = np.concatenate((self.seed_levels, levels))
+            # silence before the first sound holds no impulse, so it is not kept
+            audible = np.flatnonzero(levels > g_floorDecibels)
+            start = audible[0] if len(audible) else len(levels)
+            self.seed_first += start
+            levels = levels[start:]
+            if len(audible) < self.seed_frames:
+                self.seed_levels = levels
+                return []
+            self.noise = estimateNoise(levels, self.seed_frames)
+            self.seed_levels = levels[:0]
+            first = self.seed_first
+
+        onsets = np.empty(len(levels), np.int64)
+        count, self.noise, self.armed, self.onset = findOnsets(levels, first, self.noise, self.armed, self.onset,
+                                                               self.impulse_frames, float(g_onsetDecibels),
+                                                               g_noiseSmoothing, g_floorDecibels, onsets)
+
+        events = [self._analyzeImpulse(onset) for onset in onsets[:count]]
+        self.events.extend(events)
+        return events
+
+    def _analyzeImpulse(self, onset):
+        """
+        Returns the ImpulseEvent of the impulse that started at frame onset
+        """
+        _, powers = self.band_powers.read(onset, onset + self.impulse_frames)
+        powers = powers.T
+        times = (np.arange(powers.shape[1]) * self.settings.hop + self.settings.NFFT / 2) / self.sample_rate
+
+        rt60s = calculateBandRT60s(convertToDecibels(np.maximum(powers, g_powerFloor)), times).rt60
+        decay = calculateDecays(powers, self.frame_period)
+
+        count = len(self.bands)
+        return ImpulseEvent(onset * self.frame_period, list(rt60s[:count]), rt60s[count:], decay[count:])
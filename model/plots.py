@@ -0,0 +1,127 @@
+# Handles drawing curves straight into pixels at screen resolution, so graphs can be zoomed and panned
+
+import numpy as np
+from matplotlib.colors import to_rgba_array
+
+from .profiler import span
+from .waveform import WaveformPyramid
+from .utils import getAmplitudeLimits, getDecibelLimits
+
+# thickness of curves in pixels, about as thick as the lines of the figures
+g_lineWidth = 1.5
+
+def getColumnSpans(x, lows, highs, width):
+    """
+    Returns the lowest and highest value a curve reaches in each of width pixel columns.
+
+    x is the position of every point in pixels, in increasing order, and lows and highs are the
+    values at each point, the same array for a line. Columns are also given the values where the
+    curve crosses their edges, so consecutive points are joined. Columns the curve does not reach are nan.
+    """
+    edges = np.arange(width + 1)
+    edge_lows = np.interp(edges, x, lows, left=np.nan, right=np.nan)
+    edge_highs = np.interp(edges, x, highs, left=np.nan, right=np.nan)
+    column_lows = np.fmin(edge_lows[:-1], edge_lows[1:])
+    column_highs = np.fmax(edge_highs[:-1], edge_highs[1:])
+
+    # points inside a column, every column holds the points from its first index to the next column's
+    first = np.searchsorted(x, edges)
+    occupied = np.flatnonzero(first[1:] > first[:-1])
+    if len(occupied):
+        starts = first[occupied]
+        inside = slice(starts[0], first[occupied[-1] + 1])
+        column_lows[occupied] = np.fmin(column_lows[occupied], np.minimum.reduceat(lows[inside], starts - starts[0]))
+        column_highs[occupied] = np.fmax(column_highs[occupied], np.maximum.reduceat(highs[inside], starts - starts[0]))
+
+    return column_lows, column_highs
+
+class Curve:
+    """
+    A curve over time drawn from a WaveformPyramid, so that only as many points as there are
+    pixels are read at any zoom.
+
+    offset is the time of the pyramid's first sample, color anything matplotlib accepts and
+    label the name of the curve in a legend.
+    """
+    def __init__(self, pyramid, offset=0.0, color="C0", label=""):
+        self.pyramid = pyramid
+        self.offset = offset
+        self.color = tuple(int(c) for c in np.round(to_rgba_array(color)[0] * 255))
+        self.label = label
+
+    def render(self, pixels, start, end, low, high):
+        """
+        Draws the curve between start and end seconds and low and high into pixels,
+        a (height, width, 4) array with the lowest values in the first row
+        """
+        height, width = pixels.shape[:2]
+        # buckets of twice the resolution keep single pixel peaks, and half the range is added on
+        # either side so the curve reaches the edges even when buckets are wider than pixels
+        pad = (end - start) / 2
+        times, mins, maxs = self.pyramid.envelope(4 * width, start - pad - self.offset, end + pad - self.offset)
+        if len(times) == 0:
+            return
+
+        x = (times + self.offset - start) / (end - start) * width
+        scale = (height - 1) / (high - low)
+        lows = (np.asarray(mins, np.float64) - low) * scale
+        highs = lows if mins is maxs else (np.asarray(maxs, np.float64) - low) * scale
+        column_lows, column_highs = getColumnSpans(x, lows, highs, width)
+
+        # every column is filled between its lowest and highest value, at least g_lineWidth thick
+        half_width = g_lineWidth / 2
+        rows = np.arange(height)[:, np.newaxis]
+        with np.errstate(invalid="ignore"):
+            mask = (rows >= np.round(column_lows - half_width)) & (rows <= np.round(column_highs + half_width))
+        pixels[mask] = self.color
+
+class CurvePlot:
+    """
+    One or more Curves drawn into RGBA pixels of any size, between any two times.
+
+    extent is the range of time the curves cover, ylim the range of values shown, which stays
+    the same while zooming and panning, and ylabel the name of the values.
+    """
+    kind = "curves"
+
+    def __init__(self, curves, extent, ylim, ylabel):
+        self.curves = curves
+        self.extent = extent
+        self.ylim = ylim
+        self.ylabel = ylabel
+
+    def render(self, width, height, start=None, end=None):
+        """
+        Returns the pixels of the curves between start and end seconds as a (height, width, 4)
+        uint8 array, with the lowest values in the first row and a transparent background
+        """
+        start = self.extent[0] if start is None else start
+        end = self.extent[1] if end is None else end
+        with span("draw curves", curves=len(self.curves)):
+            pixels = np.zeros((height, width, 4), np.uint8)
+            for curve in self.curves:
+                curve.render(pixels, start, end, *self.ylim)
+            return pixels
+
+def newWaveformPlot(waveform):
+    """
+    Returns a CurvePlot of the amplitude of a WaveformPyramid
+    """
+    peak = max(np.abs(level).max(initial=0) for level in waveform.levels[-1][1:])
+    return CurvePlot([Curve(waveform)], (0, waveform.seconds), getAmplitudeLimits(peak), "Amplitude")
+
+def newDecibelPlot(seconds, times, decibels, labels=None):
+    """
+    Returns a CurvePlot of one or more decibel curves sampled at times, such as the decibels of bands.
+
+    Every curve gets its own WaveformPyramid, so that zooming out of long recordings stays fast.
+    """
+    if labels is None:
+        labels = [""] * len(decibels)
+    frame_rate = 1 / (times[1] - times[0]) if len(times) > 1 else 1.0
+
+    curves = []
+    for i, (values, label) in enumerate(zip(decibels, labels)):
+        pyramid = WaveformPyramid.fromSamples(frame_rate, np.asarray(values))
+        curves.append(Curve(pyramid, times[0], f"C{i}", label))
+    return CurvePlot(curves, (0, seconds), getDecibelLimits(np.concatenate(decibels)), "Power (dB)")
@@ -0,0 +1,145 @@
+# Handles timing the stages of loading, analyzing and drawing files, for the window's overlay or a Chrome trace
+
+import collections
+import contextlib
+import json
+import os
+import pathlib
+import threading
+import time
+
+# most spans kept, older ones are dropped so a long session does not keep growing
+g_maxSpans = 100000
+
+# number of recent frames whose draw time is kept for the overlay
+g_maxFrames = 120
+
+# category of spans that time a frame of the window
+g_frameCategory = "frame"
+
+class Span:
+    """
+    Times the code inside a with block and records it with a Profiler when the block ends
+    """
+    __slots__ = ("profiler", "name", "category", "args", "start")
+
+    def __init__(self, profiler, name, category, args):
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.category, self.start, time.perf_counter_ns() - self.start, self.args)
+        return False
+
+class Profiler:
+    """
+    Keeps the spans recorded on every thread, each as its name, category, start and duration in
+    nanoseconds, thread and arguments.
+
+    Frames are also kept on their own, so the time taken to draw recent frames can be shown
+    without searching every span.
+    """
+    def __init__(self, max_spans=g_maxSpans):
+        self.spans = collections.deque(maxlen=max_spans)
+        self.frames = collections.deque(maxlen=g_maxFrames)
+        self.threads = {}
+        self.origin = time.perf_counter_ns()
+        self.lock = threading.Lock()
+
+    def record(self, name, category, start, duration, args=None):
+        thread = threading.current_thread()
+        with self.lock:
+            self.spans.append((name, category, start, duration, thread.ident, args))
+            self.threads[thread.ident] = thread.name
+            if category == g_frameCategory:
+                self.frames.append(duration)
+
+    def latest(self, count, exclude=(g_frameCategory,)):
+        """
+        Returns the last count spans whose category is not in exclude, oldest first
+        """
+        found = []
+        with self.lock:
+            for span in reversed(self.spans):
+                if span[1] not in exclude:
+                    found.append(span)
+                    if len(found) == count:
+                        break
+        return found[::-1]
+
+    def frameTimes(self):
+        """
+        Returns the time taken to draw each recent frame in seconds, oldest first
+        """
+        with self.lock:
+            return [duration / 1e9 for duration in self.frames]
+
+    def toChromeTrace(self):
+        """
+        Returns every span as a dictionary in the Chrome trace event format, which can be opened
+        in chrome://tracing or Perfetto
+        """
+        pid = os.getpid()
+        with self.lock:
+            spans = list(self.spans)
+            threads = dict(self.threads)
+
+        events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                  for tid, name in threads.items()]
+        for name, category, start, duration, tid, args in spans:
+            event = {"name": name, "cat": category, "ph": "X", "pid": pid, "tid": tid,
+                     "ts": (start - self.origin) / 1000, "dur": duration / 1000}
+            if args:
+                event["args"] = {key: str(value) for key, value in args.items()}
+            events.append(event)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, path):
+        """
+        Writes every span to the file at path as a Chrome trace
+        """
+        pathlib.Path(path).write_text(json.dumps(self.toChromeTrace()))
+
+# the profiler spans are recorded with, None while profiling is off
+g_profiler = None
+
+# returned by span while profiling is off, so that timing costs nothing but a call
+g_nullSpan = contextlib.nullcontext()
+
+def span(name, category="stage", **args):
+    """
+    Returns a context manager that records the time taken by the code inside it as a span named name.
+    args are kept with the span in traces. Does nothing while profiling is off.
+    """
+    profiler = g_profiler
+    if profiler is None:
+        return g_nullSpan
+    return Span(profiler, name, category, args)
+
+def startProfiling():
+    """
+    Starts recording spans, if it has not already started, and returns the Profiler they are recorded with
+    """
+    global g_profiler
+
+    if g_profiler is None:
+        g_profiler = Profiler()
+    return g_profiler
+
+def stopProfiling():
+    """
+    Stops recording spans and returns the Profiler they were recorded with, or None if profiling was off
+    """
+    global g_profiler
+
+    profiler, g_profiler = g_profiler, None
+    return profiler
+
+def getProfiler():
+    return g_profiler
@@ -0,0 +1,57 @@
+# Handles holding the results of several files at once so they can be compared
+
+import os
+
+from .figures import ComparisonFigureSet
+
+class ComparisonSession:
+    """
+    Analyzed files being compared, in the order they were added.
+
+    Files are keyed by their resolved path and keep the AnalysisResult they were analyzed to,
+    so adding a file to a comparison never analyzes the files already in it again.
+    version changes whenever files are added or removed, so anything built from the session,
+    such as rendered graphs, can tell that it is out of date.
+    """
+    def __init__(self):
+        self.entries = {}
+        self.version = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, path):
+        return os.path.realpath(path) in self.entries
+
+    def add(self, path, result):
+        """
+        Adds the AnalysisResult of the file at path, replacing any earlier result of the same file
+        """
+        self.entries[os.path.realpath(path)] = (os.path.basename(path), result)
+        self.version += 1
+
+    def remove(self, path):
+        self.entries.pop(os.path.realpath(path), None)
+        self.version += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.version += 1
+
+    @property
+    def names(self):
+        return [name for name, _ in self.entries.values()]
+
+    @property
+    def paths(self):
+        return list(self.entries)
+
+    @property
+    def results(self):
+        return [result for _, result in self.entries.values()]
+
+    def figures(self):
+        """
+        Returns a ComparisonFigureSet of the files currently in the session
+        """
+        return ComparisonFigureSet(self.names, self.results)
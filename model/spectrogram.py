@@ -0,0 +1,129 @@
+# Handles turning a spectrum straight into colored pixels at screen resolution, without building a figure
+
+import functools
+
+import numpy as np
+import matplotlib
+
+from .profiler import span
+from .utils import getDecibelLimits
+
+# colormap of the spectrogram, the same as the spectrogram figure
+g_colormap = "autumn_r"
+
+# number of colors in a lookup table
+g_colormapSize = 256
+
+@functools.lru_cache(maxsize=4)
+def getColormapTable(name=g_colormap, size=g_colormapSize):
+    """
+    Returns a read only (size, 4) table of the RGBA colors of a matplotlib colormap as bytes
+    """
+    table = matplotlib.colormaps[name].resampled(size)(np.arange(size), bytes=True)
+    table.flags.writeable = False
+    return table
+
+def colorizeDecibels(decibels, vmin, vmax, table=None):
+    """
+    Returns an RGBA uint8 array of the colors of decibels, with vmin and below the first color of
+    table and vmax and above the last one. nan and -inf are given the first color.
+    """
+    if table is None:
+        table = getColormapTable()
+    indices = np.subtract(decibels, vmin, dtype=np.float32)
+    indices *= (len(table) - 1) / (vmax - vmin)
+    np.clip(indices, 0, len(table) - 1, out=indices)
+    indices[np.isnan(indices)] = 0
+
+    # each color is looked up as a single 32 bit value
+    colors = table.view(np.uint32)[:, 0][indices.astype(np.intp)]
+    return colors.view(np.uint8).reshape(colors.shape + (4,))
+
+def getPoolStarts(start, stop, pixels):
+    """
+    Returns the first index of every one of pixels groups that split start to stop evenly.
+
+    Groups are empty when there are fewer indices than pixels, np.maximum.reduceat then repeats
+    the nearest index instead.
+    """
+    return np.floor(np.linspace(start, stop, pixels, endpoint=False)).astype(np.intp)
+
+class SpectrogramImage:
+    """
+    Draws the spectrum of an AnalysisResult into RGBA pixels of any size.
+
+    Only the frames and frequencies in view are read. They are pooled to one value per pixel by
+    taking the greatest power, so that short sounds are never skipped, and only the pooled values
+    are converted to decibels and colored with a lookup table. Panning or zooming slices the
+    spectrum again rather than rendering a figure.
+    """
+    kind = "spectrogram"
+
+    def __init__(self, result):
+        self.spectrum = result.spectrum
+        self.freqs = result.freqs
+        self.times = result.spectrum_times
+
+        # colors are fixed for the whole spectrum so they do not change while panning
+        positive = self.spectrum[self.spectrum > 0]
+        if len(positive):
+            self.clim = getDecibelLimits(10 * np.log10([positive.min(), positive.max()]))
+        else:
+            self.clim = getDecibelLimits([])
+
+        # each column is centered on its time, so pad half a column on either side like the figure
+        pad = (self.times[1] - self.times[0]) / 2 if len(self.times) > 1 else self.times[0]
+        self.extent = (self.times[0] - pad, self.times[-1] + pad, self.freqs[0], self.freqs[-1])
+
+    def render(self, width, height, start=None, end=None, low=None, high=None):
+        """
+        Returns the pixels of the spectrum between start and end seconds and low and high Hz
+        as a (height, width, 4) uint8 array, with the lowest frequency in the first row
+        """
+        with span("draw spectrogram"):
+            return self._render(width, height, start, end, low, high)
+
+    def _render(self, width, height, start, end, low, high):
+        first_time, last_time, first_freq, last_freq = self.extent
+        start = first_time if start is None else start
+        end = last_time if end is None else end
+        low = first_freq if low is None else low
+        high = last_freq if high is None else high
+
+        # fractional column and row positions of the edges of the view
+        column_period = (last_time - first_time) / len(self.times)
+        row_period = (last_freq - first_freq) / max(len(self.freqs) - 1, 1)
+        first_column, last_column = (start - first_time) / column_period, (end - first_time) / column_period
+        first_row, last_row = (low - first_freq) / row_period + 0.5, (high - first_freq) / row_period + 0.5
+        columns = getPoolStarts(first_column, last_column, width)
+        rows = getPoolStarts(first_row, last_row, height)
+
+        # pixels outside the spectrum are left blank, as indices only increase the pixels inside are a single range
+        inside_columns = np.flatnonzero((columns >= 0) & (columns < len(self.times)))
+        inside_rows = np.flatnonzero((rows >= 0) & (rows < len(self.freqs)))
+        pixels = np.zeros((height, width, 4), np.uint8)
+        if len(inside_columns) == 0 or len(inside_rows) == 0:
+            return pixels
+
+        column_starts = columns[inside_columns]
+        row_starts = rows[inside_rows]
+        # the last pixel pools everything up to the edge of the view
+        row_stop = min(max(int(np.ceil(last_row)), row_starts[-1] + 1), len(self.freqs))
+        column_stop = min(max(int(np.ceil(last_column)), column_starts[-1] + 1), len(self.times))
+        block = self.spectrum[row_starts[0]:row_stop, column_starts[0]:column_stop]
+        pooled = np.maximum.reduceat(block, row_starts - row_starts[0], axis=0)
+        pooled = np.maximum.reduceat(pooled, column_starts - column_starts[0], axis=1)
+
+        with np.errstate(divide="ignore"):
+            decibels = 10 * np.log10(pooled)
+        pixels[inside_rows[0]:inside_rows[-1] + 1, inside_columns[0]:inside_columns[-1] + 1] = \
+            colorizeDecibels(decibels, *self.clim)
+        return pixels
+
+    def colorbar(self, width, height):
+        """
+        Returns the pixels of a colorbar of the colors from the lowest decibels in the first row to the highest
+        """
+        table = getColormapTable()
+        rows = table[np.linspace(0, len(table) - 1, height).astype(np.intp)]
+        return np.ascontiguousarray(np.broadcast_to(rows[:, np.newaxis], (height, width, 4)))
@@ -1,32 +1,54 @@
 # Handles primary communication between the controller and model
 
+from typing import TYPE_CHECKING
+
 import numpy as np
-import matplotlib.pyplot as plt
-from view import AppWindow
 
-from .figures import newWaveformFigure, newSpectrogramFigure, newDecibelFigure, newCombinedDecibelFigure
-from .utils import getDecibels, calculateRT60, calculateLength, calculateResonantFreq
+# the view is only needed for type hints, importing it at runtime would pull in
+# pyglet and tkinter which are not available on machines without a display
+if TYPE_CHECKING:
+    from view import AppWindow
+
+from .analysis import analyzeSoundFile
+from .profiler import span
+from .stft import STFTSettings
+from .figures import FigureSet, LiveFigure
+from .live import LiveAnalyzer
+from .session import ComparisonSession
 
 # external variables that store state
-g_current_sample_rate = None
-g_current_data = None
 g_window = None
 
 # constants for low, mid, and high frequencies
 g_lowFreq = 250
 g_midFreq = 1000
 g_highFreq = 5000
+g_bands = (g_lowFreq, g_midFreq, g_highFreq)
+
+# RT60 is also calculated for the ISO 3382 bands from 125 Hz to 8 kHz, 1 for octave bands and 3 for third-octave bands
+g_bandFraction = 1
+
+# settings of the spectrum every calculation is based on
+g_stftSettings = STFTSettings()
+
+# files being compared side by side, separate from the single file being shown
+g_session = ComparisonSession()
 
-def get_window_instance(app: AppWindow):
+# analysis of the live input, None unless live input is running
+g_live = None
+
+def get_window_instance(app: "AppWindow"):
     global window
     window = app
 
 
-def receiveSoundFile(sample_rate, data):
+def receiveSoundFile(sample_rate, data, job=None):
     """
     Called by the controller when a new file should be extracted.
 
     Takes in the sample_rate and a numpy array of data that represents the audio file.
+    job is the controller's LoadJob when called from the loader thread, nothing is passed
+    to the view if it was cancelled while the file was being analyzed.
     """
 
     # TODO
@@ -37,48 +59,66 @@ def receiveSoundFile(sample_rate, data):
         pass
 
 
-    global g_current_sample_rate
-    global g_current_data
+    # calculates everything without creating any figures
+    with span("analysis"):
+        result = analyzeSoundFile(sample_rate, data, g_bands, g_bandFraction, g_stftSettings)
+    receiveAnalysis(result, job)
+
+def receiveAnalysis(result, job=None):
+    """
+    Called by the controller with a finished AnalysisResult, such as the result of a streamed file,
+    and by receiveSoundFile once it has analyzed the audio.
+
+    Results do not keep their audio, so nothing but the numbers and graphs shown is held on to.
+    """
+    if job is not None and job.cancelled:
+        return
 
-    # updates internal state
-    g_current_sample_rate = sample_rate
-    g_current_data = data
+    # passes figures to the view, they are only built when the view asks for them
+    with span("post results"):
+        window.post_results(FigureSet(result), job)
 
-    # creates new figures
-    waveform = newWaveformFigure(sample_rate, data)
-    specgram, freqs, spectrum, t = newSpectrogramFigure(sample_rate, data)
+def openFileError(job=None):
+    window.post_results(None, job)
 
-    # perform RT60 calculations for low, mid, and high frequencies
-    low_freq_decibels = getDecibels(spectrum, freqs, g_lowFreq)
-    low_freq_calc = calculateRT60(low_freq_decibels, t)
+def addComparedFile(path, result):
+    """
+    Called by the controller with the AnalysisResult of a file that was added to the comparison
+    """
+    g_session.add(path, result)
 
-    mid_freq_decibels = getDecibels(spectrum, freqs, g_midFreq)
-    mid_freq_calc = calculateRT60(mid_freq_decibels, t)
-    
-    high_freq_decibels = getDecibels(spectrum, freqs, g_highFreq)
-    high_freq_calc = calculateRT60(high_freq_decibels, t)
+def receiveComparison(failed, job=None):
+    """
+    Called by the controller once every file of a comparison has been analyzed.
 
-    seconds = calculateLength(sample_rate, data)
+    failed holds the paths of files that could not be opened, nothing is passed to the view
+    if job was cancelled.
+    """
+    if job is not None and job.cancelled:
+        return
 
-    low_fig = newDecibelFigure(seconds, t, low_freq_decibels)
-    mid_fig = newDecibelFigure(seconds, t, mid_freq_decibels)
-    high_fig = newDecibelFigure(seconds, t, high_freq_decibels)
+    window.post_comparison((g_session.figures(), g_session.names, g_session.version, failed), job)
 
-    combined_fig = newCombinedDecibelFigure(seconds, t, low_freq_decibels, mid_freq_decibels, high_freq_decibels)
+def receiveExport(directory, count, failed):
+    """
+    Called by the controller once the files of an export have been written into directory.
 
-    # calculate the resonant frequency
-    res_freq = calculateResonantFreq(spectrum, freqs)
+    count is the number of files exported and failed holds the paths of files that could not be
+    """
+    window.post_export((directory, count, failed))
 
-    # passes figures to the view
-    window.update_images(([waveform, specgram, low_fig, mid_fig, high_fig, combined_fig], [low_freq_calc[0], mid_freq_calc[0], high_freq_calc[0]], seconds, res_freq))
+def startLive(sample_rate, name):
+    """
+    Called by the controller when live input starts, returns the LiveAnalyzer the recorded samples are written to
+    """
+    global g_live
 
-    # frees memory used by figures
-    plt.close(waveform)
-    plt.close(specgram)
-    plt.close(low_fig)
-    plt.close(mid_fig)
-    plt.close(high_fig)
-    plt.close(combined_fig)
+    g_live = LiveAnalyzer(sample_rate, g_bands, g_bandFraction, g_stftSettings)
+    window.post_live(LiveFigure(g_live), name)
+    return g_live
 
-def openFileError():
-    window.update_images(None)
\ No newline at end of file
+def receiveImpulse(event):
+    """
+    Called by the controller with every ImpulseEvent found in the live input
+    """
+    window.post_impulse(event)
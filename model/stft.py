@@ -0,0 +1,98 @@
+# Handles calculating the spectrum of audio, the stage every other calculation is based on
+
+import functools
+from typing import NamedTuple
+
+import numpy as np
+import scipy.fft
+
+# number of frames transformed at a time, so the windowed copy of the frames stays small
+g_framesPerBlock = 2048
+
+class STFTSettings(NamedTuple):
+    """
+    Settings of the short-time Fourier transform.
+
+    NFFT is the number of samples in a frame and hop the number of samples between the starts
+    of frames. window is any window scipy.signal.get_window accepts, used in its symmetric form
+    so that "hann" matches np.hanning. dtype is the precision the FFT runs in and workers the
+    number of threads scipy.fft may use, None for one.
+    """
+    NFFT: int = 1024
+    hop: int = 896
+    window: str = "hann"
+    dtype: str = "float32"
+    workers: int | None = None
+
+# the defaults match the spectrogram SPIDAM has always calculated, NFFT=1024 with 128 samples of overlap
+g_defaultSettings = STFTSettings()
+
+@functools.lru_cache(maxsize=16)
+def getWindow(window, NFFT, dtype):
+    """
+    Returns a read only window of NFFT samples
+    """
+    # scipy.signal takes a third of a second to import, so it is only imported once a window is needed
+    import scipy.signal
+
+    values = scipy.signal.get_window(window, NFFT, fftbins=False).astype(dtype)
+    values.flags.writeable = False
+    return values
+
+def getFrames(data, settings=g_defaultSettings):
+    """
+    Returns a read only (frame, sample) strided view of data, no samples are copied
+    """
+    return np.lib.stride_tricks.sliding_window_view(data, settings.NFFT)[::settings.hop]
+
+def calculateFramePowers(sample_rate, frames, settings=g_defaultSettings, out=None):
+    """
+    Returns the one-sided power spectral density of every frame, laid out as (frame, frequency).
+
+    frames is laid out as (frame, sample) and may be a view. Uses the same scaling as matplotlib's
+    specgram. The result is written into out if it is given.
+    """
+    NFFT = frames.shape[1]
+    window = getWindow(settings.window, NFFT, settings.dtype)
+    if out is None:
+        out = np.empty((len(frames), NFFT // 2 + 1), settings.dtype)
+
+    # double every frequency except DC and Nyquist to account for the negative frequencies
+    doubled = slice(1, -1) if NFFT % 2 == 0 else slice(1, None)
+    scale = sample_rate * (window.astype(np.float64) ** 2).sum()
+
+    for start in range(0, len(frames), g_framesPerBlock):
+        block = frames[start:start + g_framesPerBlock]
+        transform = scipy.fft.rfft(block * window, axis=1, workers=settings.workers)
+
+        powers = out[start:start + len(block)]
+        np.square(transform.real, out=powers)
+        powers += np.square(transform.imag)
+        powers[:, doubled] *= 2
+        powers /= scale
+
+    return out
+
+def calculateSTFT(sample_rate, data, settings=g_defaultSettings):
+    """
+    Returns the spectrum, frequencies and times of the audio.
+
+    The spectrum is laid out as (frequency, time) and is a transposed view of the (time, frequency)
+    array the frames are written into. Audio shorter than a frame is padded to a single frame.
+    """
+    data = np.asarray(data, settings.dtype)
+    if len(data) < settings.NFFT:
+        data = np.concatenate((data, np.zeros(settings.NFFT - len(data), data.dtype)))
+
+    powers = calculateFramePowers(sample_rate, getFrames(data, settings), settings)
+
+    freqs = np.fft.rfftfreq(settings.NFFT, 1 / sample_rate)
+    times = getFrameTimes(sample_rate, len(powers), settings)
+
+    return powers.T, freqs, times
+
+def getFrameTimes(sample_rate, num_frames, settings=g_defaultSettings):
+    """
+    Returns the time at the centre of every frame
+    """
+    return (settings.NFFT / 2 + np.arange(num_frames) * settings.hop) / sample_rate
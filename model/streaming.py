@@ -0,0 +1,358 @@
+# Handles analyzing audio that arrives in blocks, so files of any length can be analyzed in bounded memory
+
+import numpy as np
+
+from .analysis import AnalysisResult, getFramePeriod, splitBandResults
+from .decay import calculateDecays
+from .bands import getAnalysisBands, getBandMatrix
+from .stft import calculateFramePowers, getFrames, getFrameTimes, g_defaultSettings
+from .waveform import WaveformPyramid, getBucketLimits, g_baseBucketSize
+from .utils import calculateBandRT60s, calculateFramePeaks, convertToDecibels, getLoudestPeak
+
+# upper bounds on the detail kept for display, reductions are merged in pairs when they grow past twice these.
+# The waveform keeps enough detail to be zoomed into closely, about 16MB at most
+g_envelopePoints = 1 << 20
+g_spectrumColumns = 1024
+
+def getEnvelopeBucketSize(num_samples, max_points=g_envelopePoints):
+    """
+    Returns the bucket size a WaveformEnvelope of num_samples ends up with, so that it can start
+    with it instead of reducing finer buckets that are merged away later
+    """
+    bucket_size = g_baseBucketSize
+    while num_samples / bucket_size > 2 * max_points:
+        bucket_size *= 2
+    return bucket_size
+
+class WaveformEnvelope:
+    """
+    Keeps the minimum and maximum of every bucket of samples pushed into it.
+
+    The bucket size doubles whenever there are more than twice max_points buckets, so
+    memory stays bounded no matter how many samples are pushed. Buckets are kept in a buffer
+    that doubles in size when it fills up, so pushing a block never copies the buckets before it.
+    """
+    def __init__(self, max_points=g_envelopePoints, bucket_size=g_baseBucketSize):
+        self.max_points = max_points
+        self.bucket_size = bucket_size
+        # minimums in the first row and maximums in the second
+        self.buffer = np.empty((2, 1024), np.float32)
+        self.count = 0
+
+        # the bucket currently being filled
+        self.partial_min = np.inf
+        self.partial_max = -np.inf
+        self.partial_count = 0
+
+    @property
+    def mins(self):
+        return self.buffer[0, :self.count]
+
+    @property
+    def maxs(self):
+        return self.buffer[1, :self.count]
+
+    def push(self, samples):
+        samples = np.asarray(samples)
+
+        # finish the partially filled bucket first
+        if self.partial_count:
+            head = samples[:self.bucket_size - self.partial_count]
+            samples = samples[len(head):]
+            self._addPartial(head)
+            if self.partial_count == self.bucket_size:
+                self._appendBuckets([self.partial_min], [self.partial_max])
+                self._resetPartial()
+
+        full = len(samples) // self.bucket_size
+        if full:
+            buckets = samples[:full * self.bucket_size].reshape(full, self.bucket_size)
+            self._appendBuckets(*getBucketLimits(buckets))
+        self._addPartial(samples[full * self.bucket_size:])
+
+        while self.count > 2 * self.max_points:
+            self._merge()
+
+    def finish(self):
+        """
+        Returns the minimum and maximum of every bucket and the bucket size, the last bucket may be shorter
+        """
+        mins, maxs = self.mins.copy(), self.maxs.copy()
+        if self.partial_count:
+            mins = np.append(mins, np.float32(self.partial_min))
+            maxs = np.append(maxs, np.float32(self.partial_max))
+        return mins, maxs, self.bucket_size
+
+    def _addPartial(self, samples):
+        if len(samples):
+            self.partial_min = min(self.partial_min, samples.min())
+            self.partial_max = max(self.partial_max, samples.max())
+            self.partial_count += len(samples)
+
+    def _resetPartial(self):
+        self.partial_min = np.inf
+        self.partial_max = -np.inf
+        self.partial_count = 0
+
+    def _appendBuckets(self, mins, maxs):
+        count = self.count + len(mins)
+        if count > self.buffer.shape[1]:
+            buffer = np.empty((2, max(count, 2 * self.buffer.shape[1])), np.float32)
+            buffer[:, :self.count] = self.buffer[:, :self.count]
+            self.buffer = buffer
+        self.buffer[0, self.count:count] = mins
+        self.buffer[1, self.count:count] = maxs
+        self.count = count
+
+    def _merge(self):
+        """
+        Doubles the bucket size by combining neighbouring buckets
+        """
+        # an odd bucket out becomes part of the partially filled bucket
+        if self.count % 2:
+            self.partial_min = min(self.partial_min, self.mins[-1])
+            self.partial_max = max(self.partial_max, self.maxs[-1])
+            self.partial_count += self.bucket_size
+            self.count -= 1
+
+        half = self.count // 2
+        mins = self.mins.reshape(-1, 2).min(axis=1)
+        maxs = self.maxs.reshape(-1, 2).max(axis=1)
+        self.buffer[0, :half] = mins
+        self.buffer[1, :half] = maxs
+        self.count = half
+        self.bucket_size *= 2
+
+class SpectrumSummary:
+    """
+    Keeps the average power of every bucket of spectrum frames pushed into it.
+
+    Works like WaveformEnvelope but over frames, so the spectrogram of a long file can
+    still be shown without keeping every frame. Buckets are written into a buffer that is
+    allocated once, which is halved by merging neighbouring buckets whenever it fills up.
+    """
+    def __init__(self, bins, max_columns=g_spectrumColumns):
+        self.bucket_size = 1
+        self.sums = np.zeros((2 * max_columns, bins))
+        self.count = 0
+
+        self.partial_sum = np.zeros(bins)
+        self.partial_count = 0
+
+    def push(self, frames):
+        """
+        frames is laid out as (frame, frequency)
+        """
+        while len(frames):
+            if self.partial_count == 0:
+                # whole buckets go straight into the buffer
+                full = min(len(frames) // self.bucket_size, len(self.sums) - self.count)
+                if full:
+                    end = full * self.bucket_size
+                    self.sums[self.count:self.count + full] = frames[:end].reshape(full, self.bucket_size, -1).sum(axis=1)
+                    self.count += full
+                    frames = frames[end:]
+                    self._mergeIfFull()
+                    continue
+
+            head = frames[:self.bucket_size - self.partial_count]
+            frames = frames[len(head):]
+            self.partial_sum += head.sum(axis=0)
+            self.partial_count += len(head)
+            if self.partial_count == self.bucket_size:
+                self.sums[self.count] = self.partial_sum
+                self.count += 1
+                self.partial_sum[:] = 0
+                self.partial_count = 0
+                self._mergeIfFull()
+
+    def finish(self):
+        """
+        Returns the average spectrum laid out as (frequency, column) and the centre frame of every column
+        """
+        spectrum = self.sums[:self.count] / self.bucket_size
+        centres = np.arange(self.count) * self.bucket_size + (self.bucket_size - 1) / 2
+        if self.partial_count:
+            spectrum = np.vstack((spectrum, self.partial_sum / self.partial_count))
+            centres = np.append(centres, self.count * self.bucket_size + (self.partial_count - 1) / 2)
+        return spectrum.T, centres
+
+    def _mergeIfFull(self):
+        """
+        Doubles the bucket size by combining neighbouring buckets once the buffer is full
+        """
+        if self.count < len(self.sums):
+            return
+
+        half = self.count // 2
+        self.sums[:half] = self.sums[:self.count].reshape(half, 2, -1).sum(axis=1)
+        self.count = half
+        self.bucket_size *= 2
+
+class FrameBuffer:
+    """
+    Keeps the samples pushed into it until there are enough to make frames from
+    """
+    def __init__(self, settings=g_defaultSettings):
+        self.settings = settings
+        self.pending = np.empty(0, settings.dtype)
+
+    def push(self, samples):
+        """
+        Returns the (frame, sample) frames that can be made now that samples have arrived, or None if there are none
+        """
+        self.pending = np.concatenate((self.pending, samples))
+        if len(self.pending) < self.settings.NFFT:
+            return None
+
+        frames = getFrames(self.pending, self.settings)
+        # keep the samples the next frame starts from
+        self.pending = self.pending[len(frames) * self.settings.hop:].copy()
+        return frames
+
+    def pad(self):
+        """
+        Returns the samples that have not made a frame padded into a single frame, for audio shorter than a frame
+        """
+        padded = np.zeros((1, self.settings.NFFT), self.settings.dtype)
+        padded[0, :len(self.pending)] = self.pending
+        return padded
+
+class StreamingAnalyzer:
+    """
+    Analyzes audio pushed into it one block at a time.
+
+    Frames are calculated as soon as enough samples have arrived, and only the band decibel
+    curves, a reduced spectrum and a decimated waveform are kept. finish returns the same
+    RT60s and resonant frequency as analyzeSoundFile would for the whole file.
+
+    Blocks with more than one channel are analyzed as their average, and the band powers of every
+    channel are also kept on their own for the RT60s of each channel.
+
+    num_samples is the length of the audio if it is known beforehand, which saves reducing the
+    waveform more finely than it is kept.
+    """
+    def __init__(self, sample_rate, bands, fraction=1, settings=g_defaultSettings, num_samples=None):
+        self.sample_rate = sample_rate
+        self.bands = list(bands)
+        self.fraction = fraction
+        self.settings = settings
+
+        self.freqs = np.fft.rfftfreq(settings.NFFT, 1 / sample_rate)
+        self.band_matrix = getBandMatrix(sample_rate, settings.NFFT, getAnalysisBands(self.bands, fraction))
+
+        # samples that have arrived but are not yet part of a full frame
+        self.frames = FrameBuffer(settings)
+        self.num_samples = 0
+        self.num_frames = 0
+
+        self.band_powers = []
+        # the frequency with the most power in every frame and that power
+        self.peak_freqs = []
+        self.peak_powers = []
+
+        # one buffer and list of band powers for every channel, made when the first block arrives
+        self.channel_frames = []
+        self.channel_powers = []
+
+        bucket_size = g_baseBucketSize if num_samples is None else getEnvelopeBucketSize(num_samples)
+        self.envelope = WaveformEnvelope(bucket_size=bucket_size)
+        self.spectrum = SpectrumSummary(len(self.freqs))
+
+    def push(self, samples):
+        """
+        Adds mono samples, or samples laid out as (frame, channel), to the end of the audio
+        """
+        samples = np.asarray(samples, self.settings.dtype)
+        if samples.ndim == 2:
+            if samples.shape[1] > 1:
+                self._pushChannels(samples)
+                samples = samples.mean(axis=1)
+            else:
+                samples = samples[:, 0]
+
+        self.num_samples += len(samples)
+        self.envelope.push(samples)
+
+        frames = self.frames.push(samples)
+        if frames is not None:
+            self._addFrames(calculateFramePowers(self.sample_rate, frames, self.settings))
+
+    def finish(self):
+        """
+        Returns an AnalysisResult for all the audio pushed so far
+        """
+        # audio shorter than a frame is padded to a single frame
+        if self.num_frames == 0:
+            self._addFrames(calculateFramePowers(self.sample_rate, self.frames.pad(), self.settings))
+            for frames, powers in zip(self.channel_frames, self.channel_powers):
+                powers.append(self.band_matrix @ calculateFramePowers(self.sample_rate, frames.pad(), self.settings).T)
+
+        times = getFrameTimes(self.sample_rate, self.num_frames, self.settings)
+
+        powers = np.hstack(self.band_powers)
+        decibels = convertToDecibels(powers)
+        rt60_info = calculateBandRT60s(decibels, times)
+        decay = calculateDecays(powers, getFramePeriod(times))
+
+        channel_rt60s = None
+        if self.channel_powers:
+            channel_rt60s = np.array([calculateBandRT60s(convertToDecibels(np.hstack(powers)), times).rt60
+                                      for powers in self.channel_powers])
+
+        spectrum, centre_frames = self.spectrum.finish()
+        spectrum_times = (self.settings.NFFT / 2 + centre_frames * self.settings.hop) / self.sample_rate
+
+        mins, maxs, bucket_size = self.envelope.finish()
+        waveform = WaveformPyramid(self.sample_rate, self.num_samples, mins, maxs, bucket_size)
+
+        seconds = self.num_samples / self.sample_rate
+        peak_freqs, peak_powers = np.concatenate(self.peak_freqs), np.concatenate(self.peak_powers)
+        res_freq = getLoudestPeak(peak_freqs, peak_powers)
+
+        return AnalysisResult(sample_rate=self.sample_rate, seconds=seconds, spectrum=spectrum,
+                              freqs=self.freqs, times=times, res_freq=res_freq, peak_freqs=peak_freqs,
+                              peak_powers=peak_powers, waveform=waveform,
+                              spectrum_times=spectrum_times,
+                              **splitBandResults(self.bands, decibels, rt60_info, decay, self.fraction, channel_rt60s))
+
+    def _pushChannels(self, samples):
+        """
+        Keeps the band powers of every frame of each channel of (frame, channel) samples
+        """
+        if not self.channel_frames:
+            self.channel_frames = [FrameBuffer(self.settings) for _ in range(samples.shape[1])]
+            self.channel_powers = [[] for _ in range(samples.shape[1])]
+
+        for channel, (frames, powers) in enumerate(zip(self.channel_frames, self.channel_powers)):
+            ready = frames.push(samples[:, channel])
+            if ready is not None:
+                powers.append(self.band_matrix @ calculateFramePowers(self.sample_rate, ready, self.settings).T)
+
+    def _addFrames(self, powers):
+        """
+        Keeps what is needed from frames laid out as (frame, frequency)
+        """
+        self.num_frames += len(powers)
+        self.band_powers.append(self.band_matrix @ powers.T)
+        self.spectrum.push(powers)
+
+        # the resonant frequency is found from the peak of every frame once the whole file has been analyzed
+        peak_freqs, peak_powers = calculateFramePeaks(powers.T, self.freqs)
+        self.peak_freqs.append(peak_freqs)
+        self.peak_powers.append(peak_powers)
+
+def analyzeBlocks(sample_rate, blocks, bands, fraction=1, job=None, settings=g_defaultSettings, num_samples=None):
+    """
+    Returns an AnalysisResult for audio given as an iterable of mono or (frame, channel) blocks.
+
+    Blocks are only taken from the iterable as they are analyzed, so a generator that reads
+    or converts them one at a time keeps memory bounded. Returns None if job is cancelled
+    before every block has been analyzed. num_samples is the length of the audio, if known.
+    """
+    analyzer = StreamingAnalyzer(sample_rate, bands, fraction, settings, num_samples)
+    for block in blocks:
+        if job is not None and job.cancelled:
+            return None
+        analyzer.push(block)
+    return analyzer.finish()
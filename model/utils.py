@@ -5,6 +5,34 @@ import numpy as np
 # supress numpy division warnings
 np.seterr(divide='ignore')
 
+# decibel limits are rounded out to multiples of this, so that figures of similar files share their axes
+g_decibelStep = 10
+
+# amplitude limits are rounded up to multiples of this
+g_amplitudeStep = 0.1
+
+class BandRT60s:
+    """
+    RT60 of one or more bands and where on their decibel curves it was measured.
+
+    Every attribute holds one value per band. rt60 is in seconds, peak is the frame index of the
+    maximum decibel value and peak_decibels that value, end is the frame index of max - 25 dB.
+    Indexing selects bands, so the RT60s of a subset of bands can be passed around on their own.
+    """
+    __slots__ = ("rt60", "peak", "peak_decibels", "end")
+
+    def __init__(self, rt60, peak, peak_decibels, end):
+        self.rt60 = rt60
+        self.peak = peak
+        self.peak_decibels = peak_decibels
+        self.end = end
+
+    def __getitem__(self, index):
+        return BandRT60s(self.rt60[index], self.peak[index], self.peak_decibels[index], self.end[index])
+
+    def __len__(self):
+        return len(self.rt60)
+
 def calculateLength(sample_rate, data):
     """
     Returns the length, in seconds, of the audio 
@@ -14,14 +42,6 @@ def calculateLength(sample_rate, data):
     """
     return len(data)/sample_rate
 
-def getClosestValue(values, target):
-    """
-    Returns the index of the frequency value in freqs closest to freq
-    """
-    array = np.asarray(values)
-    i = (np.abs(array - target)).argmin()
-    return array[i]
-
 def convertToDecibels(data):
     """
     Returns the decibel values of an audio file relative to itself.
@@ -30,56 +50,80 @@ def convertToDecibels(data):
     """
     return 10 * np.log10(data)
 
-def getDecibels(spectrum, freqs, targetFreq):
-    """
-    Returns the audio's decibel values by trying to match targetFreq to the closest sampled
-    frequency.
+def calculateBandRT60s(decibels, times):
     """
+    Calculates the RT60 value of every band of a (band, time) array of decibels at once, by taking the
+    difference in time between a decibel value of max - 5 dB and a decibel value of max - 25 dB after it.
 
-    closestFreq = getClosestValue(freqs, targetFreq)
-    freqIndex = np.where(freqs == closestFreq)[0][0]
-    return convertToDecibels(spectrum[freqIndex])
+    The maximum and the values closest to max - 5 dB and max - 25 dB after it are found in a single
+    pass over each band, with bands split across threads when they are long.
 
-def calculateRT60(decibels, times):
+    Returns a BandRT60s of arrays with one value per band
     """
-    Calculates the RT60 value of the audio by taking the difference in time between a decibel
-    value of max - 5 dB and a decibel value of max - 25 dB
+    from .kernels import findDecayPoints, runRows
 
-    Returns a tuple:
-    [0] RT60
-    [1] maximum decibel index
-    [2] maximum decibel value
-    """
+    decibels = np.ascontiguousarray(np.atleast_2d(decibels))
+    count = len(decibels)
+    indexMax = np.empty(count, np.int64)
+    valueMax = np.empty(count, decibels.dtype)
+    indexMaxM5 = np.empty(count, np.int64)
+    indexMaxM25 = np.empty(count, np.int64)
 
-    indexMax = np.argmax(decibels)
-    valueMax = decibels[indexMax]
+    # drops of the same type as decibels, so the distances are calculated in the same precision as the values
+    drop = decibels.dtype.type
+    runRows(findDecayPoints, count, decibels.shape[1], decibels, drop(5), drop(25),
+            indexMax, valueMax, indexMaxM5, indexMaxM25)
 
-    # slice array to eliminate algorithm finding values before the max
-    postMax = decibels[indexMax:]
+    rt20 = times[indexMaxM25] - times[indexMaxM5]
 
-    # value and index minus 5 dB
-    valueMaxM5 = getClosestValue(postMax, valueMax - 5)
-    indexMaxM5 = np.where(postMax == valueMaxM5)[0][0]
+    return BandRT60s(3 * rt20, indexMax, valueMax, indexMaxM25)
 
-    # value and index minus 25 dB
-    valueMaxM25 = getClosestValue(postMax, valueMax - 25)
-    indexMaxM25 = np.where(postMax == valueMaxM25)[0][0]
+def calculateFramePeaks(spectrum, freqs):
+    """
+    Returns the frequency with the most power in every frame of a (frequency, time) spectrum and that power,
+    so that the resonant frequency of any range of frames can be found without the spectrum
+    """
+    bins = spectrum.argmax(axis=0)
+    return freqs[bins], np.take_along_axis(spectrum, bins[np.newaxis], axis=0)[0]
 
-    offset = len(decibels) - len(postMax)
+def getLoudestPeak(peak_freqs, peak_powers):
+    """
+    Returns the resonant frequency of the frames whose peaks calculateFramePeaks returned, the lowest
+    frequency the greatest power of their spectrum occurs at
+    """
+    loudest = peak_powers == peak_powers.max()
+    return peak_freqs[loudest].min()
 
-    rt20 = times[indexMaxM25 + offset] - times[indexMaxM5 + offset]
+def getSegmentPeaks(peak_freqs, peak_powers, starts, ends):
+    """
+    Returns the resonant frequency of every segment of the frames whose peaks calculateFramePeaks returned,
+    as getLoudestPeak finds it, for segments from starts up to ends that are in order and do not overlap
+    """
+    # reduceat reduces from every bound up to the next, so the frames before, between and after the segments
+    # are bounded too, and a silent frame is added after the last for segments that end there to point at
+    powers = np.append(peak_powers, -np.inf)
+    bounds = np.concatenate(([0], np.stack((starts, ends), axis=1).ravel())).astype(np.intp)
+    loudest = np.maximum.reduceat(powers, bounds)
 
-    return (3 * rt20, indexMax, valueMax, indexMaxM25 + offset)
+    tying = powers == np.repeat(loudest, np.diff(bounds, append=len(powers)))
+    freqs = np.where(tying, np.append(peak_freqs, np.inf), np.inf)
+    return np.minimum.reduceat(freqs, bounds)[1::2].astype(peak_freqs.dtype)
 
-def calculateResonantFreq(spectrum, freqs):
+def getDecibelLimits(decibels):
     """
-    Calculates the resonant frequency given spectrum and frequencies.
-
-    Resonant frequency is the frequency at which the greatest power (in dB) occurs.
-    Since the application converts amplitude to dB with 10 * log10(amp), no conversion to decibels
-    is actually done as it is not necessary (the greatest amp should result in the greatest dB).
+    Returns limits that fit every finite value of decibels, rounded out to g_decibelStep
+    """
+    values = np.asarray(decibels)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return -g_decibelStep, 0
+    low = np.floor(values.min() / g_decibelStep) * g_decibelStep
+    high = np.ceil(values.max() / g_decibelStep) * g_decibelStep
+    return low, max(high, low + g_decibelStep)
+
+def getAmplitudeLimits(peak):
+    """
+    Returns symmetric limits that fit amplitudes up to peak, rounded up to g_amplitudeStep
     """
-    val = spectrum.argmax()
-    indices = np.unravel_index(val, spectrum.shape)
-    res_freq = freqs[indices[0]]
-    return res_freq
+    limit = max(np.ceil(peak / g_amplitudeStep) * g_amplitudeStep, g_amplitudeStep)
+    return -limit, limit
@@ -0,0 +1,104 @@
+# Handles reducing waveforms to what can actually be seen at a given width
+
+import numpy as np
+
+# number of samples in each bucket of the finest level of a pyramid built from samples
+g_baseBucketSize = 16
+
+# levels are added until the coarsest one has no more than this many buckets
+g_minBuckets = 512
+
+def getBucketLimits(buckets):
+    """
+    Returns the minimum and maximum of every row of buckets, laid out as (bucket, sample).
+
+    Rows are halved pairwise while their length is even, numpy compares two long arrays far
+    faster than it reduces many short rows.
+    """
+    mins = maxs = buckets
+    while mins.shape[1] > 1 and mins.shape[1] % 2 == 0:
+        half = mins.shape[1] // 2
+        mins = np.minimum(mins[:, :half], mins[:, half:])
+        maxs = np.maximum(maxs[:, :half], maxs[:, half:])
+    return mins.min(axis=1), maxs.max(axis=1)
+
+class WaveformPyramid:
+    """
+    Minimum and maximum amplitude of a waveform at several resolutions.
+
+    Level i has buckets of bucket_size * 2**i samples, each level is half as long as the one
+    before it. Any time range can then be drawn at screen resolution from the level whose
+    buckets are closest to one per pixel, instead of from every sample.
+    data is the waveform itself if it is kept, so that short ranges can be drawn exactly.
+    """
+    def __init__(self, sample_rate, num_samples, mins, maxs, bucket_size, data=None):
+        self.sample_rate = sample_rate
+        self.num_samples = num_samples
+        self.data = data
+
+        self.levels = [(bucket_size, mins, maxs)]
+        while len(mins) > g_minBuckets:
+            # an odd bucket out is paired with itself
+            if len(mins) % 2:
+                mins = np.append(mins, mins[-1])
+                maxs = np.append(maxs, maxs[-1])
+            mins = np.minimum(mins[0::2], mins[1::2])
+            maxs = np.maximum(maxs[0::2], maxs[1::2])
+            bucket_size *= 2
+            self.levels.append((bucket_size, mins, maxs))
+
+    @classmethod
+    def fromSamples(cls, sample_rate, data, bucket_size=g_baseBucketSize, keep=True):
+        """
+        Returns a new pyramid of the samples in data, which it keeps a reference to if keep is True
+        """
+        data = np.asarray(data)
+        full = len(data) // bucket_size
+
+        # whole buckets are reduced as a view of data, without copying it
+        buckets = data[:full * bucket_size].reshape(full, bucket_size)
+        mins, maxs = getBucketLimits(buckets)
+
+        tail = data[full * bucket_size:]
+        if len(tail):
+            mins = np.append(mins, tail.min())
+            maxs = np.append(maxs, tail.max())
+
+        return cls(sample_rate, len(data), mins, maxs, bucket_size, data if keep else None)
+
+    @property
+    def seconds(self):
+        return self.num_samples / self.sample_rate
+
+    def envelope(self, width, start=0.0, end=None):
+        """
+        Returns times, minimums and maximums that draw the waveform between start and end
+        seconds at width pixels.
+
+        Uses the coarsest level with at least one bucket per pixel. If even the finest level
+        is too coarse and the samples are kept, the samples are returned as both the minimums
+        and maximums.
+        """
+        if end is None:
+            end = self.seconds
+        samples_per_pixel = max((end - start) * self.sample_rate / width, 1)
+
+        first = max(int(start * self.sample_rate), 0)
+        last = min(int(np.ceil(end * self.sample_rate)), self.num_samples)
+
+        if samples_per_pixel < self.levels[0][0] and self.data is not None:
+            samples = self.data[first:last]
+            times = np.arange(first, first + len(samples)) / self.sample_rate
+            return times, samples, samples
+
+        bucket_size, mins, maxs = self.levels[0]
+        for level in self.levels[1:]:
+            if level[0] > samples_per_pixel:
+                break
+            bucket_size, mins, maxs = level
+
+        first_bucket = first // bucket_size
+        last_bucket = min(-(-last // bucket_size), len(mins))
+        centres = (np.arange(first_bucket, last_bucket) + 0.5) * bucket_size
+        times = np.minimum(centres, self.num_samples) / self.sample_rate
+        return times, mins[first_bucket:last_bucket], maxs[first_bucket:last_bucket]
@@ -0,0 +1,38 @@
+# Checks that recordings of many impulses are split where the impulses are, whatever they start with
+
+import numpy as np
+import pytest
+
+import model
+from model.analysis import analyzeSoundFile
+from model.impulses import findImpulseSegments, segmentImpulses
+from model.live import g_floorDecibels
+
+def makeTake(sample_rate, times, seconds, silence=0.0, seed=0):
+    """
+    Returns seconds of room noise with a decaying clap at every one of times, preceded by silence seconds
+    of digital silence
+    """
+    generator = np.random.default_rng(seed)
+    samples = generator.normal(0, 1e-3, int(seconds * sample_rate))
+    decay = np.arange(int(1.5 * sample_rate)) / sample_rate
+    for time in times:
+        start = int(time * sample_rate)
+        samples[start:start + len(decay)] += generator.normal(0, 1, len(decay)) * 10 ** (-3 * decay / 0.5)
+    return np.concatenate((np.zeros(int(silence * sample_rate)), samples)).astype(np.float32)
+
+@pytest.mark.parametrize("silence", [0.0, 0.05, 1.0])
+def test_claps_after_silence_are_segmented(silence):
+    claps = [2, 6, 10, 14]
+    sample_rate = 48000
+    result = analyzeSoundFile(sample_rate, makeTake(sample_rate, claps, 20, silence), model.g_bands,
+                              model.g_bandFraction, model.g_stftSettings)
+    table = segmentImpulses(result)
+    np.testing.assert_allclose(table.times, np.add(claps, silence), atol=0.05)
+
+def test_levels_that_fade_in_after_silence_are_not_an_impulse():
+    # silence, then room noise fading in 30 dB over a few frames, then a clap at frame 60
+    levels = np.concatenate((np.full(10, g_floorDecibels), np.linspace(-90, -60, 5), np.full(45, -60.0),
+                             np.linspace(-20, -60, 40), np.full(40, -60.0)))
+    starts, ends = findImpulseSegments(levels, 0.02)
+    np.testing.assert_array_equal(starts, [60])
@@ -0,0 +1,188 @@
+# Checks the compiled kernels against the NumPy expressions and Python loops they replaced
+
+import numpy as np
+import pytest
+
+import model.kernels
+from model.kernels import findDecayPoints, findOnsets
+from model.live import g_floorDecibels
+from model.utils import calculateBandRT60s
+
+# decibels above the noise that start an impulse and how quickly the noise follows, in the onset tests
+g_onsetDecibels = 20.0
+g_smoothing = 0.05
+
+def referenceDecayPoints(decibels, first_drop, second_drop):
+    """
+    Returns the maximum of every row of decibels and the frames after it closest to first_drop and
+    second_drop below it, found with argmax and a masked argmin as calculateBandRT60s did before its kernel
+    """
+    rows = np.arange(len(decibels))
+    peaks = decibels.argmax(axis=1)
+    peak_values = decibels[rows, peaks]
+    after_peak = np.arange(decibels.shape[1]) >= peaks[:, np.newaxis]
+
+    def closestAfterPeak(targets):
+        # rows of only -inf are nan distances from their targets, which argmin takes as the first frame
+        with np.errstate(invalid="ignore"):
+            distance = np.where(after_peak, np.abs(decibels - targets[:, np.newaxis]), np.inf)
+        return distance.argmin(axis=1)
+
+    return peaks, peak_values, closestAfterPeak(peak_values - first_drop), closestAfterPeak(peak_values - second_drop)
+
+def kernelDecayPoints(decibels, first_drop, second_drop):
+    """
+    Returns what findDecayPoints writes for every row of decibels, in the order referenceDecayPoints returns them
+    """
+    count = len(decibels)
+    peaks, first_points, second_points = (np.empty(count, np.int64) for _ in range(3))
+    peak_values = np.empty(count, decibels.dtype)
+    drop = decibels.dtype.type
+    findDecayPoints(0, count, decibels, drop(first_drop), drop(second_drop), peaks, peak_values, first_points,
+                    second_points)
+    return peaks, peak_values, first_points, second_points
+
+def makeDecibels(dtype, rows=64, frames=200, seed=0):
+    """
+    Returns rows of decibels that cover what the analysis passes the kernel: decaying curves with noise,
+    whole decibel values that tie for the maximum and for the closest points, rows padded with -inf
+    after their end as impulse segments are, rows of only -inf and rows of a single value
+    """
+    generator = np.random.default_rng(seed)
+    frame = np.arange(frames)
+    onsets = generator.integers(0, frames // 2, rows)[:, np.newaxis]
+    decay = np.where(frame >= onsets, -60 * (frame - onsets) / frames, -80.0)
+    decibels = decay + generator.normal(0, 3, (rows, frames))
+
+    ties = decibels.copy()
+    ties[::2] = np.round(ties[::2])
+    ties[1::2] = np.round(ties[1::2] / 5) * 5
+
+    padded = decibels.copy()
+    padded[frame >= generator.integers(1, frames, rows)[:, np.newaxis]] = -np.inf
+
+    silent = np.full((4, frames), -np.inf)
+    flat = np.full((4, frames), -30.0)
+    return np.ascontiguousarray(np.concatenate((decibels, ties, padded, silent, flat)), dtype)
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_decay_points_match_numpy(dtype):
+    decibels = makeDecibels(dtype)
+    for expected, found in zip(referenceDecayPoints(decibels, 5, 25), kernelDecayPoints(decibels, 5, 25)):
+        np.testing.assert_array_equal(found, expected)
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_decay_points_of_single_frames(dtype):
+    decibels = np.array([[-12.0], [-np.inf]], dtype)
+    for expected, found in zip(referenceDecayPoints(decibels, 5, 25), kernelDecayPoints(decibels, 5, 25)):
+        np.testing.assert_array_equal(found, expected)
+
+def test_decay_points_reject_empty_rows():
+    with pytest.raises(ValueError):
+        kernelDecayPoints(np.zeros((1, 0)), 5, 25)
+
+def test_band_rt60s_match_numpy_across_threads(monkeypatch):
+    # bands are only split across threads when they are long, which is lowered so the split is taken
+    monkeypatch.setattr(model.kernels, "g_parallelFrames", 1)
+    monkeypatch.setattr(model.kernels, "g_kernelThreads", 3)
+    decibels = makeDecibels(np.float32, seed=1)
+    times = np.arange(decibels.shape[1]) * 0.01
+
+    peaks, peak_values, first_points, second_points = referenceDecayPoints(decibels, 5, 25)
+    rt60s = calculateBandRT60s(decibels, times)
+    np.testing.assert_array_equal(rt60s.peak, peaks)
+    np.testing.assert_array_equal(rt60s.peak_decibels, peak_values)
+    np.testing.assert_array_equal(rt60s.end, second_points)
+    np.testing.assert_array_equal(rt60s.rt60, 3 * (times[second_points] - times[first_points]))
+
+def referenceOnsets(levels, first, noise, armed, onset, impulse_frames):
+    """
+    Returns the onsets findOnsets finds in levels and the state it is left in, followed frame by frame in Python
+    """
+    onsets = []
+    for frame, level in enumerate(levels, first):
+        if onset >= 0:
+            if frame - onset + 1 >= impulse_frames:
+                onsets.append(onset)
+                onset = -1
+            continue
+        if level <= g_floorDecibels:
+            continue
+        if np.isnan(noise):
+            noise = level
+        elif armed and level > noise + g_onsetDecibels:
+            onset, armed = frame, False
+            continue
+        if level < noise + g_onsetDecibels / 2:
+            armed = True
+        if level < noise + g_onsetDecibels or not armed:
+            noise += g_smoothing * (level - noise)
+    return onsets, noise, armed, onset
+
+def kernelOnsets(levels, first, noise, armed, onset, impulse_frames):
+    """
+    Returns what findOnsets finds in levels, in the order referenceOnsets returns it
+    """
+    levels = np.asarray(levels, float)
+    onsets = np.empty(len(levels), np.int64)
+    count, noise, armed, onset = findOnsets(levels, first, noise, armed, onset, impulse_frames, g_onsetDecibels,
+                                            g_smoothing, g_floorDecibels, onsets)
+    return list(onsets[:count]), noise, armed, onset
+
+def assertOnsetsMatch(levels, noise=np.nan, impulse_frames=5):
+    """
+    Checks findOnsets against referenceOnsets over the whole of levels and returns the onsets they find
+    """
+    expected = referenceOnsets(levels, 0, noise, True, -1, impulse_frames)
+    found = kernelOnsets(levels, 0, noise, True, -1, impulse_frames)
+    assert found[0] == expected[0]
+    np.testing.assert_allclose(found[1], expected[1])
+    assert found[2:] == expected[2:]
+    return found[0]
+
+def makeImpulse(frames, peak=-20.0, noise=-60.0):
+    """
+    Returns the levels of an impulse that starts at peak decibels and decays to noise over frames
+    """
+    return np.linspace(peak, noise, frames)
+
+def test_onsets_rearm_after_tail():
+    # the second impulse comes while the tail of the first is still loud, the third once it has died down
+    levels = np.concatenate((np.full(20, -60.0), makeImpulse(30), np.full(20, -60.0), makeImpulse(10),
+                             np.full(5, -60.0), makeImpulse(30)))
+    levels[30] = -10
+    assert assertOnsetsMatch(levels) == [20, 70, 85]
+
+def test_onsets_are_suppressed_for_impulse_frames():
+    # an impulse is recorded for impulse_frames, later frames cannot start another until it is and
+    # a quiet frame has followed it
+    levels = np.concatenate((np.full(20, -60.0), np.tile([-10.0, -60.0], 10), np.full(30, -60.0)))
+    assert assertOnsetsMatch(levels, impulse_frames=30) == [20]
+    assert assertOnsetsMatch(levels, impulse_frames=2) == [20, 24, 28, 32, 36]
+
+def test_onsets_pass_over_leading_silence():
+    levels = np.concatenate((np.full(20, g_floorDecibels), np.full(20, -60.0), makeImpulse(30)))
+    assert assertOnsetsMatch(levels) == [40]
+    assert assertOnsetsMatch(levels, noise=-60.0) == [40]
+
+def test_onsets_seed_noise_from_first_sound():
+    # nan noise is taken from the first frame that is not silent, a fade in that is louder than it
+    # starts an impulse, which an estimated noise passed in avoids
+    levels = np.concatenate((np.full(5, g_floorDecibels), [-90.0], np.full(40, -60.0), makeImpulse(30)))
+    assert assertOnsetsMatch(levels) == [6, 46]
+    assert assertOnsetsMatch(levels, noise=-60.0) == [46]
+    assert np.isnan(kernelOnsets(np.full(10, g_floorDecibels), 0, np.nan, True, -1, 5)[1])
+
+def test_onsets_match_python_in_blocks():
+    # live input searches a block at a time, carrying the state from one block to the next
+    generator = np.random.default_rng(0)
+    levels = -60 + generator.normal(0, 3, 2000)
+    levels[generator.integers(0, 2000, 40)] = -15
+    levels[:50] = g_floorDecibels
+    expected = assertOnsetsMatch(levels)
+
+    found, state = [], (np.nan, True, -1)
+    for first in range(0, len(levels), 128):
+        onsets, *state = kernelOnsets(levels[first:first + 128], first, *state, 5)
+        found += onsets
+    assert found == expected
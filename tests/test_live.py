@@ -0,0 +1,54 @@
+# Checks that impulses are found in live input where they are, whatever the recording starts with
+
+import pathlib
+
+import numpy as np
+import pytest
+
+import model
+from controller.decoders import decodeFile, toMono
+from model.live import LiveAnalyzer, g_impulseSeconds
+
+g_exampleDirectory = pathlib.Path(__file__).parent.parent / "example_audio"
+
+def recordLive(sample_rate, samples, blocksize=1024):
+    """
+    Returns the times of the impulses found in samples written to a LiveAnalyzer a block at a time, followed
+    by enough silence for the last impulse to be analyzed
+    """
+    samples = np.concatenate((samples, np.zeros(int((g_impulseSeconds + 1) * sample_rate), np.float32)))
+    analyzer = LiveAnalyzer(sample_rate, model.g_bands, model.g_bandFraction, model.g_stftSettings)
+    events = []
+    for start in range(0, len(samples), blocksize):
+        analyzer.write(samples[start:start + blocksize])
+        events += analyzer.process()
+    return np.array([event.time for event in events])
+
+def makeClaps(sample_rate, times, seconds, silence=0.0, fade=0.0, seed=0):
+    """
+    Returns seconds of room noise with a decaying clap at every one of times, preceded by silence seconds of
+    digital silence and faded in over fade seconds
+    """
+    generator = np.random.default_rng(seed)
+    samples = generator.normal(0, 1e-3, int(seconds * sample_rate))
+    decay = np.arange(int(1.5 * sample_rate)) / sample_rate
+    for time in times:
+        start = int(time * sample_rate)
+        clap = generator.normal(0, 1, len(decay)) * 10 ** (-3 * decay / 0.5)
+        samples[start:start + len(decay)] += clap[:len(samples) - start]
+    samples[:int(fade * sample_rate)] *= np.linspace(0, 1, int(fade * sample_rate))
+    return np.concatenate((np.zeros(int(silence * sample_rate)), samples)).astype(np.float32)
+
+@pytest.mark.parametrize("name, time", [("Clap1.wav", 0.84), ("Clap2.wav", 0.81)])
+def test_example_clap_is_found(name, time):
+    sample_rate, samples = decodeFile(g_exampleDirectory / name)
+    times = recordLive(sample_rate, toMono(samples))
+    assert len(times) == 1
+    assert times[0] == pytest.approx(time, abs=0.05)
+
+@pytest.mark.parametrize("silence, fade", [(0.0, 0.0), (0.05, 0.0), (1.0, 0.0), (0.5, 0.5)])
+def test_claps_after_silence_are_found(silence, fade):
+    claps = [1, 5, 9, 13]
+    sample_rate = 48000
+    times = recordLive(sample_rate, makeClaps(sample_rate, claps, 17, silence, fade))
+    np.testing.assert_allclose(times, np.add(claps, silence), atol=0.05)
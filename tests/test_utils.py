@@ -0,0 +1,29 @@
+# Checks the calculations of model.utils that work on many values at once against doing them one at a time
+
+import numpy as np
+import pytest
+
+from model.utils import getLoudestPeak, getSegmentPeaks
+
+@pytest.mark.parametrize("seed", range(5))
+def test_segment_peaks_match_each_segment(seed):
+    generator = np.random.default_rng(seed)
+    frames = 300
+    # few distinct powers and frequencies, so the loudest frames of a segment often tie
+    peak_powers = generator.integers(0, 4, frames).astype(np.float32)
+    peak_freqs = generator.choice(np.float32([125, 250, 500, 1000]), frames)
+
+    bounds = np.sort(generator.choice(np.arange(frames + 1), 20, replace=False))
+    starts, ends = bounds[::2], bounds[1::2]
+    # segments that start where the last ended and one that ends at the last frame
+    ends[3] = starts[4]
+    ends[-1] = frames
+
+    expected = [getLoudestPeak(peak_freqs[start:end], peak_powers[start:end]) for start, end in zip(starts, ends)]
+    found = getSegmentPeaks(peak_freqs, peak_powers, starts, ends)
+    assert found.dtype == peak_freqs.dtype
+    np.testing.assert_array_equal(found, expected)
+
+def test_segment_peaks_of_no_segments():
+    found = getSegmentPeaks(np.ones(4, np.float32), np.ones(4, np.float32), np.zeros(0, int), np.zeros(0, int))
+    assert found.shape == (0,)
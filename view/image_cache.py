@@ -0,0 +1,45 @@
+from collections import OrderedDict
+import threading
+
+from pyglet.image import ImageData
+
+class ImageCache:
+    """
+    Bounded least recently used cache of rendered graph images
+
+    Safe to use from the render thread and the main thread at the same time
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._images: OrderedDict[tuple, ImageData] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._images)
+
+    def get(self, key: tuple) -> ImageData | None:
+        """
+        Returns the image stored under key and marks it as recently used, or None if it is not cached
+        """
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+            return image
+
+    def put(self, key: tuple, image: ImageData):
+        """
+        Stores image under key, evicting the least recently used images if the cache is full
+        """
+        with self._lock:
+            self._images[key] = image
+            self._images.move_to_end(key)
+            while len(self._images) > self.max_size:
+                self._images.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes every image from the cache
+        """
+        with self._lock:
+            self._images.clear()
@@ -0,0 +1,41 @@
+import pyglet
+from pyglet.shapes import Rectangle
+from pyglet.text import Label
+
+# number of recent stages listed by the overlay
+overlay_stages = 14
+
+class ProfileOverlay:
+    """
+    Shows how long recent frames took to draw and how long the latest stages of loading, analyzing
+    and drawing took, from the spans recorded by a Profiler
+    """
+    def __init__(self, x: int, y: int, width: int, height: int):
+        """
+        Creates an overlay covering width by height pixels with its upper left corner at x, y
+        """
+        self.batch = pyglet.graphics.Batch()
+        background = pyglet.graphics.Group(order=0)
+        foreground = pyglet.graphics.Group(order=1)
+        self.background = Rectangle(x, y - height, width, height, color=(0, 0, 0, 190), batch=self.batch, group=background)
+        self.label = Label("", font_name="Courier New", font_size=10, color=(255, 255, 255, 255), x=x + 8, y=y - 8,
+                           width=width - 16, anchor_y="top", multiline=True, batch=self.batch, group=foreground)
+
+    def update(self, profiler):
+        """
+        Shows the latest timings of profiler
+        """
+        frames = profiler.frameTimes()
+        if frames:
+            average = sum(frames) / len(frames)
+            lines = [f"frame {average * 1000:6.1f} ms avg {max(frames) * 1000:6.1f} ms max"]
+        else:
+            lines = ["frame      - ms"]
+        lines.append("")
+
+        for name, category, start, duration, thread, args in profiler.latest(overlay_stages):
+            lines.append(f"{name:<20.20} {duration / 1e6:8.1f} ms")
+        self.label.text = "\n".join(lines)
+
+    def draw(self):
+        self.batch.draw()
@@ -0,0 +1,243 @@
+from abc import ABC, abstractmethod
+
+from matplotlib.ticker import MaxNLocator
+import numpy as np
+import pyglet
+from pyglet.image import ImageData, Texture
+from pyglet.shapes import Line, Rectangle
+from pyglet.sprite import Sprite
+from pyglet.text import Label
+
+from model.profiler import span
+
+# most tick labels on an axis
+max_ticks = 8
+
+# length of tick marks in pixels
+tick_length = 5
+
+# shortest time range in seconds a plot can be zoomed into
+min_time_span = 0.01
+
+black = (0, 0, 0, 255)
+white = (255, 255, 255, 255)
+
+def pixels_to_image(pixels: np.ndarray) -> ImageData:
+    """
+    converts a (height, width, 4) uint8 array, with the bottom row first, into an image
+    """
+    height, width = pixels.shape[:2]
+    return ImageData(width, height, "RGBA", np.ascontiguousarray(pixels).tobytes(), 4*width)
+
+class Axis:
+    """
+    Tick marks and labels along one edge of a plot
+
+    side is "bottom", "left" or "right" and is where the ticks are drawn from the edge starting at x, y
+
+    Labels and marks are created once and reused whenever the range changes
+    """
+    def __init__(self, side: str, x: int, y: int, length: int, batch: pyglet.graphics.Batch, group=None):
+        self.side = side
+        self.x = x
+        self.y = y
+        self.length = length
+        self.locator = MaxNLocator(max_ticks)
+        anchor_x = {"bottom": "center", "left": "right", "right": "left"}[side]
+        anchor_y = "top" if side == "bottom" else "center"
+        self.marks = [Line(0, 0, 0, 0, color=black, batch=batch, group=group) for _ in range(max_ticks + 2)]
+        self.labels = [Label("", font_size=10, color=black, anchor_x=anchor_x, anchor_y=anchor_y, batch=batch, group=group)
+                       for _ in range(max_ticks + 2)]
+
+    def set_range(self, low: float, high: float):
+        """
+        Places ticks at round values between low and high
+        """
+        values = [value for value in self.locator.tick_values(low, high) if low <= value <= high]
+        for i, (mark, label) in enumerate(zip(self.marks, self.labels)):
+            if i >= len(values):
+                mark.visible = False
+                label.visible = False
+                continue
+
+            # whole pixels keep thin glyphs such as the minus sign sharp
+            offset = round((values[i] - low) / (high - low) * self.length)
+            if self.side == "left":
+                mark.x, mark.y, mark.x2, mark.y2 = self.x - tick_length, self.y + offset, self.x, self.y + offset
+                label.x, label.y = self.x - tick_length - 2, self.y + offset
+            elif self.side == "right":
+                mark.x, mark.y, mark.x2, mark.y2 = self.x, self.y + offset, self.x + tick_length, self.y + offset
+                label.x, label.y = self.x + tick_length + 2, self.y + offset
+            else:
+                mark.x, mark.y, mark.x2, mark.y2 = self.x + offset, self.y - tick_length, self.x + offset, self.y
+                label.x, label.y = self.x + offset, self.y - tick_length - 2
+            # setting the text lays the label out again even when it is unchanged
+            text = f"{values[i]:g}"
+            if label.text != text:
+                label.text = text
+            mark.visible = True
+            label.visible = True
+
+class PlotView(ABC):
+    """
+    A plot over time drawn into a texture the size of the plot on screen, with axes drawn by pyglet
+
+    Zooming and panning only change the time range, the texture is filled again by render the
+    next time the view is drawn, so any number of mouse events between two frames cost a single
+    render of the pixels that are shown
+    """
+    def __init__(self, x: int, y: int, width: int, height: int, plot_width: float, ylabel: str = ""):
+        """
+        Creates a view covering width by height pixels with its lower left corner at x, y
+
+        plot_width is the share of the width taken by the plot itself
+        """
+        self.batch = pyglet.graphics.Batch()
+        self.source = None
+        self.extent = (0.0, 1.0)
+        self.range = (0.0, 1.0)
+        self.stale = False
+
+        # the plot takes the same share of the area as it does in a figure
+        self.plot_x = x + int(width * 0.125)
+        self.plot_y = y + int(height * 0.11)
+        self.plot_width = int(width * plot_width)
+        self.plot_height = int(height * 0.77)
+
+        self.background_group = pyglet.graphics.Group(order=0)
+        self.foreground_group = pyglet.graphics.Group(order=1)
+        self.background = Rectangle(x, y, width, height, color=white, batch=self.batch, group=self.background_group)
+
+        self.texture = Texture.create(self.plot_width, self.plot_height)
+        self.plot = Sprite(self.texture, self.plot_x, self.plot_y, batch=self.batch, group=self.foreground_group)
+
+        self.frame = []
+        self._add_frame(self.plot_x, self.plot_width)
+
+        self.time_axis = Axis("bottom", self.plot_x, self.plot_y, self.plot_width, self.batch, self.foreground_group)
+        self.value_axis = Axis("left", self.plot_x, self.plot_y, self.plot_height, self.batch, self.foreground_group)
+
+        self.time_label = Label("Time (s)", font_size=10, color=black, x=self.plot_x + self.plot_width // 2,
+                                y=self.plot_y - 30, anchor_x="center", anchor_y="top",
+                                batch=self.batch, group=self.foreground_group)
+        self.value_label = Label(ylabel, font_size=10, color=black, x=self.plot_x - 55,
+                                 y=self.plot_y + self.plot_height // 2, anchor_x="center", anchor_y="bottom",
+                                 rotation=-90, batch=self.batch, group=self.foreground_group)
+
+    def _add_frame(self, left: int, frame_width: int):
+        """
+        Adds a frame around an area as tall as the plot
+        """
+        right, top = left + frame_width, self.plot_y + self.plot_height
+        for x1, y1, x2, y2 in ((left, self.plot_y, right, self.plot_y), (left, top, right, top),
+                               (left, self.plot_y, left, top), (right, self.plot_y, right, top)):
+            self.frame.append(Line(x1, y1, x2, y2, color=black, batch=self.batch, group=self.foreground_group))
+
+    @abstractmethod
+    def render(self, start: float, end: float) -> np.ndarray:
+        """
+        Returns the pixels of the plot between start and end seconds
+        """
+
+    def set_range(self, start: float, end: float):
+        """
+        Shows the plot between start and end seconds, kept within the extent of the plot
+        """
+        first, last = self.extent
+        span = min(max(end - start, min(min_time_span, last - first)), last - first)
+        start = min(max(start, first), last - span)
+        self.range = (start, start + span)
+        self.stale = True
+
+    def reset_range(self):
+        """
+        Shows the whole plot
+        """
+        self.set_range(*self.extent)
+
+    def contains(self, x: int, y: int) -> bool:
+        return self.plot_x <= x < self.plot_x + self.plot_width and self.plot_y <= y < self.plot_y + self.plot_height
+
+    def zoom(self, x: int, factor: float):
+        """
+        Scales the time range shown by factor, keeping the time under the pixel column x in place
+        """
+        start, end = self.range
+        fraction = (x - self.plot_x) / self.plot_width
+        time = start + fraction * (end - start)
+        span = (end - start) * factor
+        self.set_range(time - fraction * span, time + (1 - fraction) * span)
+
+    def pan(self, dx: int):
+        """
+        Moves the time range so that the plot follows the mouse being dragged by dx pixels
+        """
+        start, end = self.range
+        shift = dx / self.plot_width * (end - start)
+        self.set_range(start - shift, end - shift)
+
+    def draw(self):
+        if self.stale:
+            self.stale = False
+            start, end = self.range
+            pixels = self.render(start, end)
+            with span("upload texture"):
+                self.texture.blit_into(pixels_to_image(pixels), 0, 0, 0)
+            self.time_axis.set_range(start, end)
+        self.batch.draw()
+
+class CurveView(PlotView):
+    """
+    Draws a CurvePlot from the model, such as the waveform or the decibels of a band, with a
+    legend naming its curves when they have labels
+    """
+    def __init__(self, x: int, y: int, width: int, height: int):
+        """
+        Creates a view covering width by height pixels with its lower left corner at x, y
+        """
+        super().__init__(x, y, width, height, 0.775)
+        self.legend_box = Rectangle(self.plot_x + 8, 0, 0, 0, color=white, batch=self.batch, group=self.foreground_group)
+        self.legend_lines: list[Line] = []
+        self.legend_labels: list[Label] = []
+
+    def set_plot(self, curves):
+        """
+        Shows curves, a CurvePlot from the model, over its whole time range
+        """
+        self.source = curves
+        self.extent = curves.extent
+        self.value_axis.set_range(*curves.ylim)
+        self.value_label.text = curves.ylabel
+        self._update_legend([(curve.label, curve.color) for curve in curves.curves if curve.label])
+        self.reset_range()
+
+    def render(self, start: float, end: float) -> np.ndarray:
+        return self.source.render(self.plot_width, self.plot_height, start, end)
+
+    def _update_legend(self, entries: list[tuple[str, tuple]]):
+        """
+        Shows a line of each color next to each label in the upper left corner of the plot
+        """
+        while len(self.legend_labels) < len(entries):
+            self.legend_lines.append(Line(0, 0, 0, 0, width=2, batch=self.batch, group=self.foreground_group))
+            self.legend_labels.append(Label("", font_size=10, color=black, anchor_y="center",
+                                            batch=self.batch, group=self.foreground_group))
+
+        left = self.legend_box.x
+        top = self.plot_y + self.plot_height - 8
+        for i, (line, label) in enumerate(zip(self.legend_lines, self.legend_labels)):
+            shown = i < len(entries)
+            line.visible = label.visible = shown
+            if not shown:
+                continue
+            y = top - 10 - 18 * i
+            line.x, line.y, line.x2, line.y2 = left + 6, y, left + 30, y
+            line.color = entries[i][1]
+            label.x, label.y = left + 36, y
+            label.text = entries[i][0]
+
+        self.legend_box.visible = bool(entries)
+        if entries:
+            self.legend_box.y = top - 18 * len(entries) - 2
+            self.legend_box.width = max(label.content_width for label in self.legend_labels[:len(entries)]) + 44
+            self.legend_box.height = 18 * len(entries) + 2
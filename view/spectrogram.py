@@ -0,0 +1,48 @@
+import numpy as np
+from pyglet.image import Texture
+from pyglet.sprite import Sprite
+from pyglet.text import Label
+
+from .plot import Axis, PlotView, black, pixels_to_image
+
+class SpectrogramView(PlotView):
+    """
+    Draws a spectrogram straight from the analysis into a texture, with axes drawn by pyglet
+
+    The texture is the size of the plot on screen and is filled again whenever the visible
+    range changes, so panning and zooming only colors the pixels that are shown
+    """
+    def __init__(self, x: int, y: int, width: int, height: int):
+        """
+        Creates a view covering width by height pixels with its lower left corner at x, y
+        """
+        super().__init__(x, y, width, height, 0.65, "Frequency (Hz)")
+        self.frequency_range = (0.0, 1.0)
+
+        # the colorbar takes the same share of the area as it does in the spectrogram figure
+        colorbar_x = self.plot_x + self.plot_width + int(width * 0.05)
+        colorbar_width = int(width * 0.02)
+        self.colorbar_texture = Texture.create(colorbar_width, self.plot_height)
+        self.colorbar = Sprite(self.colorbar_texture, colorbar_x, self.plot_y, batch=self.batch, group=self.foreground_group)
+        self._add_frame(colorbar_x, colorbar_width)
+
+        self.decibel_axis = Axis("right", colorbar_x + colorbar_width, self.plot_y, self.plot_height,
+                                 self.batch, self.foreground_group)
+        self.decibel_label = Label("Intensity (dB)", font_size=10, color=black, x=colorbar_x + colorbar_width + 55,
+                                   y=self.plot_y + self.plot_height // 2, anchor_x="center", anchor_y="top",
+                                   rotation=-90, batch=self.batch, group=self.foreground_group)
+
+    def set_plot(self, image):
+        """
+        Shows the spectrogram of image, a SpectrogramImage from the model, over its whole range
+        """
+        self.source = image
+        self.colorbar_texture.blit_into(pixels_to_image(image.colorbar(self.colorbar_texture.width, self.plot_height)), 0, 0, 0)
+        self.decibel_axis.set_range(*image.clim)
+        self.extent = image.extent[:2]
+        self.frequency_range = image.extent[2:]
+        self.value_axis.set_range(*self.frequency_range)
+        self.reset_range()
+
+    def render(self, start: float, end: float) -> np.ndarray:
+        return self.source.render(self.plot_width, self.plot_height, start, end, *self.frequency_range)
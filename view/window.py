@@ -1,22 +1,28 @@
-from tkinter.filedialog import askopenfilename
-from tkinter.messagebox import showerror
-import pathlib
-
-from tkinter.filedialog import askopenfilename
-from tkinter.messagebox import showerror
+from tkinter.filedialog import askdirectory, askopenfilenames
+from tkinter.messagebox import showerror, showinfo
+from concurrent.futures import Future, ThreadPoolExecutor
 import pathlib
+import threading
+from typing import TYPE_CHECKING
 
 import pyglet
 from pyglet.gui.widgets import PushButton
+from pyglet.window import key, mouse
 from pyglet.image import ImageData
 from pyglet.text import Label
-from matplotlib.backends.backend_agg import FigureCanvasAgg
-from matplotlib.figure import Figure
-
 
 import controller
+from model.profiler import getProfiler, span, startProfiling, g_frameCategory
+from .image_cache import ImageCache
+from .overlay import ProfileOverlay
+from .plot import CurveView
+from .spectrogram import SpectrogramView
 from .widgets import SliderButton
 
+# matplotlib's figures and the model's figure sets are only needed for type hints, the model imports them once a figure is built
+if TYPE_CHECKING:
+    from model.figures import ComparisonFigureSet, FigureSet
+
 # telling pyglet where the assets folder is
 assets = pathlib.Path(__file__).parents[1] / "assets"
 pyglet.resource.path = [str(assets)]
@@ -35,17 +41,33 @@ tall_rectangle = pyglet.resource.image("small_rectangle.png")
 wide_rectangle = pyglet.resource.image("big_rectangle.png")
 icon = pyglet.resource.image("speaker_icon.png")
 
-def figure_to_image(fig: Figure) -> ImageData:
-    """
-    converts a matplotlib Figure into an image that can be drawn to the 
-    window with pyglet
-    """
+# number of rendered comparison graphs kept in memory, enough for a few comparisons
+image_cache_size = 18
+
+# number of times a second the live graph is redrawn
+live_refresh_rate = 10
+
+# number of times a second the profiling overlay is updated
+overlay_refresh_rate = 4
+
+# share of the time range kept by every step of the mouse wheel when zooming in
+zoom_step = 0.8
+
+# titles of the graphs of a single file
+file_titles = ["Waveform",
+               "Spectrogram",
+               "Low Frequency",
+               "Mid Frequency",
+               "High Frequency",
+               "All Frequencies",
+               ]
+
+def rendered_to_image(rendered: tuple[bytes, tuple[int, int]]) -> ImageData:
     """
-    converts a matplotlib Figure into an image that can be drawn to the 
-    window with pyglet
+    converts the RGBA pixels of a rendered figure, and their width and height, into an image
+    that can be drawn to the window with pyglet
     """
-    canvas = FigureCanvasAgg(fig)
-    data, (width, height) = canvas.print_to_buffer()
+    data, (width, height) = rendered
     image = ImageData(width, height, "RGBA", data, -4*width)
     return image
 
@@ -55,12 +77,17 @@ class AppWindow(pyglet.window.Window):
 
     Contains all relevant ui elements and functions for the view
     """
-    def __init__(self):
+    def __init__(self, live_file: str | None = None, profile: bool = False, trace: str | None = None):
         """
         Creates a new window instance that will be opened when pyglet.app.run is called
         """
         """
         Creates a new window instance that will be opened when pyglet.app.run is called
+
+        live_file is played as the live input instead of recording from the default input device
+
+        profile shows the profiling overlay from the start, trace is a file every span recorded is
+        written to as a Chrome trace when the window closes. Either one starts profiling.
         """
         super().__init__(1200, 675, caption="Audio Analyzer")
         self.set_icon(icon)
@@ -70,15 +97,47 @@ class AppWindow(pyglet.window.Window):
         self.num_images: int = -1
         self.choosing_file: bool = False
         self.image_index: int = 0
-        self.images: list[ImageData] = [ImageData(1, 1, "RGBA", "0000")]
-        self.titles: list[str] = ["Waveform", 
-                                  "Spectrogram",
-                                  "Low Frequency",
-                                  "Mid Frequency",
-                                  "High Frequency",
-                                  "All Frequencies",
-                                  "All Frequencies",
-                                  ]
+        self.current_image: ImageData = ImageData(1, 1, "RGBA", "0000")
+
+        # graphs of a file are drawn by plot views, comparison graphs are only rendered as figures when
+        # they are first shown, or prefetched on the render thread
+        self.figures: "FigureSet | ComparisonFigureSet | list" = []
+        self.file_key: tuple = ()
+        self.analyzing: bool = False
+        self.loading_dots: int = 0
+
+        # job, file name and file key of the file being loaded, replaced as a whole so other threads
+        # always see matching values
+        self.loading: tuple = (None, "", ())
+        self.image_cache = ImageCache(image_cache_size)
+        self.render_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
+        self.pending_renders: dict[tuple, Future] = {}
+        self.pending_lock = threading.Lock()
+
+        # shift is checked when the load file button is pressed, to add files to the comparison
+        self.keys = key.KeyStateHandler()
+        self.push_handlers(self.keys)
+
+        # the live graph is updated in place and redrawn at a steady rate while live input runs
+        self.live_file = live_file
+        self.live_figure = None
+
+        # graphs of a file are drawn straight into a texture instead of being rendered as a figure,
+        # so they can be zoomed and panned, the time range shown is kept when switching graphs
+        self.plot_views = {"spectrogram": SpectrogramView(0, 50, 1200, 525), "curves": CurveView(0, 50, 1200, 525)}
+        self.plot_view = None
+        self.time_range: tuple[float, float] | None = None
+
+        # stages are only timed once profiling starts, with P or either argument
+        self.trace = trace
+        self.overlay = ProfileOverlay(100, 570, 330, 250)
+        self.showing_overlay: bool = False
+        if profile or trace:
+            startProfiling()
+        if profile:
+            self._toggle_overlay()
+
+        self.titles: list[str] = file_titles
         self.rt_60s: list[float] = []
         
         
@@ -114,6 +173,10 @@ class AppWindow(pyglet.window.Window):
         self.frequency_label = Label("Highest Resonant Frequency: ", font_size=15, color=(0, 0 , 0, 255), x=700, y=30, width=100, height=15, batch=self.label_batch, dpi=100)
         self.title_label = Label("", "Calibri", font_size=50, color=(0, 0, 0, 255), x=300, y=600, width=900, height=100, align='center', batch=self.label_batch, dpi=100)
 
+        # libraries only needed once a file is chosen are imported in the background after the window
+        # first appears, instead of holding up startup
+        pyglet.clock.schedule_once(lambda dt: controller.startWarmUp(), 0)
+
     
     
     def on_draw(self):
@@ -122,77 +185,444 @@ class AppWindow(pyglet.window.Window):
 
         Defines a draw loop for the window
         """
-        self.clear()
-        self.images[self.image_index].blit(0, 50)
-        self.gui_batch.draw()
-        self.label_batch.draw()
+        with span("on_draw", g_frameCategory):
+            self.clear()
+            if self.plot_view is not None and self.live_figure is None:
+                self.plot_view.draw()
+            else:
+                self.current_image.blit(0, 50)
+            self.gui_batch.draw()
+            self.label_batch.draw()
+            if self.showing_overlay:
+                self.overlay.draw()
+
+    def on_close(self):
+        """
+        Overwrites on_close method in pyglet.window.Window
+
+        Stops any prefetching before the window closes
+        """
+        self.render_executor.shutdown(wait=False, cancel_futures=True)
+        controller.stopLiveInput()
+        profiler = getProfiler()
+        if self.trace and profiler is not None:
+            profiler.write(self.trace)
+        super().on_close()
 
-    def update_images(self, data: tuple[list[Figure], list[float], float, float] | None):
+    def on_key_press(self, symbol, modifiers):
         """
-        Called from model
+        Overwrites on_key_press method in pyglet.window.Window
+
+        L starts and stops live input, R shows the whole time range of the graphs again,
+        P shows and hides the profiling overlay and E exports the graphs and numbers of the
+        file shown, or of every compared file
+        """
+        if symbol == key.L:
+            if self.live_figure is None:
+                self._start_live()
+            else:
+                self._stop_live()
+            return
+        if symbol == key.P:
+            self._toggle_overlay()
+            return
+        if symbol == key.E:
+            self._export()
+            return
+        if symbol == key.R and self.plot_view is not None:
+            self.plot_view.reset_range()
+            self.time_range = None
+            return
+        super().on_key_press(symbol, modifiers)
+
+    def on_mouse_scroll(self, x, y, scroll_x, scroll_y):
+        """
+        Overwrites on_mouse_scroll method in pyglet.window.Window
+
+        Zooms the graph in and out around the mouse
+        """
+        view = self._interactive_view()
+        if view is not None and view.contains(x, y):
+            view.zoom(x, zoom_step ** scroll_y)
+            self.time_range = view.range
+
+    def on_mouse_drag(self, x, y, dx, dy, buttons, modifiers):
+        """
+        Overwrites on_mouse_drag method in pyglet.window.Window
+
+        Pans the graph along with the mouse while the left button is held
+        """
+        view = self._interactive_view()
+        if view is not None and buttons & mouse.LEFT and view.contains(x - dx, y - dy):
+            view.pan(dx)
+            self.time_range = view.range
+
+    def _toggle_overlay(self):
+        """
+        Shows or hides the profiling overlay, profiling starts the first time it is shown
+        """
+        self.showing_overlay = not self.showing_overlay
+        pyglet.clock.unschedule(self._update_overlay)
+        if self.showing_overlay:
+            startProfiling()
+            pyglet.clock.schedule_interval(self._update_overlay, 1 / overlay_refresh_rate)
+            self._update_overlay(0)
+
+    def _update_overlay(self, dt):
+        profiler = getProfiler()
+        if profiler is not None:
+            self.overlay.update(profiler)
+
+    def _interactive_view(self):
+        """
+        Returns the plot view being shown, or None if the graph shown cannot be zoomed
+        """
+        if self.live_figure is not None:
+            return None
+        return self.plot_view
+
+    def post_results(self, figures: "FigureSet | None", job=None):
+        """
+        Called from model, usually on the controller's loader thread
+
+        Prepares the first graph off the main thread, then hands figures over to update_images
+        on the main thread with pyglet.clock.schedule_once
+        """
+        loading_job, _, _ = self.loading
+        if figures is not None and job is loading_job:
+            with span("prepare first graph"):
+                figures.getPlot(0)
+
+        pyglet.clock.schedule_once(lambda dt: self.update_images(figures, job), 0)
+        pyglet.app.platform_event_loop.notify()
+
+    def update_images(self, figures: "FigureSet | None", job=None):
+        """
+        Called on the main thread once the model has results
 
         receives relevant information from the model and processes accordingly
 
-        expects a tuple containing a list of the figures, a list of the rt60 values, the length of the audio in seconds, and highest res frequency
+        expects the FigureSet of the file's AnalysisResult, None if the file could not be opened.
+        the rt60 values, length of the audio in seconds and highest res frequency are read from its result
+
+        figures are only taken from the set when they are rendered, so it builds them lazily
 
-        expects a tuple containing a list of the figures, a list of the rt60 values, the length of the audio in seconds, and highest res frequency
+        results of a job that is no longer being loaded are ignored
         """
-        if data is None:
+        with span("update_images"):
+            self._update_images(figures, job)
+
+    def _update_images(self, figures: "FigureSet | None", job=None):
+        loading_job, loading_file, loading_file_key = self.loading
+        if job is not None and job is not loading_job:
+            return
+
+        self._stop_loading_indicator()
+
+        if figures is None:
+            self._update_title_label()
             showerror("Error", "Unexpected error when opening file")
             return
 
+        result = figures.result
+        self.current_file = loading_file
+        self.file_key = loading_file_key
+        self.titles = file_titles
+        self.figures = figures
+        self.num_images = len(self.figures)
         self.image_index = 0
-        images = []
-        for fig in data[0]:
-            images.append(figure_to_image(fig))
-        self.images = images
-        self.num_images = len(images)
+        self.time_range = None
+        self._show_image(self.image_index)
 
-        self.rt_60s = data[1]
+        self.rt_60s = list(result.rt60s)
 
-        self._update_time_label(data[2])
+        self._update_time_label(result.seconds)
         self._update_rt60_label()
         self._update_title_label()
         self._update_file_label(self.current_file)
         self._update_difference_label((sum(self.rt_60s)/3) - 0.5)
-        self._update_frequency_label(data[3])
-        self._update_difference_label((sum(self.rt_60s)/3) - 0.5)
-        self._update_frequency_label(data[3])
+        self._update_frequency_label(result.res_freq)
 
         if not self.image_loaded:
             self._create_sliders()
             self.image_loaded = True
 
-    def _on_load_file_press(self):
+    def post_comparison(self, data: tuple["ComparisonFigureSet", list[str], int, list[str]], job=None):
         """
-        Called when ever the load file button is pressed
+        Called from model on the controller's loader thread once the files of a comparison are analyzed
 
-        Will pass path of selected file to the controller, otherwise does nothing
+        Hands data over to update_comparison on the main thread
         """
-        if not self.choosing_file:
-            self.choosing_file = True
-            chosen_file: str = askopenfilename(filetypes=[("Audio Files", "*.wav *.mp3")], title="Select File")
-            self.choosing_file = False
-            if chosen_file != "":
-                chosen_path = pathlib.Path(chosen_file)
-                self.current_file = chosen_path.name
-                controller.loadFile(chosen_file)
+        pyglet.clock.schedule_once(lambda dt: self.update_comparison(data, job), 0)
+        pyglet.app.platform_event_loop.notify()
+
+    def update_comparison(self, data: tuple["ComparisonFigureSet", list[str], int, list[str]], job=None):
+        """
+        Called on the main thread once the files of a comparison are analyzed
+
+        expects a tuple containing the ComparisonFigureSet, the names of the compared files,
+        the version of the comparison session and the paths of any files that could not be opened
+        """
+        loading_job, _, _ = self.loading
+        if job is not None and job is not loading_job:
+            return
+
+        self._stop_loading_indicator()
+
+        figures, names, version, failed = data
+        if failed:
+            showerror("Error", "Unexpected error when opening " + ", ".join(pathlib.Path(path).name for path in failed))
+        if len(figures) == 0:
+            self._update_title_label()
+            return
+
+        # rendered graphs of a comparison are reused until files are added to it
+        self.current_file = f"{len(names)} files compared"
+        self.file_key = ("comparison", version)
+        self.titles = figures.titles
+        self.figures = figures
+        self.num_images = len(self.figures)
+        self.image_index = 0
+        self.time_range = None
+        self._show_image(self.image_index)
+
+        self.rt_60s = []
+
+        self.time_label.text = "Time: NA"
+        self.difference_label.text = "RT60 Difference: NA"
+        self.frequency_label.text = "Highest Resonant Frequency: NA"
+        self._update_rt60_label()
+        self._update_title_label()
+        self._update_file_label(self.current_file)
+
+        if not self.image_loaded:
+            self._create_sliders()
+            self.image_loaded = True
+
+    def post_export(self, data: tuple[str, int, list[str]]):
+        """
+        Called from model on the controller's exporter thread once an export has been written
+
+        expects a tuple containing the directory exported into, the number of files exported and
+        the paths of any files that could not be
+        """
+        pyglet.clock.schedule_once(lambda dt: self._show_export(data), 0)
+        pyglet.app.platform_event_loop.notify()
+
+    def _export(self):
+        """
+        Asks for a directory and exports the graphs and numbers of the file shown, or of every
+        compared file, into it in the background
+        """
+        if not self.file_key or self.choosing_file:
+            return
+        paths = controller.getComparedPaths() if self.file_key[0] == "comparison" else [self.file_key[0]]
+
+        self.choosing_file = True
+        directory = askdirectory(title="Export To")
+        self.choosing_file = False
+        if directory:
+            controller.startExport(paths, directory)
+
+    def _show_export(self, data: tuple[str, int, list[str]]):
+        directory, count, failed = data
+        if failed:
+            showerror("Error", "Unable to export " + ", ".join(pathlib.Path(path).name for path in failed))
+        if count:
+            showinfo("Export", f"Exported {count} file{'s' if count != 1 else ''} to {directory}")
+
+    def post_live(self, figure, name: str):
+        """
+        Called from model when live input starts
+
+        figure is updated in place and redrawn at a steady rate on the main thread until live input stops
+        """
+        pyglet.clock.schedule_once(lambda dt: self._show_live(figure, name), 0)
+        pyglet.app.platform_event_loop.notify()
+
+    def post_impulse(self, event):
+        """
+        Called from model on the live analysis thread with every impulse found in the live input
+        """
+        pyglet.clock.schedule_once(lambda dt: self._update_live_rt60_label(event.rt60s), 0)
+
+    def _start_live(self):
+        """
+        Starts live input from live_file or the default input device
+        """
+        try:
+            device = controller.FileInputDevice(self.live_file) if self.live_file else None
+            controller.startLiveInput(device)
+        except Exception:
+            showerror("Error", "Unable to start live input")
+
+    def _show_live(self, figure, name: str):
+        """
+        Shows the live graph instead of the graphs of a file
+        """
+        self.live_figure = figure
+        pyglet.clock.unschedule(self._refresh_live)
+        pyglet.clock.schedule_interval(self._refresh_live, 1 / live_refresh_rate)
+
+        self.title_label.text = "Live Input"
+        self.rt60_label.text = "RT60: NA"
+        self.time_label.text = "Time: NA"
+        self.difference_label.text = "RT60 Difference: NA"
+        self.frequency_label.text = "Highest Resonant Frequency: NA"
+        self._update_file_label(pathlib.Path(name).name)
+        self._refresh_live(0)
+
+    def _refresh_live(self, dt):
+        """
+        Redraws the live graph with the latest live analysis
+        """
+        if self.live_figure is not None:
+            self.current_image = rendered_to_image(self.live_figure.render())
+
+    def _stop_live(self):
+        """
+        Stops live input and goes back to the graphs of the last file, if there is one
+        """
+        controller.stopLiveInput()
+        pyglet.clock.unschedule(self._refresh_live)
+        self.live_figure = None
+
+        if self.num_images > 0:
+            self._show_image(self.image_index)
+            self._update_rt60_label()
+            self._update_file_label(self.current_file)
+        else:
+            self.current_image = ImageData(1, 1, "RGBA", "0000")
+            self.rt60_label.text = "RT60: "
+            self._update_file_label("")
+        self._update_title_label()
+
+    def _update_live_rt60_label(self, rt60s: list[float]):
+        """
+        Update displayed rt60 values with those of the latest impulse in the live input
+        """
+        if self.live_figure is not None:
+            self.rt60_label.text = "RT60: " + ", ".join(f"{rt60:0.2f}" for rt60 in rt60s) + "s"
+
+    def _show_image(self, index: int):
+        """
+        Makes the graph at index the one being displayed
+
+        Graphs of a file are drawn straight into pixels by a plot view, over the time range of the last
+        graph that was zoomed. Comparison graphs are matplotlib figures, which are rendered if they are
+        not cached and have their neighbours prefetched on the render thread
+        """
+        # only the FigureSet of a file has plots
+        if hasattr(self.figures, "getPlot"):
+            plot = self.figures.getPlot(index)
+            self.plot_view = self.plot_views[plot.kind]
+            if self.plot_view.source is not plot:
+                self.plot_view.set_plot(plot)
+            if self.time_range is None:
+                self.plot_view.reset_range()
+            else:
+                self.plot_view.set_range(*self.time_range)
+            return
+
+        self.plot_view = None
+        image = self.image_cache.get((self.file_key, index))
+        if image is None:
+            image = self._request_render(self.figures, self.file_key, index).result()
+        self.current_image = image
+
+        for neighbour in ((index + 1) % self.num_images, (index - 1) % self.num_images):
+            if self.image_cache.get((self.file_key, neighbour)) is None:
+                self._request_render(self.figures, self.file_key, neighbour)
+
+    def _request_render(self, figures: "ComparisonFigureSet", file_key: tuple, index: int) -> Future:
+        """
+        Schedules comparison graph number index of figures to be rendered on the render thread
+
+        Returns the future of a render that is already pending instead of rendering twice
+        """
+        key = (file_key, index)
+        with self.pending_lock:
+            future = self.pending_renders.get(key)
+            if future is None:
+                future = self.render_executor.submit(self._render_image, figures, key, index)
+                self.pending_renders[key] = future
+        return future
+
+    def _render_image(self, figures: "ComparisonFigureSet", key: tuple, index: int) -> ImageData:
+        """
+        Runs on the render thread
+
+        Builds and draws a single comparison graph and stores it in the image cache
+        """
+        try:
+            image = self.image_cache.get(key)
+            if image is None:
+                with span("render graph", index=index):
+                    image = rendered_to_image(figures.render(index))
+                self.image_cache.put(key, image)
+            return image
+        finally:
+            with self.pending_lock:
+                self.pending_renders.pop(key, None)
+
+    def _start_loading_indicator(self):
+        """
+        Shows that a file is being analyzed until update_images is called
+        """
+        self.analyzing = True
+        self.loading_dots = 0
+        pyglet.clock.unschedule(self._update_loading_label)
+        pyglet.clock.schedule_interval(self._update_loading_label, 0.4)
+        self._update_loading_label(0)
+
+    def _stop_loading_indicator(self):
+        """
+        Stops showing that a file is being analyzed
+        """
+        self.analyzing = False
+        pyglet.clock.unschedule(self._update_loading_label)
+
+    def _update_loading_label(self, dt):
+        """
+        Animates the dots after "Analyzing" in the title label
+        """
+        self.loading_dots = self.loading_dots % 3 + 1
+        self.title_label.text = "Analyzing" + "." * self.loading_dots
 
     def _on_load_file_press(self):
         """
         Called when ever the load file button is pressed
 
         Will pass path of selected file to the controller, otherwise does nothing
+
+        Choosing several files, or holding shift while pressing the button, adds the chosen
+        files to the comparison instead
         """
+        if self.live_figure is not None:
+            self._stop_live()
         if not self.choosing_file:
             self.choosing_file = True
-            chosen_file: str = askopenfilename(filetypes=[("Audio Files", "*.wav *.mp3")], title="Select File")
+            chosen_files = askopenfilenames(filetypes=[("Audio Files", "*.wav *.mp3 *.flac *.ogg")], title="Select Files")
             self.choosing_file = False
-            if chosen_file != "":
-                chosen_path = pathlib.Path(chosen_file)
-                self.current_file = chosen_path.name
-                controller.loadFile(chosen_file)
-            
+            if not chosen_files:
+                return
+
+            comparing = len(chosen_files) > 1 or self.keys[key.LSHIFT] or self.keys[key.RSHIFT]
+            if comparing:
+                # only files that are not part of the comparison yet are analyzed
+                job = controller.compareFiles(chosen_files)
+                self.loading = (job, "", ())
+                self._start_loading_indicator()
+                return
+
+            chosen_file: str = chosen_files[0]
+            chosen_path = pathlib.Path(chosen_file)
+            # rendered graphs are reused for as long as the file is unchanged
+            file_key = (str(chosen_path.resolve()), chosen_path.stat().st_mtime_ns)
+            # loading happens on the controller's loader thread, results arrive in update_images
+            job = controller.loadFile(chosen_file)
+            self.loading = (job, chosen_path.name, file_key)
+            self._start_loading_indicator()
 
     def _create_sliders(self):
         """
@@ -222,9 +652,12 @@ class AppWindow(pyglet.window.Window):
         """
         Switches the graph being displayed when the left slider button is pressed
         """
+        if self.live_figure is not None:
+            return
         self.image_index -= 1
         if self.image_index < 0:
             self.image_index = self.num_images - 1
+        self._show_image(self.image_index)
         self._update_rt60_label()
         self._update_title_label()
 
@@ -232,9 +665,12 @@ class AppWindow(pyglet.window.Window):
         """
         Switches the graph being displayed when the right slider button is pressed
         """
+        if self.live_figure is not None:
+            return
         self.image_index += 1
         if self.image_index >= self.num_images:
             self.image_index = 0
+        self._show_image(self.image_index)
         self._update_rt60_label()
         self._update_title_label()
 
@@ -255,7 +691,7 @@ class AppWindow(pyglet.window.Window):
         Update displayed rt60 value
         """
         rt_index = self.image_index - 2
-        if rt_index >= 0 and rt_index <= 2:
+        if rt_index >= 0 and rt_index < len(self.rt_60s):
             self.rt60_label.text = f"RT60: {self.rt_60s[rt_index]:0.2e}s"
         else:
             self.rt60_label.text = "RT60: NA"
@@ -291,6 +727,11 @@ class AppWindow(pyglet.window.Window):
         """
         Update figure title label
         """
+        if self.analyzing:
+            return
+        if not self.image_loaded and self.num_images < 0:
+            self.title_label.text = ""
+            return
         self.title_label.text = self.titles[self.image_index]
 
     def _update_file_label(self, filename):